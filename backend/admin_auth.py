@@ -3,6 +3,7 @@ from flask import session, redirect, url_for, request, make_response
 from flask_login import current_user, login_user
 from datetime import timedelta
 from app import User, db
+from identity_cache import load_identity
 
 def set_secure_cookie(response, user_id):
     """Set a secure, persistent cookie for admin authentication"""
@@ -20,9 +21,10 @@ def set_secure_cookie(response, user_id):
 def check_admin_cookie():
     """Check if admin cookie is valid and authenticate user"""
     admin_id = request.cookies.get('admin_session')
-    if admin_id:
-        admin = User.query.filter_by(id=admin_id, is_admin=True).first()
-        if admin and not current_user.is_authenticated:
+    if admin_id and admin_id.isdigit():
+        # Shares the request memo and identity cache with load_user; the cookie carries no password generation
+        admin = load_identity(User, admin_id)
+        if admin and admin.is_admin and not current_user.is_authenticated:
             login_user(admin, remember=True, duration=timedelta(days=30))
             return True
     return False
@@ -1,4 +1,4 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, send_from_directory, session
+from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, send_from_directory, session, abort
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
 from flask_cors import CORS
@@ -10,16 +10,40 @@ from werkzeug.security import generate_password_hash, check_password_hash
 from flask_login import LoginManager, UserMixin, login_user, login_required, logout_user, current_user
 from flask_wtf.csrf import CSRFProtect
 from flask_wtf import FlaskForm
-from routes.api import api  # Import the API blueprint
+from routes.api import create_api  # API blueprint, built once the models exist
+from content_version import init_content_version
+from response_cache import get_response_cache
+from index_shell import IndexShell
+from static_assets import init_static_assets
+from images import queue_derivatives, save_upload
+from session_bypass import init_session_bypass, session_stats
+from session_store import init_session_store
+from identity_cache import init_identity_cache, load_session_identity, remember_password_generation
+from password_pool import hash_password, init_password_pool, verify_password
+from rate_limit import init_rate_limiter
+from drafts import autosave, drop_draft, init_drafts, load_draft
+from feeds import feed_response, init_feeds, update_feeds
+from db_profile import configure_database, database_url, init_db_profile, stream_query
+from search import init_search
+from snapshot import init_snapshot, update_snapshot
+from suggest import get_suggest_index, init_suggest, update_suggest
+from rendering import init_rendering, render_post
+from revisions import record_revision, revision_content, revision_diff, revision_list
+from serializers import init_query_counter, query_stats, with_relations
 
 # Initialize Flask app
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'your-secret-key-change-this'
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///blog.db'
+# DATABASE_URL (set by render.yaml) wins over the local SQLite file
+app.config['SQLALCHEMY_DATABASE_URI'] = database_url('sqlite:///blog.db')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 app.config['UPLOAD_FOLDER'] = 'static/uploads'
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max upload
 app.config['WTF_CSRF_TIME_LIMIT'] = 3600  # Set CSRF token expiration to 1 hour
+# 'production' turns on WAL and tuned pragmas for SQLite and sizes the pool for the gunicorn worker model
+app.config['DB_PROFILE'] = os.environ.get('DB_PROFILE', 'production')
+# Public origin for the absolute links in the feeds and sitemaps; they are not built without it
+app.config['SITE_URL'] = os.environ.get('SITE_URL')
 
 # Configure Flask-Session
 app.config['SESSION_TYPE'] = 'filesystem'
@@ -27,13 +51,8 @@ app.config['SESSION_PERMANENT'] = True
 app.config['SESSION_USE_SIGNER'] = True
 app.config['SESSION_FILE_DIR'] = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'flask_session')
 app.config['PERMANENT_SESSION_LIFETIME'] = timedelta(hours=1)
-
-# Cache invalidation mechanism
-app.config['LAST_MODIFIED'] = datetime.utcnow()
-
-# Function to update last modified timestamp for cache invalidation
-def update_last_modified():
-    app.config['LAST_MODIFIED'] = datetime.utcnow()
+# Sessions live in a SQLite table (instance/sessions.db) swept in the background; 'filesystem' uses SESSION_TYPE
+app.config['SESSION_BACKEND'] = os.environ.get('SESSION_BACKEND', 'sqlite')
 
 # Ensure upload and session directories exist
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
@@ -41,9 +60,14 @@ os.makedirs(app.config['SESSION_FILE_DIR'], exist_ok=True)
 
 # Initialize extensions
 Session(app)  # Initialize Flask-Session first
+init_session_store(app)
+init_session_bypass(app)  # Keep static files and anonymous reads away from the session store
+configure_database(app)
 db = SQLAlchemy(app)
+init_db_profile(app, db)
 migrate = Migrate(app, db)
 CORS(app)  # Enable CORS for API endpoints
+init_query_counter(app)  # Report SQL statements per request in X-Query-Count
 login_manager = LoginManager(app)
 login_manager.login_view = 'login'
 csrf = CSRFProtect(app)
@@ -65,6 +89,7 @@ class User(UserMixin, db.Model):
     password_hash = db.Column(db.String(128))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     last_login = db.Column(db.DateTime)
+    is_admin = db.Column(db.Boolean, default=False)
     posts = db.relationship('Post', backref='author', lazy=True)
     
     def set_password(self, password):
@@ -90,12 +115,28 @@ class Post(db.Model):
     content = db.Column(db.Text, nullable=False)
     summary = db.Column(db.String(300), nullable=True)
     featured_image = db.Column(db.String(200), nullable=True)
+    # Original size and resized WebP/JPEG copies, filled in by the image pool after upload
+    image_width = db.Column(db.Integer, nullable=True)
+    image_height = db.Column(db.Integer, nullable=True)
+    image_variants = db.Column(db.JSON, nullable=True)
     read_time = db.Column(db.Integer, default=5)
+    # Rendered from content when the post is saved, so readers get HTML without parsing markdown
+    content_html = db.Column(db.Text, nullable=True)
+    toc = db.Column(db.JSON, nullable=True)
+    word_count = db.Column(db.Integer, nullable=True)
+    excerpt = db.Column(db.String(300), nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     published = db.Column(db.Boolean, default=False)
     category_id = db.Column(db.Integer, db.ForeignKey('category.id'), nullable=False)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    # One per public query shape, so listings read rows in index order instead of scanning and sorting
+    __table_args__ = (
+        db.Index('ix_post_published_created_at', 'published', 'created_at', 'id'),
+        db.Index('ix_post_category_published_created_at', 'category_id', 'published', 'created_at', 'id'),
+        db.Index('ix_post_published_updated_at', 'published', 'updated_at'),
+        db.Index('ix_post_user_published_created_at', 'user_id', 'published', 'created_at'),
+    )
     
     def __repr__(self):
         return f'<Post {self.title}>'
@@ -105,7 +146,7 @@ class Post(db.Model):
             'id': self.id,
             'title': self.title,
             'slug': self.slug,
-            'summary': self.summary,
+            'summary': self.summary or self.excerpt,
             'featured_image': self.featured_image,
             'read_time': self.read_time,
             'created_at': self.created_at.strftime('%B %d, %Y'),
@@ -114,97 +155,116 @@ class Post(db.Model):
             'author': self.author.username
         }
 
+class PostDraft(db.Model):
+    """Latest autosaved, unpublished edit of a post, kept apart from the post row"""
+    post_id = db.Column(db.Integer, db.ForeignKey('post.id'), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    title = db.Column(db.String(200), nullable=True)
+    slug = db.Column(db.String(200), nullable=True)
+    content = db.Column(db.Text, nullable=True)
+    summary = db.Column(db.String(300), nullable=True)
+    category_id = db.Column(db.Integer, nullable=True)
+    read_time = db.Column(db.Integer, nullable=True)
+    content_hash = db.Column(db.String(64), nullable=False)
+    saved_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # The post's updated_at when the autosave was made; a draft older than the post was superseded by a save
+    base_updated_at = db.Column(db.DateTime, nullable=True)
+    post = db.relationship('Post', backref=db.backref('draft', uselist=False, cascade='all, delete-orphan'))
+
+class PostRevision(db.Model):
+    """Saved version of a post's content, as a compressed delta against the previous revision or a full keyframe"""
+    id = db.Column(db.Integer, primary_key=True)
+    post_id = db.Column(db.Integer, db.ForeignKey('post.id'), nullable=False)
+    number = db.Column(db.Integer, nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    title = db.Column(db.String(200), nullable=False)
+    is_keyframe = db.Column(db.Boolean, nullable=False, default=False)
+    data = db.Column(db.LargeBinary, nullable=False)
+    content_hash = db.Column(db.String(64), nullable=False)
+    size = db.Column(db.Integer, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    post = db.relationship('Post', backref=db.backref('revisions', lazy='dynamic', cascade='all, delete-orphan'))
+    __table_args__ = (db.UniqueConstraint('post_id', 'number'),)
+
+# Shared content version for cache invalidation across workers, bumped on every post/category commit
+init_content_version(app, db, [Post, Category])
+
+# FTS5 index of published posts, filled by triggers on the post table
+init_search(app, db, Post)
+
+# In-memory typeahead index of titles, slugs and category names for /api/suggest
+init_suggest(app)
+
+# Autosaves are deduplicated by content hash and coalesced before they reach post_draft
+init_drafts(app, db, PostDraft, Post)
+
+# `flask render-posts` fills content_html for posts saved before it was stored
+init_rendering(app, db, Post)
+
+# Identities for the user_loader, dropped in every worker when a user row changes
+init_identity_cache(app, db, User)
+# PBKDF2 runs in a bounded pool; saturation answers 429 instead of pinning request threads
+init_password_pool(app)
+# Per-IP and per-username token buckets for the auth endpoints, shared by all workers
+init_rate_limiter(app)
+
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    return load_session_identity(User, user_id)
 
 # Routes
+# Fingerprinted, precompressed copies of the site's CSS, JS and images
+static_assets = init_static_assets(app, os.path.join(app.root_path, '..'))
+
+# Pre-rendered API responses and post pages from `flask export-static`, served ahead of the views
+init_snapshot(app, os.path.join(app.root_path, '..'), Post, Category)
+
+# RSS, Atom and sitemap bytes, rewritten after admin saves and never built per request
+init_feeds(app, Post, Category)
+
+# index.html shell, read once and re-read only when the file changes
+index_shell = IndexShell(os.path.join(app.root_path, '..', 'index.html'), rewrite=static_assets.rewrite_html)
+
 @app.route('/')
 def index():
-    # Check if user is logged in
-    is_admin = current_user.is_authenticated and current_user.username == 'admin'
-    auth_status = {
-        'is_logged_in': 'true' if current_user.is_authenticated else 'false',
-        'username': current_user.username if current_user.is_authenticated else '',
-        'is_admin': 'true' if is_admin else 'false'
-    }
-    # Create script to inject authentication status into the frontend
-    auth_script = f"""
-    <script>
-        window.authStatus = {{
-            is_logged_in: {auth_status['is_logged_in']},
-            username: "{auth_status['username']}",
-            is_admin: {auth_status['is_admin']}
-        }};
-        document.addEventListener('DOMContentLoaded', function() {{
-            // Hide/show admin-only elements
-            if (window.authStatus && window.authStatus.is_admin === 'true') {{
-                document.querySelectorAll('.admin-only').forEach(el => el.style.display = 'block');
-            }} else {{
-                document.querySelectorAll('.admin-only').forEach(el => el.style.display = 'none');
-            }}
-            // Handle sidebar account section
-            const accountSection = document.querySelector('.sidebar-section:nth-child(2)');
-            if (accountSection && accountSection.querySelector('h3').textContent === 'Account') {{
-                const accountLinks = accountSection.querySelector('ul');
-                if (window.authStatus.is_logged_in === 'true') {{
-                    accountLinks.innerHTML = `
-                        <li>
-                            <a href="/dashboard" class="sidebar-link">
-                                <i class="fas fa-user-circle"></i>
-                                <span>Dashboard</span>
-                                <i class="fas fa-chevron-right nav-arrow"></i>
-                            </a>
-                        </li>
-                        <li>
-                            <a href="/logout" class="sidebar-link">
-                                <i class="fas fa-sign-out-alt"></i>
-                                <span>Logout</span>
-                                <i class="fas fa-chevron-right nav-arrow"></i>
-                            </a>
-                        </li>
-                    `;
-                    const usernameElement = document.createElement('div');
-                    usernameElement.className = 'user-info';
-                    usernameElement.innerHTML = '<p>Logged in as: <strong>' + window.authStatus.username + '</strong></p>';
-                    accountSection.insertBefore(usernameElement, accountLinks);
-                }}
-            }}
-            // Toggle auth buttons in nav
-            const authButtons = document.querySelector('.auth-buttons');
-            if (authButtons) {{
-                if (window.authStatus.is_logged_in === 'true' && window.authStatus.is_admin === 'true') {{
-                    authButtons.innerHTML = `
-                        <a href="/dashboard" class="auth-btn login-btn">Dashboard</a>
-                        <a href="/logout" class="auth-btn signup-btn">Logout</a>
-                    `;
-                }} else {{
-                    authButtons.innerHTML = '';
-                }}
-            }}
-        }});
-    </script>
-    """
-    
-    # Use render_template_string to create HTML content with the auth script injected
     try:
-        # Get the index.html content
-        with open('../index.html', 'r', encoding='utf-8') as file:
-            content = file.read()
-            
-        # Inject auth script before </body>
-        modified_content = content.replace('</body>', f'{auth_script}</body>')
-        
-        # Return the modified content with proper MIME type
-        response = app.make_response(modified_content)
-        response.mimetype = 'text/html'
-        return response
-    except Exception as e:
+        index_shell.refresh()
+    except OSError:
         # If there's an error, fallback to the direct approach
         return send_from_directory('../', 'index.html')
+    
+    if not current_user.is_authenticated:
+        # Every anonymous visitor gets the same prebuilt page
+        use_gzip = bool(request.accept_encodings['gzip'])
+        # The gzip body is a different representation and needs its own strong ETag, as in response_cache
+        etag = f'{index_shell.anonymous_etag}-gzip' if use_gzip else index_shell.anonymous_etag
+        if etag in request.if_none_match:
+            response = app.response_class(status=304)
+        elif use_gzip:
+            response = app.response_class(index_shell.anonymous_gzip, mimetype='text/html')
+            response.headers['Content-Encoding'] = 'gzip'
+        else:
+            response = app.response_class(index_shell.anonymous, mimetype='text/html')
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'no-cache'
+        response.vary.update(('Accept-Encoding', 'Cookie'))
+        return response
+    
+    # Logged in users only need their auth status injected into the cached segments
+    is_admin = current_user.username == 'admin'
+    response = app.response_class(index_shell.render(True, current_user.username, is_admin), mimetype='text/html')
+    response.headers['Cache-Control'] = 'private, no-cache'
+    response.vary.add('Cookie')
+    return response
 
 @app.route('/<path:path>')
 def serve_static(path):
+    # Fingerprinted assets come precompressed with a year-long immutable lifetime
+    if path.startswith('dist/'):
+        response = static_assets.send(path[len('dist/'):])
+        if response is None:
+            abort(404)
+        return response
     # Serve other static files like CSS, JS, images
     return send_from_directory('../', path)
 
@@ -214,87 +274,24 @@ def admin_index():
     return render_template('admin/index.html')
 
 # Register blueprints
-app.register_blueprint(api, url_prefix='/api')
-
-# API Routes
-@app.route('/api/posts')
-def get_posts():
-    posts = Post.query.filter_by(published=True).order_by(Post.created_at.desc()).all()
-    response = jsonify([post.to_dict() for post in posts])
-    # Add cache control headers to prevent browser caching
-    response.headers['Cache-Control'] = 'no-cache, no-store, must-revalidate'
-    response.headers['Pragma'] = 'no-cache'
-    response.headers['Expires'] = '0'
-    response.headers['Last-Modified'] = app.config['LAST_MODIFIED'].strftime('%a, %d %b %Y %H:%M:%S GMT')
-    return response
+app.register_blueprint(create_api(Post, Category), url_prefix='/api')
 
-@app.route('/api/posts/<slug>')
-def get_post(slug):
-    post = Post.query.filter_by(slug=slug, published=True).first_or_404()
-    post_data = post.to_dict()
-    post_data['content'] = post.content
-    response = jsonify(post_data)
-    # Add cache control headers to prevent browser caching
-    response.headers['Cache-Control'] = 'no-cache, no-store, must-revalidate'
-    response.headers['Pragma'] = 'no-cache'
-    response.headers['Expires'] = '0'
-    response.headers['Last-Modified'] = app.config['LAST_MODIFIED'].strftime('%a, %d %b %Y %H:%M:%S GMT')
-    return response
+@app.route('/feed.xml')
+def rss_feed():
+    return feed_response('/feed.xml', Post, Category)
 
-@app.route('/api/categories')
-def get_categories():
-    categories = Category.query.all()
-    response = jsonify([{
-        'id': category.id,
-        'name': category.name,
-        'slug': category.slug,
-        'icon': category.icon
-    } for category in categories])
-    # Add cache control headers to prevent browser caching
-    response.headers['Cache-Control'] = 'no-cache, no-store, must-revalidate'
-    response.headers['Pragma'] = 'no-cache'
-    response.headers['Expires'] = '0'
-    response.headers['Last-Modified'] = app.config['LAST_MODIFIED'].strftime('%a, %d %b %Y %H:%M:%S GMT')
-    return response
+@app.route('/atom.xml')
+def atom_feed():
+    return feed_response('/atom.xml', Post, Category)
 
-@app.route('/api/categories/<slug>/posts')
-def get_category_posts(slug):
-    category = Category.query.filter_by(slug=slug).first_or_404()
-    posts = Post.query.filter_by(category_id=category.id, published=True).order_by(Post.created_at.desc()).all()
-    response = jsonify([post.to_dict() for post in posts])
-    # Add cache control headers to prevent browser caching
-    response.headers['Cache-Control'] = 'no-cache, no-store, must-revalidate'
-    response.headers['Pragma'] = 'no-cache'
-    response.headers['Expires'] = '0'
-    response.headers['Last-Modified'] = app.config['LAST_MODIFIED'].strftime('%a, %d %b %Y %H:%M:%S GMT')
-    return response
+@app.route('/sitemap.xml')
+def sitemap():
+    # A single urlset, or an index of the shards below once there are more URLs than one file holds
+    return feed_response('/sitemap.xml', Post, Category)
 
-@app.route('/api/check-updates')
-def check_updates():
-    """Check if there have been any updates to the blog content"""
-    last_modified = app.config['LAST_MODIFIED'].strftime('%a, %d %b %Y %H:%M:%S GMT')
-    
-    # Check if client sent If-Modified-Since header
-    if_modified_since = request.headers.get('If-Modified-Since')
-    
-    if if_modified_since:
-        try:
-            # Parse the If-Modified-Since header
-            ims_date = datetime.strptime(if_modified_since, '%a, %d %b %Y %H:%M:%S GMT')
-            
-            # Convert last_modified to datetime for comparison
-            last_mod_date = datetime.strptime(last_modified, '%a, %d %b %Y %H:%M:%S GMT')
-            
-            # If client's version is current, return 304 Not Modified
-            if ims_date >= last_mod_date:
-                return '', 304
-        except Exception as e:
-            print(f"Error parsing If-Modified-Since header: {str(e)}")
-    
-    # Return 200 OK with Last-Modified header
-    response = jsonify({'updated': True, 'last_modified': last_modified})
-    response.headers['Last-Modified'] = last_modified
-    return response
+@app.route('/sitemap-posts-<int:shard>.xml')
+def sitemap_shard(shard):
+    return feed_response(f'/sitemap-posts-{shard}.xml', Post, Category)
 
 # User authentication routes
 @app.route('/signup', methods=['GET', 'POST'])
@@ -325,7 +322,7 @@ def signup():
         
         # Create new user
         new_user = User(username=username, email=email)
-        new_user.set_password(password)
+        new_user.password_hash = hash_password(password)
         
         db.session.add(new_user)
         db.session.commit()
@@ -352,7 +349,7 @@ def login():
         user = User.query.filter_by(username=username).first()
         if user:
             print(f"User found: {user.username}, checking password...")
-            is_valid = user.check_password(password)
+            is_valid = verify_password(user, password)
             print(f"Password valid: {is_valid}")
             
             if is_valid:
@@ -397,7 +394,7 @@ def admin_login():
         password = request.form.get('password')
         
         user = User.query.filter_by(username=username).first()
-        if user and user.check_password(password):
+        if user and verify_password(user, password):
             # Update last login time
             user.last_login = datetime.utcnow()
             db.session.commit()
@@ -427,18 +424,35 @@ def admin_logout():
 def admin_dashboard():
     posts_count = Post.query.count()
     categories_count = Category.query.count()
-    recent_posts = Post.query.order_by(Post.created_at.desc()).limit(5).all()
+    recent_posts = with_relations(Post.query, Post).order_by(Post.created_at.desc()).limit(5).all()
     return render_template('admin/dashboard.html', 
                           posts_count=posts_count, 
                           categories_count=categories_count,
                           recent_posts=recent_posts)
 
+@app.route('/admin/cache-stats')
+@login_required
+def admin_cache_stats():
+    """Response cache counters, per-endpoint query totals and session store I/O for this worker"""
+    return jsonify({
+        'response_cache': get_response_cache().stats(),
+        'queries': query_stats,
+        'sessions': session_stats,
+        'autosave': app.extensions['drafts'].stats,
+        'suggest': {'entries': len(get_suggest_index()), 'version': get_suggest_index().version}
+    })
+
 @app.route('/admin/posts')
 @login_required
 def admin_posts():
-    posts = Post.query.order_by(Post.created_at.desc()).all()
+    posts = stream_query(with_relations(Post.query, Post).order_by(Post.created_at.desc()))
     return render_template('admin/posts.html', posts=posts)
 
+def derivatives_ready(post):
+    # The API and the pre-rendered pages embed the image, and the sitemap carries updated_at
+    update_snapshot(Post, Category, post_slugs=[post.slug], category_slugs=[post.category.slug])
+    update_feeds(Post, Category, post_ids=[post.id])
+
 @app.route('/admin/posts/new', methods=['GET', 'POST'])
 @login_required
 def new_post():
@@ -450,7 +464,6 @@ def new_post():
         content = request.form.get('content')
         summary = request.form.get('summary')
         category_id = request.form.get('category_id')
-        read_time = request.form.get('read_time', 5)
         published = 'published' in request.form
         
         # Handle image upload
@@ -459,7 +472,8 @@ def new_post():
             file = request.files['featured_image']
             if file.filename:
                 filename = secure_filename(file.filename)
-                file.save(os.path.join(app.config['UPLOAD_FOLDER'], filename))
+                # Published once its metadata is stripped, by queue_derivatives below
+                save_upload(file, filename)
                 featured_image = filename
         
         post = Post(
@@ -468,17 +482,22 @@ def new_post():
             content=content,
             summary=summary,
             featured_image=featured_image,
-            read_time=read_time,
             published=published,
             category_id=category_id,
             user_id=current_user.id
         )
+        # HTML, table of contents, word count and read time are derived from the markdown once, here
+        render_post(post)
         
         db.session.add(post)
+        db.session.flush()
+        record_revision(PostRevision, post, current_user.id)
         db.session.commit()
-        
-        # Update last-modified timestamp for cache invalidation
-        update_last_modified()
+        if featured_image:
+            queue_derivatives(Post, post.id, featured_image, on_ready=derivatives_ready)
+        update_snapshot(Post, Category, post_slugs=[post.slug], category_slugs=[post.category.slug])
+        update_feeds(Post, Category, post_ids=[post.id])
+        update_suggest(Post, Category)
         
         flash('Post created successfully!')
         return redirect(url_for('admin_posts'))
@@ -495,26 +514,38 @@ def edit_post(id):
     categories = Category.query.all()
     
     if request.method == 'POST':
+        # Keep the content as it was before this edit if it is not in the history yet
+        record_revision(PostRevision, post, post.user_id)
+        # Snapshot files under the old slug and category are rewritten or removed after the save
+        old_slug, old_category_slug = post.slug, post.category.slug
         post.title = request.form.get('title')
         post.slug = request.form.get('slug')
         post.content = request.form.get('content')
         post.summary = request.form.get('summary')
         post.category_id = request.form.get('category_id')
-        post.read_time = request.form.get('read_time', 5)
         post.published = 'published' in request.form
+        render_post(post)
         
         # Handle image upload
         if 'featured_image' in request.files:
             file = request.files['featured_image']
             if file.filename:
                 filename = secure_filename(file.filename)
-                file.save(os.path.join(app.config['UPLOAD_FOLDER'], filename))
+                save_upload(file, filename)
                 post.featured_image = filename
+                # Derivatives of the previous image no longer apply
+                post.image_width = post.image_height = post.image_variants = None
         
+        # The saved form supersedes any autosaved draft
+        drop_draft(post.id)
+        record_revision(PostRevision, post, current_user.id)
         db.session.commit()
-        
-        # Update last-modified timestamp for cache invalidation
-        update_last_modified()
+        if post.featured_image and post.image_variants is None:
+            queue_derivatives(Post, post.id, post.featured_image, on_ready=derivatives_ready)
+        update_snapshot(Post, Category, post_slugs=[old_slug, post.slug],
+                        category_slugs=[old_category_slug, post.category.slug])
+        update_feeds(Post, Category, post_ids=[post.id])
+        update_suggest(Post, Category)
         
         flash('Post updated successfully!')
         return redirect(url_for('admin_posts'))
@@ -536,6 +567,7 @@ def delete_post(id):
         #     return redirect(url_for('admin_posts'))
         
         # Store the title and slug for the flash message and cache invalidation
+        post_id = post.id
         title = post.title
         slug = post.slug
         category_id = post.category_id
@@ -547,9 +579,9 @@ def delete_post(id):
         # Delete the post
         db.session.delete(post)
         db.session.commit()
-        
-        # Update last-modified timestamp for cache invalidation
-        update_last_modified()
+        update_snapshot(Post, Category, post_slugs=[slug], category_slugs=[category_slug])
+        update_feeds(Post, Category, post_ids=[post_id])
+        update_suggest(Post, Category, deleted_post_ids=[post_id])
         
         flash(f'Post "{title}" deleted successfully!', 'success')
     except Exception as e:
@@ -581,22 +613,13 @@ def autosave_post():
             if post.user_id != current_user.id:
                 return jsonify({'status': 'error', 'message': 'Not authorized'}), 403
                 
-            # Update draft data
-            post.title = data.get('title', post.title)
-            post.content = data.get('content', post.content)
-            post.summary = data.get('summary', post.summary)
-            post.slug = data.get('slug', post.slug)
-            if 'category_id' in data and data['category_id']:
-                post.category_id = data['category_id']
-            post.read_time = data.get('read_time', post.read_time)
-            post.published = data.get('published', post.published)
-            
-            # Save in database
-            db.session.commit()
+            # Goes to the draft store; the post and public caches change only on an explicit save
+            result = autosave(post, current_user.id, data)
             
             return jsonify({
                 'status': 'success',
-                'message': 'Draft saved successfully',
+                'message': 'No changes to save' if result == 'unchanged' else 'Draft saved successfully',
+                'result': result,
                 'post_id': post.id,
                 'timestamp': datetime.utcnow().isoformat()
             })
@@ -612,6 +635,52 @@ def autosave_post():
         db.session.rollback()
         return jsonify({'status': 'error', 'message': str(e)}), 500
 
+@app.route('/admin/posts/draft/<int:id>')
+@login_required
+def get_post_draft(id):
+    post = Post.query.get_or_404(id)
+    if post.user_id != current_user.id:
+        return jsonify({'status': 'error', 'message': 'Not authorized'}), 403
+    draft = load_draft(post)
+    if draft is None:
+        return jsonify({'status': 'error', 'message': 'No draft saved'}), 404
+    return jsonify({'status': 'success', 'draft': draft})
+
+@app.route('/admin/posts/revisions/<int:id>')
+@login_required
+def post_revisions(id):
+    post = Post.query.get_or_404(id)
+    if post.user_id != current_user.id:
+        return jsonify({'status': 'error', 'message': 'Not authorized'}), 403
+    return jsonify({'status': 'success', 'revisions': revision_list(PostRevision, post.id)})
+
+@app.route('/admin/posts/revisions/<int:id>/<int:number>')
+@login_required
+def post_revision(id, number):
+    post = Post.query.get_or_404(id)
+    if post.user_id != current_user.id:
+        return jsonify({'status': 'error', 'message': 'Not authorized'}), 403
+    content = revision_content(PostRevision, post.id, number)
+    if content is None:
+        return jsonify({'status': 'error', 'message': 'Revision not found'}), 404
+    return jsonify({'status': 'success', 'number': number, 'content': content})
+
+@app.route('/admin/posts/diff/<int:id>')
+@login_required
+def post_revision_diff(id):
+    """Unified diff between revisions ?from= and ?to= (default: the latest and the one before it)"""
+    post = Post.query.get_or_404(id)
+    if post.user_id != current_user.id:
+        return jsonify({'status': 'error', 'message': 'Not authorized'}), 403
+    new = request.args.get('to', type=int)
+    if new is None:
+        new = db.session.query(db.func.max(PostRevision.number)).filter_by(post_id=post.id).scalar() or 0
+    old = request.args.get('from', new - 1, type=int)
+    diff = revision_diff(PostRevision, post.id, old, new)
+    if diff is None:
+        return jsonify({'status': 'error', 'message': 'Revision not found'}), 404
+    return jsonify({'status': 'success', 'from': old, 'to': new, 'diff': diff})
+
 @app.route('/admin/categories')
 @login_required
 def admin_categories():
@@ -629,6 +698,8 @@ def new_category():
         category = Category(name=name, slug=slug, icon=icon)
         db.session.add(category)
         db.session.commit()
+        update_snapshot(Post, Category, category_slugs=[slug])
+        update_suggest(Post, Category)
         flash('Category created successfully!')
         return redirect(url_for('admin_categories'))
     
@@ -640,11 +711,18 @@ def edit_category(id):
     category = Category.query.get_or_404(id)
     
     if request.method == 'POST':
+        old_slug = category.slug
         category.name = request.form.get('name')
         category.slug = request.form.get('slug')
         category.icon = request.form.get('icon')
         
         db.session.commit()
+        # Every post embeds its category, so their pages are rewritten too
+        update_snapshot(Post, Category, post_slugs=[p.slug for p in category.posts],
+                        category_slugs=[old_slug, category.slug])
+        # Feed items carry their category name
+        update_feeds(Post, Category)
+        update_suggest(Post, Category)
         flash('Category updated successfully!')
         return redirect(url_for('admin_categories'))
     
@@ -654,8 +732,12 @@ def edit_category(id):
 @login_required
 def delete_category(id):
     category = Category.query.get_or_404(id)
+    slug = category.slug
     db.session.delete(category)
     db.session.commit()
+    update_snapshot(Post, Category, category_slugs=[slug])
+    update_feeds(Post, Category)
+    update_suggest(Post, Category)
     flash('Category deleted successfully!')
     return redirect(url_for('admin_categories'))
 
@@ -680,7 +762,9 @@ def update_profile():
         flash('Email already in use by another account', 'danger')
         return redirect(url_for('profile'))
     
-    current_user.email = email
+    # current_user is a cached snapshot; changes go through the ORM object
+    user = db.session.get(User, current_user.id)
+    user.email = email
     db.session.commit()
     flash('Profile updated successfully', 'success')
     return redirect(url_for('profile'))
@@ -700,12 +784,15 @@ def change_password():
         flash('New passwords do not match', 'danger')
         return redirect(url_for('profile'))
     
-    if not current_user.check_password(current_password):
+    user = db.session.get(User, current_user.id)
+    if not user.check_password(current_password):
         flash('Current password is incorrect', 'danger')
         return redirect(url_for('profile'))
     
-    current_user.set_password(new_password)
+    user.set_password(new_password)
     db.session.commit()
+    # Keep this session signed in; sessions elsewhere still carry the old generation
+    remember_password_generation(user)
     flash('Password changed successfully', 'success')
     return redirect(url_for('profile'))
 
@@ -738,7 +825,7 @@ def dashboard():
         total_posts = Post.query.count()
         
         # Get recent posts (only for the current user)
-        recent_posts = Post.query.filter_by(user_id=current_user.id, published=True).order_by(Post.created_at.desc()).limit(4).all()
+        recent_posts = with_relations(Post.query, Post).filter_by(user_id=current_user.id, published=True).order_by(Post.created_at.desc()).limit(4).all()
         
         # Get categories
         categories = Category.query.all()
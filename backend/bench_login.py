@@ -0,0 +1,121 @@
+"""Login throughput against concurrent public API reads
+
+Usage: python bench_login.py [seconds] [--inline]
+
+Serves the app from a fixed pool of request threads, like gunicorn's gthread
+worker, while login clients hammer /login and read clients fetch /api/posts.
+--inline hashes passwords on the request threads, as before the hashing pool.
+Creates a throwaway user in the configured database and removes it afterwards.
+"""
+import http.client
+import logging
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode
+from werkzeug.serving import BaseWSGIServer
+from werkzeug.security import generate_password_hash
+from app import app, db, User
+from password_pool import hash_password
+
+REQUEST_THREADS = 8
+LOGIN_CLIENTS = 16
+READ_CLIENTS = 8
+BENCH_USER = 'bench_login_user'
+BENCH_PASSWORD = 'bench-password'
+
+
+class BoundedServer(BaseWSGIServer):
+    """WSGI server handling connections on a fixed number of threads"""
+
+    def __init__(self, *args, threads=REQUEST_THREADS, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.pool = ThreadPoolExecutor(threads)
+
+    def process_request(self, request, client_address):
+        self.pool.submit(self._handle, request, client_address)
+
+    def _handle(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+
+def client_loop(port, deadline, method, path, body, results):
+    headers = {'Content-Type': 'application/x-www-form-urlencoded'} if body else {}
+    while time.monotonic() < deadline:
+        start = time.perf_counter()
+        conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+        try:
+            conn.request(method, path, body=body, headers=headers)
+            response = conn.getresponse()
+            status = response.status
+            retry_after = response.getheader('Retry-After')
+        except OSError:
+            status, retry_after = 'error', None
+        finally:
+            conn.close()
+        results.append((status, time.perf_counter() - start))
+        if retry_after:
+            # Well-behaved clients back off when told to
+            time.sleep(float(retry_after))
+
+
+def summarize(name, results, seconds):
+    ok = [t for status, t in results if status in (200, 302)]
+    statuses = {}
+    for status, _ in results:
+        statuses[status] = statuses.get(status, 0) + 1
+    ok.sort()
+    p99 = ok[min(len(ok) - 1, int(len(ok) * 0.99))] * 1000 if ok else float('nan')
+    print(f'{name:6} {len(ok) / seconds:8.1f} ok/s   p99 {p99:8.1f}ms   statuses {statuses}')
+
+
+if __name__ == '__main__':
+    args = [a for a in sys.argv[1:] if not a.startswith('--')]
+    seconds = float(args[0]) if args else 10
+    app.config['WTF_CSRF_ENABLED'] = False
+    # Measure hashing, not the auth rate limiter
+    app.config['RATE_LIMIT_ENABLED'] = False
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    if '--inline' in sys.argv:
+        app.extensions['password_pool'].kind = 'inline'
+
+    with app.app_context():
+        db.create_all()
+        user = User.query.filter_by(username=BENCH_USER).first() or User(username=BENCH_USER,
+                                                                        email=f'{BENCH_USER}@example.invalid')
+        user.password_hash = generate_password_hash(BENCH_PASSWORD)
+        db.session.add(user)
+        db.session.commit()
+    with app.test_request_context():
+        # Start the hashing processes before measuring
+        hash_password(BENCH_PASSWORD)
+
+    server = BoundedServer('127.0.0.1', 0, app)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        deadline = time.monotonic() + seconds
+        logins, reads = [], []
+        body = urlencode({'username': BENCH_USER, 'password': BENCH_PASSWORD})
+        clients = [threading.Thread(target=client_loop, args=(server.port, deadline, 'POST', '/login', body, logins))
+                   for _ in range(LOGIN_CLIENTS)]
+        clients += [threading.Thread(target=client_loop, args=(server.port, deadline, 'GET', '/api/posts', None, reads))
+                    for _ in range(READ_CLIENTS)]
+        for client in clients:
+            client.start()
+        for client in clients:
+            client.join()
+        print(f"{'inline' if '--inline' in sys.argv else 'pool'} hashing, {seconds:.0f}s, "
+              f'{REQUEST_THREADS} request threads')
+        summarize('login', logins, seconds)
+        summarize('read', reads, seconds)
+    finally:
+        server.shutdown()
+        with app.app_context():
+            User.query.filter_by(username=BENCH_USER).delete()
+            db.session.commit()
@@ -0,0 +1,55 @@
+"""Microbenchmark of the shared token-bucket table
+
+Usage: python bench_rate_limit.py [checks] [processes]
+
+Times single-process checks against one hot key and against many distinct
+keys, then has several processes drain one bucket at once to show that no
+token is handed out twice.
+"""
+import multiprocessing
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from rate_limit import TokenBucketTable
+
+
+def timed(table, keys, capacity=1000000, per_seconds=1):
+    start = time.perf_counter()
+    for key in keys:
+        table.take(key, capacity, per_seconds)
+    return (time.perf_counter() - start) / len(keys) * 1e6
+
+
+def drain(path, attempts, results):
+    table = TokenBucketTable(path)
+    allowed = sum(table.take('user:shared', 1000, 3600)[0] for _ in range(attempts))
+    results.put(allowed)
+
+
+if __name__ == '__main__':
+    checks = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    processes = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    directory = tempfile.mkdtemp(prefix='bench_rate_limit_')
+    try:
+        path = os.path.join(directory, 'rate_limit.bin')
+        table = TokenBucketTable(path)
+        print(f'hot key:       {timed(table, ["ip:203.0.113.7"] * checks):.2f}us per check')
+        keys = [f'ip:10.{random.randrange(256)}.{random.randrange(256)}.{random.randrange(256)}'
+                for _ in range(checks)]
+        print(f'{len(set(keys))} keys: {timed(table, keys):.2f}us per check ({table.slots} slots)')
+
+        results = multiprocessing.Queue()
+        workers = [multiprocessing.Process(target=drain, args=(path, 2000, results)) for _ in range(processes)]
+        start = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        allowed = sum(results.get() for _ in workers)
+        for worker in workers:
+            worker.join()
+        print(f'{processes} processes x 2000 checks on a 1000-token bucket: {allowed} allowed '
+              f'in {time.perf_counter() - start:.2f}s')
+    finally:
+        shutil.rmtree(directory)
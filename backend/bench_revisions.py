@@ -0,0 +1,102 @@
+"""Storage and reconstruction cost of post revision history
+
+Usage: python bench_revisions.py [revisions] [--keyframe-interval=N]
+
+Saves a throwaway post the given number of times (1,000 by default), each
+save editing, inserting or deleting a few lines of an ~8KB markdown body,
+then reports stored bytes per revision next to the size of compressed full
+snapshots, and the latency of reconstructing random revisions and diffing
+neighbours. The post and its revisions are removed afterwards.
+"""
+import random
+import statistics
+import sys
+import time
+import zlib
+from app import app, db, Category, Post, PostRevision, User
+from revisions import record_revision, revision_content, revision_diff
+
+BENCH_SLUG = 'bench-revisions-post'
+SAMPLES = 200
+
+
+def evolve(lines, rng):
+    """A few random line edits, as an author revising a post would make"""
+    lines = list(lines)
+    for _ in range(rng.randint(1, 3)):
+        i = rng.randrange(len(lines))
+        roll = rng.random()
+        if roll < 0.6:
+            lines[i] = lines[i].rstrip('\n') + f' edit{rng.randrange(10000)}\n'
+        elif roll < 0.85 or len(lines) < 50:
+            lines.insert(i, f'New sentence number {rng.randrange(100000)} about the topic.\n')
+        else:
+            del lines[i]
+    return lines
+
+
+def percentiles(samples):
+    samples = sorted(samples)
+    return (statistics.median(samples) * 1000, samples[int(len(samples) * 0.99) - 1] * 1000)
+
+
+if __name__ == '__main__':
+    args = [a for a in sys.argv[1:] if not a.startswith('--')]
+    count = int(args[0]) if args else 1000
+    for arg in sys.argv[1:]:
+        if arg.startswith('--keyframe-interval='):
+            app.config['REVISION_KEYFRAME_INTERVAL'] = int(arg.split('=', 1)[1])
+    rng = random.Random(42)
+    lines = [f'Paragraph {i}: some markdown text with *emphasis* and a [link](https://example.com/{i}).\n'
+             for i in range(100)]
+
+    with app.app_context():
+        db.create_all()
+        user = User.query.first()
+        category = Category.query.first()
+        if user is None or category is None:
+            sys.exit('Needs at least one user and one category in the database')
+        Post.query.filter_by(slug=BENCH_SLUG).delete()
+        post = Post(title='Revision benchmark', slug=BENCH_SLUG, content=''.join(lines),
+                    category_id=category.id, user_id=user.id)
+        db.session.add(post)
+        db.session.flush()
+        snapshot_bytes = 0
+        start = time.perf_counter()
+        for _ in range(count):
+            lines = evolve(lines, rng)
+            post.content = ''.join(lines)
+            snapshot_bytes += len(zlib.compress(post.content.encode('utf-8'), 9))
+            record_revision(PostRevision, post, user.id)
+            db.session.commit()
+        save_seconds = time.perf_counter() - start
+
+        try:
+            stored, raw, keyframes = db.session.query(
+                db.func.sum(db.func.length(PostRevision.data)), db.func.sum(PostRevision.size),
+                db.func.sum(db.case((PostRevision.is_keyframe, 1), else_=0))).filter_by(post_id=post.id).one()
+            print(f'{count} revisions of a ~{len(post.content) // 1024}KB post, '
+                  f"keyframe every {app.config.get('REVISION_KEYFRAME_INTERVAL', 20)}")
+            print(f'stored    {stored / count:8.0f} B/revision   ({keyframes} keyframes)')
+            print(f'snapshots {snapshot_bytes / count:8.0f} B/revision compressed, {raw / count:8.0f} raw')
+            print(f'save      {save_seconds / count * 1000:8.2f} ms/revision')
+
+            numbers = [rng.randint(1, count) for _ in range(SAMPLES)]
+            timings = []
+            for number in numbers:
+                db.session.expire_all()
+                start = time.perf_counter()
+                revision_content(PostRevision, post.id, number)
+                timings.append(time.perf_counter() - start)
+            print('rebuild   p50 {:6.2f} ms   p99 {:6.2f} ms'.format(*percentiles(timings)))
+            timings = []
+            for number in numbers:
+                db.session.expire_all()
+                start = time.perf_counter()
+                revision_diff(PostRevision, post.id, max(1, number - 1), number)
+                timings.append(time.perf_counter() - start)
+            print('diff      p50 {:6.2f} ms   p99 {:6.2f} ms'.format(*percentiles(timings)))
+        finally:
+            PostRevision.query.filter_by(post_id=post.id).delete()
+            db.session.delete(post)
+            db.session.commit()
@@ -0,0 +1,96 @@
+"""Latency of /api/search on a large generated corpus
+
+Usage: python bench_search.py [posts] [queries]
+
+Points the app at a throwaway SQLite database, fills it with posts (100,000
+by default) whose words follow a Zipf distribution, so some terms match
+nearly every post and most match a few, and then times /api/search for
+common, rare and multi-word queries through the test client.
+"""
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+directory = tempfile.mkdtemp()
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(directory, 'bench_search.db')}"
+
+from app import app, db, Category, Post, User  # noqa: E402
+
+VOCABULARY = 20000
+WORDS_PER_POST = 150
+BATCH = 5000
+
+
+def make_vocabulary(rng):
+    letters = 'abcdefghijklmnopqrstuvwxyz'
+    words = set()
+    while len(words) < VOCABULARY:
+        words.add(''.join(rng.choice(letters) for _ in range(rng.randint(3, 10))))
+    words = sorted(words, key=lambda w: rng.random())
+    cum_weights, total = [], 0.0
+    for rank in range(1, VOCABULARY + 1):
+        total += 1.0 / rank
+        cum_weights.append(total)
+    return words, cum_weights
+
+
+def populate(count, rng, words, cum_weights):
+    db.create_all()
+    user = User(username='bench_search', email='bench_search@example.invalid', password_hash='x')
+    category = Category(name='Bench', slug='bench', icon='fa-search')
+    db.session.add_all([user, category])
+    db.session.commit()
+    start = time.perf_counter()
+    for first in range(0, count, BATCH):
+        rows = []
+        for i in range(first, min(count, first + BATCH)):
+            body = rng.choices(words, cum_weights=cum_weights, k=WORDS_PER_POST)
+            rows.append({'title': ' '.join(body[:6]).title(), 'slug': f'bench-{i}', 'summary': ' '.join(body[6:26]),
+                         'content': ' '.join(body[26:]), 'published': True, 'read_time': 5,
+                         'category_id': category.id, 'user_id': user.id})
+        db.session.execute(Post.__table__.insert(), rows)
+        db.session.commit()
+    return time.perf_counter() - start
+
+
+def timed(client, queries):
+    timings, results = [], 0
+    for query in queries:
+        start = time.perf_counter()
+        response = client.get('/api/search', query_string={'q': query})
+        timings.append(time.perf_counter() - start)
+        results += len(response.get_json())
+    timings.sort()
+    p50 = statistics.median(timings) * 1000
+    p99 = timings[max(0, int(len(timings) * 0.99) - 1)] * 1000
+    return p50, p99, results / len(queries)
+
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    samples = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    rng = random.Random(7)
+    try:
+        words, cum_weights = make_vocabulary(rng)
+        with app.app_context():
+            seconds = populate(count, rng, words, cum_weights)
+        size = os.path.getsize(os.path.join(directory, 'bench_search.db')) / 1024 / 1024
+        print(f'{count} posts indexed in {seconds:.1f}s, database {size:.0f}MB')
+
+        client = app.test_client()
+        kinds = {
+            'common': [rng.choice(words[:20]) for _ in range(samples)],
+            'mid': [rng.choice(words[200:2000]) for _ in range(samples)],
+            'rare': [rng.choice(words[10000:]) for _ in range(samples)],
+            'two words': [f'{rng.choice(words[:200])} {rng.choice(words[:2000])}' for _ in range(samples)],
+            'three words': [' '.join(rng.choice(words[:2000]) for _ in range(3)) for _ in range(samples)],
+        }
+        for kind, queries in kinds.items():
+            p50, p99, results = timed(client, queries)
+            print(f'{kind:11} p50 {p50:6.2f} ms   p99 {p99:6.2f} ms   {results:5.1f} results/page')
+    finally:
+        shutil.rmtree(directory)
@@ -0,0 +1,86 @@
+"""Session load/save latency with a large number of live sessions
+
+Usage: python bench_sessions.py [live_sessions] [--filesystem]
+
+--filesystem also runs the same workload against the cachelib FileSystemCache
+used by SESSION_TYPE='filesystem', for comparison.
+"""
+import os
+import pickle
+import random
+import shutil
+import sys
+import tempfile
+import time
+import uuid
+from session_store import SessionDatabase
+
+SAMPLES = 5000
+SESSION_DATA = {'_permanent': True, '_fresh': True, '_user_id': '1', 'user_id': 1,
+                'username': 'admin', 'csrf_token': uuid.uuid4().hex * 2}
+
+
+def percentiles(timings):
+    timings = sorted(timings)
+    pick = lambda p: timings[min(len(timings) - 1, int(len(timings) * p))] * 1e6
+    return f'p50 {pick(0.5):7.1f}us  p99 {pick(0.99):7.1f}us  max {timings[-1] * 1e6:8.1f}us'
+
+
+def measure(fn, ids):
+    timings = []
+    for sid in ids:
+        start = time.perf_counter()
+        fn(sid)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def bench_sqlite(directory, live):
+    store = SessionDatabase(os.path.join(directory, 'sessions.db'))
+    expires = time.time() + 3600
+    ids = [f'session:{uuid.uuid4()}' for _ in range(live)]
+    blob = pickle.dumps(SESSION_DATA, pickle.HIGHEST_PROTOCOL)
+    start = time.perf_counter()
+    store.conn.execute('BEGIN')
+    store.conn.executemany('INSERT INTO sessions (id, data, expires) VALUES (?, ?, ?)',
+                           ((sid, blob, expires) for sid in ids))
+    store.conn.execute('COMMIT')
+    print(f'sqlite: populated {store.count()} sessions in {time.perf_counter() - start:.2f}s')
+
+    sample = random.sample(ids, min(SAMPLES, live))
+    print('sqlite load ', percentiles(measure(store.load, sample)))
+    print('sqlite save ', percentiles(measure(lambda sid: store.save(sid, SESSION_DATA, expires), sample)))
+    print('sqlite miss ', percentiles(measure(store.load, [f'session:{uuid.uuid4()}' for _ in range(SAMPLES)])))
+
+    # Expire a tenth of the sessions and time one background sweep
+    store.conn.executemany('UPDATE sessions SET expires = 0 WHERE id = ?', ((sid,) for sid in ids[::10]))
+    start = time.perf_counter()
+    removed = store.sweep()
+    print(f'sqlite sweep: removed {removed} expired sessions in {time.perf_counter() - start:.2f}s')
+
+
+def bench_filesystem(directory, live):
+    from cachelib.file import FileSystemCache
+    # Same threshold as Flask-Session's default SESSION_FILE_THRESHOLD
+    cache = FileSystemCache(os.path.join(directory, 'flask_session'), threshold=500)
+    ids = [f'session:{uuid.uuid4()}' for _ in range(live)]
+    start = time.perf_counter()
+    for sid in ids:
+        cache.set(sid, SESSION_DATA, 3600)
+    print(f'filesystem: populated in {time.perf_counter() - start:.2f}s '
+          f'({len(os.listdir(cache._path))} files left after pruning)')
+    sample = random.sample(ids, min(SAMPLES, live))
+    print('filesystem load ', percentiles(measure(cache.get, sample)))
+    print('filesystem save ', percentiles(measure(lambda sid: cache.set(sid, SESSION_DATA, 3600), sample)))
+
+
+if __name__ == '__main__':
+    args = [a for a in sys.argv[1:] if not a.startswith('--')]
+    live = int(args[0]) if args else 100000
+    directory = tempfile.mkdtemp(prefix='bench_sessions_')
+    try:
+        bench_sqlite(directory, live)
+        if '--filesystem' in sys.argv:
+            bench_filesystem(directory, live)
+    finally:
+        shutil.rmtree(directory)
@@ -0,0 +1,120 @@
+"""Concurrent read/write latency of SQLite with and without the production profile
+
+Usage: python bench_sqlite.py [seconds] [readers]
+
+Builds a throwaway database of posts for each profile, then runs reader
+processes listing recent posts while one writer process keeps updating
+posts in short transactions, like gunicorn workers serving visitors while
+an admin saves. Reports read latency percentiles, read and write
+throughput, and lock errors.
+"""
+import multiprocessing
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+from db_profile import apply_sqlite_pragmas, engine_options
+
+POSTS = 5000
+ROWS_PER_WRITE = 50
+
+READ = text('SELECT id, title, summary, created_at FROM post WHERE published = 1 '
+            'ORDER BY created_at DESC LIMIT 20 OFFSET :offset')
+WRITE = text('UPDATE post SET content = :content, updated_at = CURRENT_TIMESTAMP WHERE id = :id')
+
+
+def make_engine(path, profile):
+    url = f'sqlite:///{path}'
+    if profile == 'default':
+        return create_engine(url)
+    options = engine_options({'SQLALCHEMY_DATABASE_URI': url, 'DB_POOL_SIZE': 1})
+    engine = create_engine(url, **options)
+    apply_sqlite_pragmas(engine)
+    return engine
+
+
+def populate(engine):
+    with engine.begin() as conn:
+        conn.execute(text('CREATE TABLE post (id INTEGER PRIMARY KEY, title TEXT, summary TEXT, '
+                          'content TEXT, published INTEGER, created_at TEXT, updated_at TEXT)'))
+        conn.execute(text('CREATE INDEX ix_post_created ON post (created_at)'))
+        conn.execute(text("INSERT INTO post (title, summary, content, published, created_at) "
+                          "VALUES (:title, :summary, :content, 1, datetime('now', :age))"),
+                     [{'title': f'Post {i}', 'summary': 'summary ' * 10, 'content': 'body ' * 800,
+                       'age': f'-{i} minutes'} for i in range(POSTS)])
+
+
+def reader(path, profile, deadline, results):
+    engine = make_engine(path, profile)
+    rng = random.Random()
+    latencies, errors = [], 0
+    while time.time() < deadline:
+        start = time.perf_counter()
+        try:
+            with engine.connect() as conn:
+                conn.execute(READ, {'offset': rng.randrange(0, 200)}).fetchall()
+            latencies.append(time.perf_counter() - start)
+        except OperationalError:
+            errors += 1
+    results.put(('read', latencies, errors))
+
+
+def writer(path, profile, deadline, results):
+    engine = make_engine(path, profile)
+    rng = random.Random()
+    writes, errors = 0, 0
+    while time.time() < deadline:
+        try:
+            with engine.begin() as conn:
+                conn.execute(WRITE, [{'id': rng.randrange(1, POSTS + 1), 'content': f'edit {rng.random()} ' * 800}
+                                     for _ in range(ROWS_PER_WRITE)])
+            writes += 1
+        except OperationalError:
+            errors += 1
+    results.put(('write', writes, errors))
+
+
+def run(profile, seconds, readers):
+    directory = tempfile.mkdtemp()
+    try:
+        path = os.path.join(directory, 'bench.db')
+        engine = make_engine(path, profile)
+        populate(engine)
+        engine.dispose()
+        results = multiprocessing.Queue()
+        deadline = time.time() + seconds
+        processes = [multiprocessing.Process(target=reader, args=(path, profile, deadline, results))
+                     for _ in range(readers)]
+        processes.append(multiprocessing.Process(target=writer, args=(path, profile, deadline, results)))
+        for process in processes:
+            process.start()
+        latencies, writes, errors = [], 0, 0
+        for _ in processes:
+            kind, value, failed = results.get()
+            if kind == 'read':
+                latencies.extend(value)
+            else:
+                writes = value
+            errors += failed
+        for process in processes:
+            process.join()
+        latencies.sort()
+        p50 = statistics.median(latencies) * 1000 if latencies else float('nan')
+        p99 = latencies[int(len(latencies) * 0.99) - 1] * 1000 if latencies else float('nan')
+        print(f'{profile:10} reads {len(latencies) / seconds:8.0f}/s   p50 {p50:7.2f}ms   p99 {p99:8.2f}ms   '
+              f'writes {writes / seconds:6.1f}/s   lock errors {errors}')
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 5
+    readers = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    print(f'{readers} reader processes, 1 writer ({ROWS_PER_WRITE} rows per commit), {seconds:.0f}s per profile')
+    for profile in ('default', 'production'):
+        run(profile, seconds, readers)
@@ -0,0 +1,62 @@
+"""Lookup latency and memory of the typeahead index
+
+Usage: python bench_suggest.py [posts] [lookups]
+
+Builds a SuggestIndex from generated titles (20,000 by default, the default
+per-worker cap) without a database, then times lookups for one to five
+typed characters and a few incremental title edits.
+"""
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+from suggest import SuggestIndex
+
+WORDS = ('python flask sqlite search index cache async worker deploy docker postgres query static '
+         'image session login token stream feed markdown render template revision draft design '
+         'performance profiling memory latency throughput scaling tutorial guide notes intro').split()
+
+
+def title(rng):
+    return ' '.join(rng.choice(WORDS) for _ in range(rng.randint(3, 9))).capitalize()
+
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    lookups = int(sys.argv[2]) if len(sys.argv) > 2 else 5000
+    rng = random.Random(3)
+    posts = [(i, title(rng), f'post-{i}') for i in range(1, count + 1)]
+    categories = [(i, word.capitalize(), word) for i, word in enumerate(WORDS[:12], 1)]
+
+    start = time.perf_counter()
+    index = SuggestIndex(max_posts=count)
+    index.replace(posts, categories)
+    build = time.perf_counter() - start
+    # Measured on a second build, tracemalloc slows the first one down several times
+    tracemalloc.start()
+    measured = SuggestIndex(max_posts=count)
+    measured.replace(posts, categories)
+    memory = tracemalloc.get_traced_memory()[0] / 1024 / 1024
+    tracemalloc.stop()
+    del measured
+    print(f'{count} posts: {len(index)} keys built in {build * 1000:.0f}ms, {memory:.1f}MB')
+
+    for length in range(1, 6):
+        queries = [rng.choice(WORDS)[:length] for _ in range(lookups)]
+        timings = []
+        for query in queries:
+            start = time.perf_counter()
+            index.lookup(query)
+            timings.append(time.perf_counter() - start)
+        timings.sort()
+        print(f'{length} chars  p50 {statistics.median(timings) * 1e6:7.1f}us   '
+              f'p99 {timings[int(len(timings) * 0.99) - 1] * 1e6:7.1f}us')
+
+    timings = []
+    for _ in range(200):
+        post_id = rng.randint(1, count)
+        start = time.perf_counter()
+        index.set_post(post_id, title(rng), f'post-{post_id}', True)
+        timings.append(time.perf_counter() - start)
+    print(f'edit     p50 {statistics.median(timings) * 1e6:7.1f}us   max {max(timings) * 1e6:7.1f}us')
@@ -0,0 +1,185 @@
+import mmap
+import os
+import struct
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from flask import current_app, request
+from sqlalchemy import event, inspect
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# File layout: sequence number, content version, last change in milliseconds since the epoch.
+# The sequence is odd while a bump is in progress so readers never see a torn value.
+_LAYOUT = struct.Struct('<QQQ')
+_SEQ = struct.Struct('<Q')
+# Random value picked when the file is created, after the fields above. Versions restart at 0
+# in a new file, so validators include it to tell a version 5 from an earlier file's version 5
+_EPOCH = struct.Struct('<Q')
+_FILE_SIZE = _LAYOUT.size + _EPOCH.size
+# Lock-free read attempts before waiting on the file lock; a bump holds the sequence odd for microseconds
+READ_SPINS = 1000
+
+
+@contextmanager
+def file_lock(fd):
+    """Exclusive lock on an open file, held across processes"""
+    if fcntl:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+    else:
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            os.lseek(fd, 0, os.SEEK_SET)
+            msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+
+
+class ContentVersion:
+    """Monotonic content version shared by every worker through a small mmap'd file
+
+    Reads are a few bytes from shared memory, so they are cheap enough to do on
+    every request. Bumps take an exclusive file lock so concurrent writers in
+    different processes never lose an increment.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        self._lock = threading.Lock()
+        with self._file_lock():
+            if os.fstat(self._fd).st_size < _FILE_SIZE:
+                os.ftruncate(self._fd, _FILE_SIZE)
+            self._map = mmap.mmap(self._fd, _FILE_SIZE)
+            self._repair()
+            seq, version, updated_ms = _LAYOUT.unpack_from(self._map)
+            if updated_ms == 0:
+                # Fresh file: start at version 0 as of now
+                _LAYOUT.pack_into(self._map, 0, 0, 0, int(time.time() * 1000))
+            if _EPOCH.unpack_from(self._map, _LAYOUT.size)[0] == 0:
+                # Fresh file, or one written before the epoch existed
+                _EPOCH.pack_into(self._map, _LAYOUT.size, int.from_bytes(os.urandom(4), 'big') | 1)
+            # Fixed for the life of the file, so it is read once
+            self.epoch = _EPOCH.unpack_from(self._map, _LAYOUT.size)[0]
+
+    def _file_lock(self):
+        return file_lock(self._fd)
+
+    def _repair(self):
+        """Even out a sequence left odd by a process that died mid-bump; caller holds the file lock
+
+        Nobody else can be bumping while the lock is held, so an odd sequence
+        is abandoned. The version fields hold either the old or the new value,
+        both complete, so publishing them as they are is safe.
+        """
+        seq = _SEQ.unpack_from(self._map)[0]
+        if seq % 2:
+            _SEQ.pack_into(self._map, 0, seq + 1)
+
+    def read(self):
+        """Return (version, updated_at) as currently published to all workers"""
+        for _ in range(READ_SPINS):
+            seq, version, updated_ms = _LAYOUT.unpack_from(self._map)
+            if seq % 2 == 0 and _SEQ.unpack_from(self._map)[0] == seq:
+                return version, datetime.fromtimestamp(updated_ms / 1000, tz=timezone.utc)
+        # Still odd: wait out a bump in progress, or repair one whose process died
+        with self._lock, self._file_lock():
+            self._repair()
+            seq, version, updated_ms = _LAYOUT.unpack_from(self._map)
+            return version, datetime.fromtimestamp(updated_ms / 1000, tz=timezone.utc)
+
+    @property
+    def version(self):
+        return self.read()[0]
+
+    def bump(self):
+        """Atomically increment the version and return the new value"""
+        with self._lock, self._file_lock():
+            seq, version, _ = _LAYOUT.unpack_from(self._map)
+            _SEQ.pack_into(self._map, 0, seq + 1)
+            _LAYOUT.pack_into(self._map, 0, seq + 1, version + 1, int(time.time() * 1000))
+            _SEQ.pack_into(self._map, 0, seq + 2)
+            return version + 1
+
+
+def _add_version_headers(response):
+    if request.path.startswith(current_app.config.get('CONTENT_VERSION_PREFIX', '/api/')):
+        version, updated_at = current_version()
+        if response.last_modified is None:
+            response.last_modified = updated_at
+        if response.status_code == 200 and not response.get_etag()[0]:
+            response.set_etag(f'v{version}')
+    return response
+
+
+def _changed_attributes(obj):
+    return {attr.key for attr in inspect(obj).attrs if attr.history.has_changes()}
+
+
+def bump_on_commit(db, models, tracker, flag, ignored=()):
+    """Bump tracker after every commit that inserted, changed or deleted one of models
+
+    flag is the session.info key marking a pending change between flush and commit.
+    Updates that only change attributes named in ignored do not count.
+    """
+    models = tuple(models)
+    ignored = set(ignored)
+
+    def note_changes(session, flush_context):
+        # new/dirty/deleted and attribute history still describe what this flush wrote
+        touched = [obj for obj in list(session.new) + list(session.deleted) if isinstance(obj, models)]
+        touched += [obj for obj in session.dirty if isinstance(obj, models) and session.is_modified(obj)
+                    and (not ignored or _changed_attributes(obj) - ignored)]
+        if touched:
+            session.info[flag] = True
+
+    def bump_after_commit(session):
+        if session.info.pop(flag, False):
+            tracker.bump()
+
+    def forget_changes(session, previous_transaction):
+        session.info.pop(flag, None)
+
+    event.listen(db.session, 'after_flush', note_changes)
+    event.listen(db.session, 'after_commit', bump_after_commit)
+    event.listen(db.session, 'after_soft_rollback', forget_changes)
+
+
+def init_content_version(app, db, models):
+    """Bump the shared content version whenever a commit touches one of models
+
+    Responses under CONTENT_VERSION_PREFIX get Last-Modified and ETag headers
+    derived from the version.
+    """
+    path = app.config.get('CONTENT_VERSION_FILE') or os.path.join(app.instance_path, 'content_version.bin')
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tracker = ContentVersion(path)
+    app.extensions['content_version'] = tracker
+    bump_on_commit(db, models, tracker, 'content_changed')
+    app.after_request(_add_version_headers)
+    return tracker
+
+
+def current_version():
+    """(version, updated_at) for the running app"""
+    return current_app.extensions['content_version'].read()
+
+
+def content_epoch():
+    """Random id of the version file, which changes when the file is recreated"""
+    return current_app.extensions['content_version'].epoch
+
+
+def bump_version():
+    """Force a new content version, e.g. after changes made outside the ORM"""
+    return current_app.extensions['content_version'].bump()
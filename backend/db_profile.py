@@ -0,0 +1,102 @@
+import os
+from flask import current_app
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from images import gevent_patched
+
+# Applied to every new SQLite connection under the production profile
+SQLITE_PRAGMAS = {
+    # Readers keep reading while a writer commits, instead of waiting on the database lock
+    'journal_mode': 'WAL',
+    # Safe with WAL: a power loss may drop the last commits but never corrupts the file
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,
+    # Negative values are KiB, so 64MB of page cache per connection
+    'cache_size': -64000,
+    # Wait for a competing writer instead of failing at once with "database is locked"
+    'busy_timeout': 5000,
+    'temp_store': 'MEMORY',
+}
+DEFAULT_POOL_TIMEOUT = 10
+# Managed Postgres drops idle connections; recycle ours before it does
+DEFAULT_POOL_RECYCLE = 1800
+# Rows fetched per round trip when a listing is streamed
+DEFAULT_STREAM_BATCH = 500
+
+
+def database_url(default):
+    """DATABASE_URL from the environment, as SQLAlchemy expects it, or default"""
+    url = os.environ.get('DATABASE_URL') or default
+    # Heroku-style providers still hand out the postgres:// scheme SQLAlchemy 1.4+ rejects
+    if url.startswith('postgres://'):
+        url = 'postgresql://' + url[len('postgres://'):]
+    return url
+
+
+def default_pool_limits():
+    """(pool_size, max_overflow) for the gunicorn worker model this process runs under"""
+    if gevent_patched():
+        # Thousands of greenlets share a worker; most hold streams, not connections
+        return 10, 10
+    # One connection per request thread of a gthread worker, a few spare for background threads
+    return int(os.environ.get('GUNICORN_THREADS', 8)), 4
+
+
+def engine_options(config):
+    """SQLALCHEMY_ENGINE_OPTIONS for the configured database under the production profile"""
+    url = make_url(config['SQLALCHEMY_DATABASE_URI'])
+    sqlite = url.get_backend_name() == 'sqlite'
+    if sqlite and url.database in (None, '', ':memory:'):
+        # In-memory databases live in a single connection, sizing a pool makes no sense
+        return {}
+    pool_size, max_overflow = default_pool_limits()
+    options = {
+        'pool_size': config.get('DB_POOL_SIZE', pool_size),
+        'max_overflow': config.get('DB_MAX_OVERFLOW', max_overflow),
+        'pool_timeout': config.get('DB_POOL_TIMEOUT', DEFAULT_POOL_TIMEOUT),
+    }
+    if not sqlite:
+        # Server connections can be closed under us by restarts, failovers and idle timeouts
+        options['pool_recycle'] = config.get('DB_POOL_RECYCLE', DEFAULT_POOL_RECYCLE)
+        options['pool_pre_ping'] = config.get('DB_POOL_PRE_PING', True)
+    return options
+
+
+def stream_query(query, batch_size=None):
+    """Iterate a large ORM query in batches; Postgres streams it through a server-side cursor"""
+    return query.yield_per(batch_size or current_app.config.get('DB_STREAM_BATCH', DEFAULT_STREAM_BATCH))
+
+
+def apply_sqlite_pragmas(engine, pragmas=None):
+    """Run pragmas on every connection engine opens, once, when it is created"""
+    pragmas = SQLITE_PRAGMAS if pragmas is None else pragmas
+
+    @event.listens_for(engine, 'connect')
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f'PRAGMA {name}={value}')
+        finally:
+            cursor.close()
+
+    return set_pragmas
+
+
+def configure_database(app):
+    """Fill in pool settings before Flask-SQLAlchemy creates its engine"""
+    if app.config.get('DB_PROFILE', 'production') != 'production':
+        return
+    options = engine_options(app.config)
+    options.update(app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {}))
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = options
+
+
+def init_db_profile(app, db):
+    """Tune SQLite connections of the app's engine under the production profile"""
+    if app.config.get('DB_PROFILE', 'production') != 'production':
+        return
+    with app.app_context():
+        engine = db.engine
+    if engine.dialect.name == 'sqlite':
+        apply_sqlite_pragmas(engine, app.config.get('SQLITE_PRAGMAS'))
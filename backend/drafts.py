@@ -0,0 +1,230 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from flask import current_app
+
+logger = logging.getLogger(__name__)
+
+# Post fields an autosave may change
+DRAFT_FIELDS = ('title', 'content', 'summary', 'slug', 'category_id', 'read_time')
+_INT_FIELDS = ('category_id', 'read_time')
+# A post's autosaves are written at most once per this many seconds
+DEFAULT_FLUSH_DELAY = 2.0
+# Posts whose last written hash is remembered per worker
+HASH_MEMORY = 1024
+
+
+def _int_or_none(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def draft_fields(data, post):
+    """Normalized draft values from an autosave payload, falling back to the post's own"""
+    fields = {}
+    for name in DRAFT_FIELDS:
+        value = data.get(name)
+        if value is None or (value == '' and name in _INT_FIELDS):
+            value = getattr(post, name)
+        fields[name] = _int_or_none(value) if name in _INT_FIELDS else (value or '')
+    return fields
+
+
+def content_hash(fields):
+    return hashlib.sha256(json.dumps(fields, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def is_stale(base_updated_at, post_updated_at):
+    """True if the post was saved after the edit a draft was based on"""
+    return base_updated_at is not None and post_updated_at is not None and base_updated_at < post_updated_at
+
+
+class DraftBuffer:
+    """Write-behind buffer coalescing a post's rapid autosaves into one draft write
+
+    Each autosave replaces the post's pending draft; a background thread
+    writes pending drafts once they are flush_delay seconds old. Saves whose
+    content hash matches what was last written are dropped.
+    """
+
+    def __init__(self, write, flush_delay=DEFAULT_FLUSH_DELAY):
+        self.write = write
+        self.flush_delay = flush_delay
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._hashes = OrderedDict()
+        self._pid = None
+        self.stats = {'received': 0, 'unchanged': 0, 'coalesced': 0, 'written': 0}
+
+    def _ensure_flusher(self):
+        # Threads do not survive a fork, so start the flusher in each worker process
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                self._pid = os.getpid()
+                threading.Thread(target=self._flush_forever, name='draft-flusher', daemon=True).start()
+
+    def _flush_forever(self):
+        while True:
+            time.sleep(self.flush_delay / 2)
+            try:
+                self.flush(due_only=True)
+            except Exception:
+                logger.exception('Draft flush failed')
+
+    def known_hash(self, post_id):
+        with self._lock:
+            pending = self._pending.get(post_id)
+            return pending['hash'] if pending else self._hashes.get(post_id)
+
+    def remember(self, post_id, digest):
+        with self._lock:
+            self._hashes[post_id] = digest
+            self._hashes.move_to_end(post_id)
+            while len(self._hashes) > HASH_MEMORY:
+                self._hashes.popitem(last=False)
+
+    def submit(self, post_id, user_id, fields, digest, base_updated_at=None):
+        """Queue a draft of the post as of base_updated_at; returns 'unchanged', 'queued' or 'coalesced'"""
+        self._ensure_flusher()
+        with self._lock:
+            self.stats['received'] += 1
+            pending = self._pending.get(post_id)
+            last = pending['hash'] if pending else self._hashes.get(post_id)
+            if last == digest:
+                self.stats['unchanged'] += 1
+                return 'unchanged'
+            if pending:
+                self.stats['coalesced'] += 1
+                pending.update(fields=fields, hash=digest, saved_at=datetime.utcnow(), base=base_updated_at)
+                return 'coalesced'
+            self._pending[post_id] = {'user_id': user_id, 'fields': fields, 'hash': digest, 'base': base_updated_at,
+                                      'saved_at': datetime.utcnow(), 'due': time.monotonic() + self.flush_delay}
+            return 'queued'
+
+    def flush(self, post_id=None, due_only=False):
+        """Write pending drafts: all of them, only those that are due, or a single post's"""
+        now = time.monotonic()
+        with self._lock:
+            if post_id is not None:
+                ready = [post_id] if post_id in self._pending else []
+            else:
+                ready = [pid for pid, p in self._pending.items() if not due_only or p['due'] <= now]
+            batch = {pid: self._pending.pop(pid) for pid in ready}
+        if not batch:
+            return 0
+        try:
+            self.write(batch)
+        except Exception:
+            # Put the drafts back unless a newer autosave arrived meanwhile
+            with self._lock:
+                for pid, pending in batch.items():
+                    self._pending.setdefault(pid, pending)
+            raise
+        with self._lock:
+            for pid, pending in batch.items():
+                self._hashes[pid] = pending['hash']
+            self.stats['written'] += len(batch)
+        return len(batch)
+
+    def discard(self, post_id):
+        with self._lock:
+            self._pending.pop(post_id, None)
+            self._hashes.pop(post_id, None)
+
+
+def get_drafts():
+    return current_app.extensions['drafts']
+
+
+def _session():
+    return current_app.extensions['sqlalchemy'].session
+
+
+def autosave(post, user_id, data):
+    """Buffer an autosave of post; returns 'unchanged', 'queued' or 'coalesced'
+
+    The post row itself is never written, so its updated_at, the content
+    version and every public cache stay as they are until the post is saved.
+    """
+    drafts = get_drafts()
+    fields = draft_fields(data, post)
+    if drafts.known_hash(post.id) is None:
+        # First autosave of this post in this worker: compare with the stored draft, else the post
+        stored = _session().query(drafts.draft_model.content_hash, drafts.draft_model.base_updated_at) \
+            .filter(drafts.draft_model.post_id == post.id).first()
+        if stored is None or is_stale(stored.base_updated_at, post.updated_at):
+            drafts.remember(post.id, content_hash(draft_fields({}, post)))
+        else:
+            drafts.remember(post.id, stored.content_hash)
+    return drafts.submit(post.id, user_id, fields, content_hash(fields), post.updated_at)
+
+
+def load_draft(post):
+    """The latest draft of a post as a dict, or None if there is none newer than the post's last save"""
+    drafts = get_drafts()
+    drafts.flush(post.id)
+    draft = _session().get(drafts.draft_model, post.id)
+    # Another worker may have flushed an autosave made before the save that dropped its draft
+    if draft is None or is_stale(draft.base_updated_at, post.updated_at):
+        return None
+    data = {name: getattr(draft, name) for name in DRAFT_FIELDS}
+    data['saved_at'] = draft.saved_at.isoformat() if draft.saved_at else None
+    return data
+
+
+def drop_draft(post_id):
+    """Forget a post's draft, e.g. once its changes were saved to the post
+
+    Autosaves still buffered in other workers are dropped when they flush,
+    since they are based on an older updated_at than the saved post.
+    """
+    drafts = get_drafts()
+    drafts.discard(post_id)
+    _session().query(drafts.draft_model).filter(drafts.draft_model.post_id == post_id).delete()
+
+
+def init_drafts(app, db, draft_model, post_model):
+    """Create the worker's DraftBuffer writing drafts of post_model rows into draft_model"""
+
+    def write(batch):
+        with app.app_context():
+            try:
+                updated = dict(db.session.query(post_model.id, post_model.updated_at)
+                               .filter(post_model.id.in_(list(batch))))
+                for post_id, pending in batch.items():
+                    # Skip posts deleted, or saved, since the autosave was made
+                    if post_id not in updated or is_stale(pending['base'], updated[post_id]):
+                        continue
+                    draft = db.session.get(draft_model, post_id)
+                    # Another worker may already hold a newer autosave of this post
+                    if draft is not None and draft.saved_at and draft.saved_at > pending['saved_at']:
+                        continue
+                    if draft is None:
+                        draft = draft_model(post_id=post_id)
+                        db.session.add(draft)
+                    for name, value in pending['fields'].items():
+                        setattr(draft, name, value)
+                    draft.user_id = pending['user_id']
+                    draft.content_hash = pending['hash']
+                    draft.saved_at = pending['saved_at']
+                    draft.base_updated_at = pending['base']
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                raise
+            finally:
+                db.session.remove()
+
+    buffer = DraftBuffer(write, app.config.get('AUTOSAVE_FLUSH_DELAY', DEFAULT_FLUSH_DELAY))
+    buffer.draft_model = draft_model
+    app.extensions['drafts'] = buffer
+    return buffer
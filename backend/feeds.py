@@ -0,0 +1,243 @@
+import os
+import re
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from xml.sax.saxutils import escape, quoteattr
+import click
+from flask import abort, current_app
+from sqlalchemy import func
+from snapshot import Snapshot
+
+FEED_SIZE = 20
+# Protocol limit for one sitemap file; larger sites get a sitemap index
+DEFAULT_URLS_PER_SITEMAP = 50000
+FEED_CACHE_CONTROL = 'public, max-age=300'
+DEFAULT_SITE_TITLE = 'Dipayan Dutta Blog'
+FEEDS_DIR = 'feeds'
+
+_SHARD_PATH = re.compile(r'/sitemap-posts-(\d+)\.xml')
+
+
+def get_feeds():
+    return current_app.extensions['feeds']
+
+
+def _session():
+    return current_app.extensions['sqlalchemy'].session
+
+
+def _site_url():
+    """Configured public origin, or None
+
+    The request's Host header is never used: the files are stored and served
+    to everyone, so a spoofed header would end up in every reader's feed.
+    """
+    url = current_app.config.get('SITE_URL')
+    return url.rstrip('/') if url else None
+
+
+def _utc(value):
+    return (value or datetime.utcnow()).replace(tzinfo=timezone.utc)
+
+
+def _w3c(value):
+    return _utc(value).isoformat(timespec='seconds')
+
+
+def _urls_per_sitemap():
+    return current_app.config.get('SITEMAP_URLS_PER_FILE', DEFAULT_URLS_PER_SITEMAP)
+
+
+def _write_xml(feeds, url_path, body, mimetype, last_modified=None):
+    headers = {'Last-Modified': format_datetime(_utc(last_modified), usegmt=True)} if last_modified else None
+    return feeds.write(url_path, body.encode('utf-8'), mimetype, FEED_CACHE_CONTROL, headers)
+
+
+def _latest(post_model, category_model):
+    # Read in (published, created_at, id) index order, so only FEED_SIZE rows are touched
+    return _session().query(post_model.title, post_model.slug, post_model.summary, post_model.excerpt,
+                            post_model.created_at, post_model.updated_at, category_model.name.label('category')) \
+        .outerjoin(category_model, post_model.category_id == category_model.id) \
+        .filter(post_model.published == True) \
+        .order_by(post_model.created_at.desc(), post_model.id.desc()).limit(FEED_SIZE).all()
+
+
+def rss_feed(posts, site, title):
+    items = []
+    for post in posts:
+        link = escape(f'{site}/blog/{post.slug}')
+        category = f'<category>{escape(post.category)}</category>' if post.category else ''
+        items.append(
+            f'<item><title>{escape(post.title)}</title><link>{link}</link>'
+            f'<guid isPermaLink="true">{link}</guid>'
+            f'<pubDate>{format_datetime(_utc(post.created_at), usegmt=True)}</pubDate>{category}'
+            f'<description>{escape(post.summary or post.excerpt or "")}</description></item>'
+        )
+    updated = max((_utc(post.updated_at) for post in posts), default=_utc(None))
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<rss version="2.0" xmlns:atom="http://www.w3.org/2005/Atom"><channel>'
+        f'<title>{escape(title)}</title><link>{escape(site)}/</link><description>{escape(title)}</description>'
+        f'<atom:link href={quoteattr(site + "/feed.xml")} rel="self" type="application/rss+xml"/>'
+        f'<lastBuildDate>{format_datetime(updated, usegmt=True)}</lastBuildDate>'
+        + ''.join(items) + '</channel></rss>\n'
+    )
+
+
+def atom_feed(posts, site, title):
+    entries = []
+    for post in posts:
+        link = f'{site}/blog/{post.slug}'
+        category = f'<category term={quoteattr(post.category)}/>' if post.category else ''
+        entries.append(
+            f'<entry><title>{escape(post.title)}</title><link href={quoteattr(link)}/><id>{escape(link)}</id>'
+            f'<published>{_w3c(post.created_at)}</published><updated>{_w3c(post.updated_at)}</updated>{category}'
+            f'<summary>{escape(post.summary or post.excerpt or "")}</summary></entry>'
+        )
+    updated = max((_w3c(post.updated_at) for post in posts), default=_w3c(None))
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<feed xmlns="http://www.w3.org/2005/Atom">'
+        f'<title>{escape(title)}</title><id>{escape(site)}/</id><updated>{updated}</updated>'
+        f'<link href={quoteattr(site + "/")}/><link href={quoteattr(site + "/atom.xml")} rel="self"/>'
+        f'<author><name>{escape(title)}</name></author>'
+        + ''.join(entries) + '</feed>\n'
+    )
+
+
+def urlset(urls):
+    """Sitemap for [(location, lastmod datetime or None)]"""
+    body = ''.join(f'<url><loc>{escape(loc)}</loc>' + (f'<lastmod>{_w3c(lastmod)}</lastmod>' if lastmod else '')
+                   + '</url>' for loc, lastmod in urls)
+    return ('<?xml version="1.0" encoding="UTF-8"?>\n'
+            '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">' + body + '</urlset>\n')
+
+
+def sitemap_index(sitemaps):
+    """Sitemap index for [(location, lastmod datetime or None)]"""
+    body = ''.join(f'<sitemap><loc>{escape(loc)}</loc>' + (f'<lastmod>{_w3c(lastmod)}</lastmod>' if lastmod else '')
+                   + '</sitemap>' for loc, lastmod in sitemaps)
+    return ('<?xml version="1.0" encoding="UTF-8"?>\n'
+            '<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">' + body + '</sitemapindex>\n')
+
+
+def _shard_urls(post_model, shard, size, site):
+    """(urls, newest updated_at) of the published posts whose id falls in shard"""
+    # A primary key range, so a shard costs the same however large the table grows
+    rows = _session().query(post_model.slug, post_model.updated_at) \
+        .filter(post_model.id > shard * size, post_model.id <= (shard + 1) * size, post_model.published == True) \
+        .order_by(post_model.id)
+    urls = [(f'{site}/blog/{row.slug}', row.updated_at) for row in rows]
+    return urls, max((lastmod for _, lastmod in urls if lastmod), default=None)
+
+
+def _write_feeds(feeds, post_model, category_model, site):
+    posts = _latest(post_model, category_model)
+    title = current_app.config.get('SITE_TITLE', DEFAULT_SITE_TITLE)
+    newest = max((post.updated_at for post in posts if post.updated_at), default=None)
+    _write_xml(feeds, '/feed.xml', rss_feed(posts, site, title), 'application/rss+xml', newest)
+    _write_xml(feeds, '/atom.xml', atom_feed(posts, site, title), 'application/atom+xml', newest)
+
+
+def _write_sitemaps(feeds, post_model, site, post_ids=None):
+    """Rewrite the sitemap shards holding post_ids (all shards when None) and /sitemap.xml
+
+    Posts are sharded by id, so a saved post only touches its own shard. Up
+    to one file's worth, /sitemap.xml is the single urlset itself; past that
+    it becomes an index of /sitemap-posts-<n>.xml files.
+    """
+    # Shards hold one id fewer than a file allows, leaving room for the home page in the first
+    size = _urls_per_sitemap() - 1
+    max_id = _session().query(func.max(post_model.id)).scalar() or 0
+    count = max(1, -(-max_id // size))
+    home = [(f'{site}/', None)]
+    if count == 1:
+        urls, newest = _shard_urls(post_model, 0, size, site)
+        _write_xml(feeds, '/sitemap.xml', urlset(home + urls), 'application/xml', newest)
+        for url_path in [path for path in feeds.entries if _SHARD_PATH.fullmatch(path)]:
+            feeds.remove(url_path)
+        return
+
+    existing = {int(_SHARD_PATH.fullmatch(path).group(1)) for path in feeds.entries if _SHARD_PATH.fullmatch(path)}
+    if post_ids is None or existing != set(range(count)):
+        shards = set(range(count))
+    else:
+        shards = {(post_id - 1) // size for post_id in post_ids}
+    for shard in sorted(shards & set(range(count))):
+        urls, newest = _shard_urls(post_model, shard, size, site)
+        _write_xml(feeds, f'/sitemap-posts-{shard}.xml', urlset((home if shard == 0 else []) + urls),
+                   'application/xml', newest)
+    for shard in existing - set(range(count)):
+        feeds.remove(f'/sitemap-posts-{shard}.xml')
+
+    # Shard lastmods come from their stored Last-Modified headers, so the index needs no query
+    sitemaps = []
+    for shard in range(count):
+        modified = feeds.entries[f'/sitemap-posts-{shard}.xml']['headers'].get('Last-Modified')
+        sitemaps.append((f'{site}/sitemap-posts-{shard}.xml', parsedate_to_datetime(modified) if modified else None))
+    newest = max((lastmod for _, lastmod in sitemaps if lastmod), default=None)
+    _write_xml(feeds, '/sitemap.xml', sitemap_index(sitemaps), 'application/xml', newest)
+
+
+def build_feeds(post_model, category_model):
+    """Write the RSS and Atom feeds and every sitemap file from scratch; False without SITE_URL"""
+    feeds = get_feeds()
+    site = _site_url()
+    if site is None:
+        return False
+    with feeds.update():
+        _write_feeds(feeds, post_model, category_model, site)
+        _write_sitemaps(feeds, post_model, site)
+    return True
+
+
+def update_feeds(post_model, category_model, post_ids=()):
+    """Refresh the feeds and the sitemap shards of post_ids after a commit
+
+    The feeds are one indexed query for the newest posts; unchanged files keep
+    their bytes and ETags. Failures are logged and the stored files are kept.
+    """
+    feeds = get_feeds()
+    site = _site_url()
+    if site is None:
+        return
+    try:
+        with feeds.update():
+            _write_feeds(feeds, post_model, category_model, site)
+            _write_sitemaps(feeds, post_model, site, {post_id for post_id in post_ids if post_id})
+    except Exception:
+        current_app.logger.exception('Feed update failed')
+
+
+def feed_response(url_path, post_model, category_model):
+    """Stored bytes for a feed or sitemap URL, built on the first request if nothing is stored yet
+
+    Without SITE_URL nothing is built or served, and every feed URL answers 404.
+    """
+    if _site_url() is None:
+        abort(404)
+    feeds = get_feeds()
+    feeds.refresh()
+    if not feeds.entries:
+        build_feeds(post_model, category_model)
+        feeds.refresh()
+    response = feeds.send(url_path)
+    if response is None:
+        abort(404)
+    return response
+
+
+def init_feeds(app, post_model, category_model):
+    """Keep /feed.xml, /atom.xml and the sitemaps as precompressed files and add `flask build-feeds`"""
+    directory = app.config.get('FEEDS_DIR') or os.path.join(app.instance_path, FEEDS_DIR)
+    feeds = Snapshot(directory, None)
+    app.extensions['feeds'] = feeds
+
+    @app.cli.command('build-feeds')
+    def build_feeds_command():
+        """Rebuild the RSS and Atom feeds and the sitemaps under SITE_URL"""
+        if not build_feeds(post_model, category_model):
+            raise click.ClickException('Set SITE_URL, e.g. https://example.com, to build the feeds')
+        print(f'Built {len(feeds.entries)} feed and sitemap files in {directory}')
+
+    return feeds
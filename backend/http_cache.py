@@ -0,0 +1,79 @@
+import hashlib
+from functools import wraps
+from urllib.parse import urlencode
+from flask import current_app, make_response, request
+from content_version import content_epoch, current_version
+
+DEFAULT_CACHE_CONTROL = 'no-cache'
+
+
+def cache_control_for(endpoint, default=DEFAULT_CACHE_CONTROL):
+    """Cache-Control policy for an endpoint, overridable through API_CACHE_CONTROL"""
+    return current_app.config.get('API_CACHE_CONTROL', {}).get(endpoint, default)
+
+
+def etag_prefix(version):
+    """Leading part of the ETag shared by every payload of this URL at this version
+
+    The hash covers the version file's epoch as well as the URL, so a tag issued
+    before the file was recreated never matches a new version with the same number.
+    Query arguments are sorted and ?v= is left out, as in the response cache key.
+    """
+    query = urlencode(sorted((k, v) for k, v in request.args.items(multi=True) if k != 'v'))
+    key = f'{content_epoch()}:{request.path}?{query}'
+    return f'{version}-{hashlib.sha1(key.encode("utf-8")).hexdigest()[:8]}-'
+
+
+def payload_etag(prefix, body):
+    return prefix + hashlib.sha1(body).hexdigest()[:16]
+
+
+def _matching_etag(prefix, updated_at):
+    """The validator the client already holds for this version, or None"""
+    if request.if_none_match:
+        for tag in request.if_none_match.as_set(include_weak=True):
+            if tag.startswith(prefix):
+                return tag
+        return None
+    if request.if_modified_since and updated_at.replace(microsecond=0) <= request.if_modified_since:
+        return ''
+    return None
+
+
+def not_modified_response(tag, updated_at, policy):
+    response = current_app.response_class(status=304)
+    if tag:
+        response.set_etag(tag)
+    response.last_modified = updated_at
+    response.headers['Cache-Control'] = policy
+    return response
+
+
+def conditional(cache_control=DEFAULT_CACHE_CONTROL):
+    """Serve a read-only JSON view with strong ETags and answer 304 before running it
+
+    The ETag is built from the content version, the request URL and a hash of
+    the serialized payload. Since the payload of a URL only changes when the
+    content version does, a client validator carrying the current version and
+    URL is answered with 304 without touching the database.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            version, updated_at = current_version()
+            prefix = etag_prefix(version)
+            policy = cache_control_for(request.endpoint, cache_control)
+            tag = _matching_etag(prefix, updated_at)
+            if tag is not None:
+                return not_modified_response(tag, updated_at, policy)
+
+            response = make_response(f(*args, **kwargs))
+            if response.status_code == 200 and not response.is_streamed:
+                if not response.get_etag()[0]:
+                    response.set_etag(payload_etag(prefix, response.get_data()))
+                if response.last_modified is None:
+                    response.last_modified = updated_at
+                response.headers['Cache-Control'] = policy
+            return response
+        return decorated_function
+    return decorator
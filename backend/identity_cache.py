@@ -0,0 +1,173 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from flask import current_app, g, session
+from flask_login import UserMixin, user_logged_in
+from content_version import ContentVersion, bump_on_commit
+
+DEFAULT_TTL = 60
+DEFAULT_MAX_ENTRIES = 1024
+# Session key holding the password generation the login was made with
+SESSION_KEY = '_auth_gen'
+# User columns copied into the cached identity; the password hash itself is never cached
+IDENTITY_FIELDS = ('id', 'username', 'email', 'is_admin', 'created_at', 'last_login')
+# Written on every login; a cached identity may show the previous value until its TTL runs out
+NON_INVALIDATING_FIELDS = ('last_login',)
+
+
+def password_generation(password_hash):
+    """Short fingerprint of a password hash; changes whenever the password does"""
+    return hashlib.sha1((password_hash or '').encode('utf-8')).hexdigest()[:16]
+
+
+class Identity(UserMixin):
+    """Read-only snapshot of a User row, served as current_user
+
+    Views that modify the user load the ORM object with db.session.get().
+    """
+
+    def __init__(self, values, generation):
+        for field, value in values.items():
+            setattr(self, field, value)
+        self.password_generation = generation
+
+    def __repr__(self):
+        return f'<Identity {self.username}>'
+
+
+class IdentityCache:
+    """Bounded, short-TTL cache of identities keyed by (user id, password generation)
+
+    Any commit touching a user bumps a version shared by every worker through
+    an mmap'd file; each worker drops its entries when it sees a new version,
+    so profile, password and admin flag changes apply on the next request.
+    """
+
+    def __init__(self, tracker, ttl=DEFAULT_TTL, max_entries=DEFAULT_MAX_ENTRIES):
+        self.tracker = tracker
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        # Generation of each user's most recently cached identity, for lookups without one
+        self._latest = {}
+        self._lock = threading.Lock()
+        self._version = tracker.version
+
+    def _check_version(self):
+        version = self.tracker.version
+        if version != self._version:
+            self._entries.clear()
+            self._latest.clear()
+            self._version = version
+
+    def get(self, user_id, generation=None):
+        """Cached identity for user_id with generation, or with the latest one cached when None"""
+        with self._lock:
+            self._check_version()
+            if generation is None:
+                generation = self._latest.get(user_id)
+            entry = self._entries.get((user_id, generation))
+            if entry is None:
+                return None
+            identity, expires = entry
+            if expires < time.monotonic():
+                del self._entries[(user_id, generation)]
+                return None
+            self._entries.move_to_end((user_id, generation))
+            return identity
+
+    def put(self, identity, version):
+        with self._lock:
+            self._check_version()
+            # A row read before the latest user change must not be cached
+            if version != self._version:
+                return
+            self._entries[(identity.id, identity.password_generation)] = (identity, time.monotonic() + self.ttl)
+            self._latest[identity.id] = identity.password_generation
+            while len(self._entries) > self.max_entries:
+                (user_id, generation), _ = self._entries.popitem(last=False)
+                if self._latest.get(user_id) == generation:
+                    del self._latest[user_id]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._latest.clear()
+
+
+def get_identity_cache():
+    return current_app.extensions['identity_cache']
+
+
+def _fetch_identity(model, user_id):
+    columns = [getattr(model, field) for field in IDENTITY_FIELDS if hasattr(model, field)]
+    row = current_app.extensions['sqlalchemy'].session.query(*columns, model.password_hash) \
+        .filter(model.id == user_id).first()
+    if row is None:
+        return None
+    values = dict.fromkeys(IDENTITY_FIELDS)
+    values.update({key: getattr(row, key) for key in row._fields if key != 'password_hash'})
+    return Identity(values, password_generation(row.password_hash))
+
+
+def load_identity(model, user_id, generation=None):
+    """Identity for user_id, memoized for the request and cached per worker
+
+    With a generation, an identity whose password has changed since is
+    rejected (None). Without one, e.g. for the admin cookie, any current
+    cached identity of the user is accepted.
+    """
+    user_id = int(user_id)
+    memo = g.setdefault('_identities', {})
+    key = (user_id, generation)
+    if key in memo:
+        return memo[key]
+    cache = get_identity_cache()
+    identity = cache.get(user_id, generation)
+    if identity is None:
+        version = cache.tracker.version
+        identity = _fetch_identity(model, user_id)
+        if identity is not None:
+            cache.put(identity, version)
+        if identity is not None and generation is not None and identity.password_generation != generation:
+            identity = None
+    memo[key] = identity
+    return identity
+
+
+def load_session_identity(model, user_id):
+    """user_loader body: the identity for the password generation recorded at login"""
+    generation = session.get(SESSION_KEY)
+    identity = load_identity(model, user_id, generation)
+    if identity is not None and generation is None:
+        # Session from before generations were recorded
+        session[SESSION_KEY] = identity.password_generation
+    return identity
+
+
+def remember_password_generation(user):
+    """Record the user's current password generation in the session, e.g. after a password change"""
+    if isinstance(user, Identity):
+        session[SESSION_KEY] = user.password_generation
+    else:
+        session[SESSION_KEY] = password_generation(user.password_hash)
+
+
+def init_identity_cache(app, db, model):
+    """Cache identities for the user_loader and invalidate them on every commit touching model"""
+    path = app.config.get('IDENTITY_VERSION_FILE') or os.path.join(app.instance_path, 'identity_version.bin')
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tracker = ContentVersion(path)
+    bump_on_commit(db, [model], tracker, 'identity_changed', ignored=NON_INVALIDATING_FIELDS)
+    cache = IdentityCache(tracker,
+                          ttl=app.config.get('IDENTITY_CACHE_TTL', DEFAULT_TTL),
+                          max_entries=app.config.get('IDENTITY_CACHE_MAX_ENTRIES', DEFAULT_MAX_ENTRIES))
+    app.extensions['identity_cache'] = cache
+
+    @user_logged_in.connect_via(app)
+    def record_generation(sender, user, **extra):
+        remember_password_generation(user)
+
+    return cache
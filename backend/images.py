@@ -0,0 +1,204 @@
+import io
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app, url_for
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+# Widths generated for srcset; never upscaled past the original
+IMAGE_WIDTHS = (480, 960, 1600)
+DEFAULT_WORKERS = 2
+# Derivatives live in this folder inside UPLOAD_FOLDER
+DERIVED_DIR = 'derived'
+# Uploads wait here, outside the public folder, until their metadata is stripped
+INCOMING_DIR = 'incoming'
+# Save options for the cleaned original, keyed by Pillow format
+_ORIGINAL_OPTIONS = {'JPEG': {'quality': 95}, 'WEBP': {'quality': 95}}
+# (format, extension, mimetype, save options), best first; JPEG is always the fallback
+_FORMATS = (
+    ('AVIF', 'avif', 'image/avif', {'quality': 55}),
+    ('WEBP', 'webp', 'image/webp', {'quality': 80, 'method': 6}),
+    ('JPEG', 'jpg', 'image/jpeg', {'quality': 82, 'optimize': True, 'progressive': True}),
+)
+_MIMETYPE_ORDER = [mimetype for _, _, mimetype, _ in _FORMATS]
+
+
+def supported_formats():
+    """The output formats this Pillow build can encode (AVIF needs a plugin on Pillow 10)"""
+    Image.init()
+    return [f for f in _FORMATS if f[0] in Image.SAVE]
+
+
+def gevent_patched():
+    """True under the gevent worker, where threading is monkey patched"""
+    try:
+        from gevent import monkey
+    except ImportError:
+        return False
+    return monkey.is_module_patched('threading')
+
+
+def thread_pool_class():
+    """ThreadPoolExecutor, or gevent's pool of real threads under the gevent worker"""
+    if gevent_patched():
+        from gevent.threadpool import ThreadPoolExecutor as NativeThreadPoolExecutor
+        return NativeThreadPoolExecutor
+    return ThreadPoolExecutor
+
+
+def get_image_pool():
+    """The worker's image processing pool, created on first use"""
+    pool = current_app.extensions.get('image_pool')
+    if pool is None:
+        workers = current_app.config.get('IMAGE_WORKERS', DEFAULT_WORKERS)
+        pool = current_app.extensions.setdefault(
+            'image_pool', thread_pool_class()(max_workers=workers, thread_name_prefix='images'))
+    return pool
+
+
+def _normalize(image):
+    if image.mode in ('RGB', 'RGBA'):
+        return image
+    has_alpha = 'A' in image.mode or 'transparency' in image.info
+    return image.convert('RGBA' if has_alpha else 'RGB')
+
+
+def _flatten(image):
+    # JPEG has no alpha channel; composite onto white
+    if image.mode != 'RGBA':
+        return image
+    background = Image.new('RGB', image.size, (255, 255, 255))
+    background.paste(image, mask=image.getchannel('A'))
+    return background
+
+
+def _incoming_folder():
+    return current_app.config.get('IMAGE_INCOMING_FOLDER') or os.path.join(current_app.instance_path, INCOMING_DIR)
+
+
+def save_upload(file, filename):
+    """Keep an uploaded image out of the public folder until queue_derivatives publishes it"""
+    folder = _incoming_folder()
+    os.makedirs(folder, exist_ok=True)
+    file.save(os.path.join(folder, filename))
+
+
+def publish_original(source_path, upload_folder, filename):
+    """Write source_path to upload_folder/filename with the orientation applied and no metadata
+
+    EXIF (GPS position, camera serials), XMP and comments are dropped; the
+    colour profile is kept. The file is replaced atomically, so readers see
+    either the old or the cleaned image.
+    """
+    with Image.open(source_path) as source:
+        image_format = source.format
+        icc_profile = source.info.get('icc_profile')
+        image = ImageOps.exif_transpose(source)
+    # Some encoders fall back to info for comments and text chunks
+    image.info = {}
+    if image_format not in Image.SAVE:
+        raise ValueError(f'Cannot re-encode {image_format} images')
+    options = dict(_ORIGINAL_OPTIONS.get(image_format, {}))
+    if image_format == 'JPEG':
+        image = _flatten(_normalize(image))
+    if icc_profile:
+        options['icc_profile'] = icc_profile
+    buffer = io.BytesIO()
+    image.save(buffer, image_format, **options)
+    path = os.path.join(upload_folder, filename)
+    tmp = f'{path}.{os.getpid()}.tmp'
+    with open(tmp, 'wb') as file:
+        file.write(buffer.getvalue())
+    os.replace(tmp, path)
+
+
+def make_derivatives(upload_folder, filename):
+    """Encode resized, EXIF-free copies of an upload
+
+    Returns (width, height, variants) where each variant is a dict with
+    format, mimetype, width, height and the file path relative to upload_folder.
+    """
+    stem = os.path.splitext(filename)[0]
+    out_dir = os.path.join(upload_folder, DERIVED_DIR)
+    os.makedirs(out_dir, exist_ok=True)
+    with Image.open(os.path.join(upload_folder, filename)) as source:
+        # Apply the camera orientation before the metadata is dropped
+        image = _normalize(ImageOps.exif_transpose(source))
+        width, height = image.size
+        widths = sorted({min(w, width) for w in IMAGE_WIDTHS})
+        variants = []
+        for target_width in widths:
+            target_height = max(1, round(height * target_width / width))
+            resized = image
+            if target_width != width:
+                resized = image.resize((target_width, target_height), Image.LANCZOS)
+            for name, ext, mimetype, options in supported_formats():
+                frame = resized if name != 'JPEG' else _flatten(resized)
+                path = os.path.join(DERIVED_DIR, f'{stem}-{target_width}w.{ext}')
+                # No exif= argument, so no metadata (GPS, camera serials) is written
+                frame.save(os.path.join(upload_folder, path), name, **options)
+                variants.append({'format': ext, 'mimetype': mimetype, 'width': target_width,
+                                 'height': target_height, 'file': path.replace(os.sep, '/')})
+    return width, height, variants
+
+
+def _process(app, model, post_id, filename, on_ready):
+    with app.app_context():
+        db = app.extensions['sqlalchemy']
+        try:
+            upload_folder = app.config['UPLOAD_FOLDER']
+            # A new upload comes from the incoming folder; an image uploaded before that is cleaned in place
+            incoming = os.path.join(_incoming_folder(), filename)
+            source = incoming if os.path.exists(incoming) else os.path.join(upload_folder, filename)
+            publish_original(source, upload_folder, filename)
+            if source == incoming:
+                os.remove(incoming)
+            width, height, variants = make_derivatives(upload_folder, filename)
+            post = db.session.get(model, post_id)
+            # Skip if the post was deleted or got a newer image in the meantime
+            if post is None or post.featured_image != filename:
+                return
+            post.image_width = width
+            post.image_height = height
+            post.image_variants = variants
+            db.session.commit()
+            if on_ready is not None:
+                on_ready(post)
+        except Exception:
+            db.session.rollback()
+            logger.exception('Could not build image derivatives for %s', filename)
+        finally:
+            db.session.remove()
+
+
+def queue_derivatives(model, post_id, filename, on_ready=None):
+    """Publish a post's featured image without metadata and build its derivatives off the request thread
+
+    on_ready(post) runs in the pool, inside an app context, once the post
+    row carries the derivatives.
+    """
+    app = current_app._get_current_object()
+    return get_image_pool().submit(_process, app, model, post_id, filename, on_ready)
+
+
+def image_data(featured_image, width, height, variants):
+    """srcset-ready description of a featured image, or None without derivatives"""
+    if not featured_image or not variants:
+        return None
+    sources = {}
+    for variant in sorted(variants, key=lambda v: v['width']):
+        url = url_for('static', filename=f'uploads/{variant["file"]}')
+        sources.setdefault(variant['mimetype'], []).append((url, variant['width']))
+    fallback = sources.get('image/jpeg') or next(iter(sources.values()))
+    return {
+        'width': width,
+        'height': height,
+        # Mid-sized fallback for browsers without srcset support
+        'src': fallback[len(fallback) // 2][0],
+        'sources': [
+            {'type': mimetype, 'srcset': ', '.join(f'{url} {w}w' for url, w in candidates)}
+            for mimetype, candidates in sorted(sources.items(), key=lambda s: _MIMETYPE_ORDER.index(s[0]))
+        ]
+    }
@@ -0,0 +1,121 @@
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+
+INJECTION_POINT = b'</body>'
+# Seconds between mtime checks of index.html
+CHECK_INTERVAL = 1.0
+
+# Applies window.authStatus to the page; identical for every visitor, so it is encoded once
+AUTH_SCRIPT = b"""
+    <script>
+        document.addEventListener('DOMContentLoaded', function() {
+            // Hide/show admin-only elements
+            if (window.authStatus && window.authStatus.is_admin === 'true') {
+                document.querySelectorAll('.admin-only').forEach(el => el.style.display = 'block');
+            } else {
+                document.querySelectorAll('.admin-only').forEach(el => el.style.display = 'none');
+            }
+            // Handle sidebar account section
+            const accountSection = document.querySelector('.sidebar-section:nth-child(2)');
+            if (accountSection && accountSection.querySelector('h3').textContent === 'Account') {
+                const accountLinks = accountSection.querySelector('ul');
+                if (window.authStatus.is_logged_in === 'true') {
+                    accountLinks.innerHTML = `
+                        <li>
+                            <a href="/dashboard" class="sidebar-link">
+                                <i class="fas fa-user-circle"></i>
+                                <span>Dashboard</span>
+                                <i class="fas fa-chevron-right nav-arrow"></i>
+                            </a>
+                        </li>
+                        <li>
+                            <a href="/logout" class="sidebar-link">
+                                <i class="fas fa-sign-out-alt"></i>
+                                <span>Logout</span>
+                                <i class="fas fa-chevron-right nav-arrow"></i>
+                            </a>
+                        </li>
+                    `;
+                    const usernameElement = document.createElement('div');
+                    usernameElement.className = 'user-info';
+                    usernameElement.innerHTML = '<p>Logged in as: <strong>' + window.authStatus.username + '</strong></p>';
+                    accountSection.insertBefore(usernameElement, accountLinks);
+                }
+            }
+            // Toggle auth buttons in nav
+            const authButtons = document.querySelector('.auth-buttons');
+            if (authButtons) {
+                if (window.authStatus.is_logged_in === 'true' && window.authStatus.is_admin === 'true') {
+                    authButtons.innerHTML = `
+                        <a href="/dashboard" class="auth-btn login-btn">Dashboard</a>
+                        <a href="/logout" class="auth-btn signup-btn">Logout</a>
+                    `;
+                } else {
+                    authButtons.innerHTML = '';
+                }
+            }
+        });
+    </script>
+    """
+
+
+def auth_status_script(is_logged_in, username, is_admin):
+    """The only per-request part of the page: a tiny script setting window.authStatus"""
+    status = json.dumps({'is_logged_in': is_logged_in, 'username': username, 'is_admin': is_admin})
+    # Keep a username like "</script>" from closing the tag early
+    status = status.replace('</', '<\\/')
+    return f'\n    <script>window.authStatus = {status};</script>'.encode('utf-8')
+
+
+class IndexShell:
+    """index.html held in memory as pre-encoded byte segments around the auth injection point
+
+    The file is re-read only when its mtime changes. The anonymous page is
+    assembled once, together with a gzip variant and an ETag.
+    """
+
+    def __init__(self, path, check_interval=CHECK_INTERVAL, rewrite=None):
+        self.path = path
+        # Optional bytes -> bytes transform, e.g. pointing asset URLs at fingerprinted files
+        self.rewrite = rewrite
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._mtime = None
+        self._checked_at = 0.0
+        self.head = self.tail = b''
+        self.anonymous = self.anonymous_gzip = b''
+        self.anonymous_etag = ''
+
+    def _load(self, mtime):
+        with open(self.path, 'rb') as file:
+            content = file.read()
+        if self.rewrite is not None:
+            content = self.rewrite(content)
+        # Inject before the last </body>; a page without one gets the script appended at the end
+        head, sep, tail = content.rpartition(INJECTION_POINT)
+        if not sep:
+            head, tail = content, b''
+        self.head = head
+        self.tail = AUTH_SCRIPT + sep + tail
+        self.anonymous = self.render(False, '', False)
+        self.anonymous_gzip = gzip.compress(self.anonymous, compresslevel=9)
+        self.anonymous_etag = hashlib.sha1(self.anonymous).hexdigest()[:20]
+        self._mtime = mtime
+
+    def refresh(self):
+        """Reload the file if its mtime changed; checked at most every check_interval seconds"""
+        now = time.monotonic()
+        if self._mtime is not None and now - self._checked_at < self.check_interval:
+            return
+        with self._lock:
+            self._checked_at = now
+            mtime = os.stat(self.path).st_mtime_ns
+            if mtime != self._mtime:
+                self._load(mtime)
+
+    def render(self, is_logged_in, username, is_admin):
+        return b''.join((self.head, auth_status_script(is_logged_in, username, is_admin), self.tail))
@@ -0,0 +1,30 @@
+"""Add image derivative fields to Post model
+
+Revision ID: 0441f49f9ae6
+Revises: 23cff2fe4edb
+Create Date: 2026-10-18 10:12:41.508113
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0441f49f9ae6'
+down_revision = '23cff2fe4edb'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('post', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('image_width', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('image_height', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('image_variants', sa.JSON(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('post', schema=None) as batch_op:
+        batch_op.drop_column('image_variants')
+        batch_op.drop_column('image_height')
+        batch_op.drop_column('image_width')
@@ -0,0 +1,32 @@
+"""Add composite indexes for the public post listings
+
+Revision ID: 5e8a1c4f7b20
+Revises: 9c2f5e07a1d3
+Create Date: 2026-10-18 18:41:05.117380
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5e8a1c4f7b20'
+down_revision = '9c2f5e07a1d3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('post', schema=None) as batch_op:
+        batch_op.create_index('ix_post_published_created_at', ['published', 'created_at', 'id'], unique=False)
+        batch_op.create_index('ix_post_category_published_created_at', ['category_id', 'published', 'created_at', 'id'], unique=False)
+        batch_op.create_index('ix_post_published_updated_at', ['published', 'updated_at'], unique=False)
+        batch_op.create_index('ix_post_user_published_created_at', ['user_id', 'published', 'created_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('post', schema=None) as batch_op:
+        batch_op.drop_index('ix_post_user_published_created_at')
+        batch_op.drop_index('ix_post_published_updated_at')
+        batch_op.drop_index('ix_post_category_published_created_at')
+        batch_op.drop_index('ix_post_published_created_at')
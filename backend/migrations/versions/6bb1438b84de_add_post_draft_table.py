@@ -0,0 +1,38 @@
+"""Add post_draft table for autosaved drafts
+
+Revision ID: 6bb1438b84de
+Revises: 0441f49f9ae6
+Create Date: 2026-10-18 16:02:17.224906
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6bb1438b84de'
+down_revision = '0441f49f9ae6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('post_draft',
+        sa.Column('post_id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('title', sa.String(length=200), nullable=True),
+        sa.Column('slug', sa.String(length=200), nullable=True),
+        sa.Column('content', sa.Text(), nullable=True),
+        sa.Column('summary', sa.String(length=300), nullable=True),
+        sa.Column('category_id', sa.Integer(), nullable=True),
+        sa.Column('read_time', sa.Integer(), nullable=True),
+        sa.Column('content_hash', sa.String(length=64), nullable=False),
+        sa.Column('saved_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['post_id'], ['post.id'], ),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+        sa.PrimaryKeyConstraint('post_id')
+    )
+
+
+def downgrade():
+    op.drop_table('post_draft')
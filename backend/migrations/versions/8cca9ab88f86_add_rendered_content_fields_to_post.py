@@ -0,0 +1,33 @@
+"""Add rendered content fields to Post model
+
+Revision ID: 8cca9ab88f86
+Revises: b7d3e9a2c615
+Create Date: 2026-10-18 21:14:08.316420
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8cca9ab88f86'
+down_revision = 'b7d3e9a2c615'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Existing posts are rendered by `flask render-posts` after upgrading
+    with op.batch_alter_table('post', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('content_html', sa.Text(), nullable=True))
+        batch_op.add_column(sa.Column('toc', sa.JSON(), nullable=True))
+        batch_op.add_column(sa.Column('word_count', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('excerpt', sa.String(length=300), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('post', schema=None) as batch_op:
+        batch_op.drop_column('excerpt')
+        batch_op.drop_column('word_count')
+        batch_op.drop_column('toc')
+        batch_op.drop_column('content_html')
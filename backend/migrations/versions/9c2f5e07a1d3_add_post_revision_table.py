@@ -0,0 +1,39 @@
+"""Add post_revision table for delta-compressed post history
+
+Revision ID: 9c2f5e07a1d3
+Revises: 6bb1438b84de
+Create Date: 2026-10-18 17:24:41.508312
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9c2f5e07a1d3'
+down_revision = '6bb1438b84de'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('post_revision',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('post_id', sa.Integer(), nullable=False),
+        sa.Column('number', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('title', sa.String(length=200), nullable=False),
+        sa.Column('is_keyframe', sa.Boolean(), nullable=False),
+        sa.Column('data', sa.LargeBinary(), nullable=False),
+        sa.Column('content_hash', sa.String(length=64), nullable=False),
+        sa.Column('size', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['post_id'], ['post.id'], ),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('post_id', 'number')
+    )
+
+
+def downgrade():
+    op.drop_table('post_revision')
@@ -0,0 +1,47 @@
+"""Add FTS5 search index over published posts
+
+Revision ID: b7d3e9a2c615
+Revises: 5e8a1c4f7b20
+Create Date: 2026-10-18 20:06:52.730144
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7d3e9a2c615'
+down_revision = '5e8a1c4f7b20'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # FTS5 is SQLite only; other databases fall back to substring search
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    op.execute("CREATE VIRTUAL TABLE post_fts USING fts5("
+               "title, summary, content, tokenize = 'porter unicode61 remove_diacritics 2')")
+    op.execute("INSERT INTO post_fts(post_fts, rank) VALUES ('rank', 'bm25(10.0, 5.0, 1.0)')")
+    op.execute("CREATE TRIGGER post_fts_insert AFTER INSERT ON post WHEN new.published BEGIN "
+               "INSERT INTO post_fts(rowid, title, summary, content) VALUES (new.id, new.title, new.summary, new.content); "
+               "END")
+    op.execute("CREATE TRIGGER post_fts_delete AFTER DELETE ON post BEGIN "
+               "DELETE FROM post_fts WHERE rowid = old.id; "
+               "END")
+    op.execute("CREATE TRIGGER post_fts_update AFTER UPDATE OF title, summary, content, published ON post BEGIN "
+               "DELETE FROM post_fts WHERE rowid = old.id; "
+               "INSERT INTO post_fts(rowid, title, summary, content) "
+               "SELECT new.id, new.title, new.summary, new.content WHERE new.published; "
+               "END")
+    op.execute("INSERT INTO post_fts(rowid, title, summary, content) "
+               "SELECT id, title, summary, content FROM post WHERE published")
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    op.execute("DROP TRIGGER IF EXISTS post_fts_update")
+    op.execute("DROP TRIGGER IF EXISTS post_fts_delete")
+    op.execute("DROP TRIGGER IF EXISTS post_fts_insert")
+    op.execute("DROP TABLE IF EXISTS post_fts")
@@ -0,0 +1,27 @@
+"""Add base_updated_at to post_draft
+
+Revision ID: d41c7e2a9b36
+Revises: 8cca9ab88f86
+Create Date: 2026-10-18 22:05:41.627193
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd41c7e2a9b36'
+down_revision = '8cca9ab88f86'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Existing drafts keep NULL and are treated as current
+    with op.batch_alter_table('post_draft', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('base_updated_at', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('post_draft', schema=None) as batch_op:
+        batch_op.drop_column('base_updated_at')
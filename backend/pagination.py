@@ -0,0 +1,67 @@
+import base64
+from datetime import datetime
+from flask import request, url_for
+from sqlalchemy import and_, or_
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+
+def parse_limit(raw):
+    """Parse ?limit=, clamping it to MAX_PAGE_SIZE"""
+    if raw is None or raw == '':
+        return DEFAULT_PAGE_SIZE
+    try:
+        limit = int(raw)
+    except ValueError:
+        raise ValueError('limit must be an integer')
+    if limit < 1:
+        raise ValueError('limit must be positive')
+    return min(limit, MAX_PAGE_SIZE)
+
+
+def encode_cursor(created_at, post_id):
+    """Encode the (created_at, id) position of the last item on a page"""
+    raw = f'{created_at.isoformat()}|{post_id}'.encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Decode a cursor produced by encode_cursor, raising ValueError if it is malformed"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        created_at, post_id = base64.urlsafe_b64decode(padded).decode('utf-8').split('|')
+        return datetime.fromisoformat(created_at), int(post_id)
+    except Exception:
+        raise ValueError('Invalid cursor')
+
+
+def paginate(query, model, cursor=None, limit=DEFAULT_PAGE_SIZE):
+    """Run a keyset paginated query ordered newest first
+
+    Rows must expose ``id`` and ``created_at``. Returns the page of rows and the
+    cursor for the next page (None on the last page).
+    """
+    if cursor:
+        created_at, post_id = decode_cursor(cursor)
+        query = query.filter(or_(
+            model.created_at < created_at,
+            and_(model.created_at == created_at, model.id < post_id)
+        ))
+    rows = query.order_by(model.created_at.desc(), model.id.desc()).limit(limit + 1).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].created_at, rows[-1].id)
+    return rows, next_cursor
+
+
+def set_pagination_headers(response, next_cursor):
+    """Advertise the next page through X-Next-Cursor and a Link header"""
+    if next_cursor:
+        args = request.args.to_dict()
+        args['cursor'] = next_cursor
+        next_url = url_for(request.endpoint, **(request.view_args or {}), **args)
+        response.headers['X-Next-Cursor'] = next_cursor
+        response.headers['Link'] = f'<{next_url}>; rel="next"'
+    return response
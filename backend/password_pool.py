@@ -0,0 +1,139 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from flask import current_app
+from werkzeug.security import check_password_hash, generate_password_hash
+from images import gevent_patched, thread_pool_class
+from rate_limit import retry_later_response
+
+# Werkzeug's current default; stored hashes with another method are upgraded on login
+DEFAULT_HASH_METHOD = 'pbkdf2:sha256:600000'
+DEFAULT_WORKERS = 2
+# Hashes allowed to wait for a free worker before new ones are turned away. Keep
+# workers + queue depth below the request threads so reads always find a free thread.
+DEFAULT_QUEUE_DEPTH = 2
+DEFAULT_TIMEOUT = 10
+RETRY_AFTER_SECONDS = 2
+
+
+class PasswordPoolBusy(Exception):
+    """Every worker and queue slot is taken; answered with 429"""
+
+
+class PasswordPoolUnavailable(Exception):
+    """A hash timed out or the pool died; answered with 503"""
+
+
+def _verify(password_hash, password, method):
+    # Runs in the pool: check, and rehash with the configured method when the stored one differs
+    if not password_hash or not check_password_hash(password_hash, password):
+        return False, None
+    if password_hash.split('$', 1)[0] != method:
+        return True, generate_password_hash(password, method=method)
+    return True, None
+
+
+def _hash(password, method):
+    return generate_password_hash(password, method=method)
+
+
+class PasswordPool:
+    """Bounded pool that keeps PBKDF2 work off the request threads
+
+    At most workers + queue_depth hashes are in flight per web worker; a
+    request beyond that fails immediately instead of tying up a thread.
+    """
+
+    def __init__(self, workers=DEFAULT_WORKERS, queue_depth=DEFAULT_QUEUE_DEPTH,
+                 timeout=DEFAULT_TIMEOUT, kind='process'):
+        self.workers = workers
+        self.queue_depth = queue_depth
+        self.timeout = timeout
+        self.kind = kind
+        self._slots = threading.BoundedSemaphore(workers + queue_depth)
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pid = None
+
+    def _get_executor(self):
+        # Pools do not survive a fork, so each web worker starts its own
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    # hashlib releases the GIL, so real threads also work where processes cannot
+                    if self.kind == 'process' and not gevent_patched():
+                        self._executor = ProcessPoolExecutor(
+                            self.workers, mp_context=multiprocessing.get_context('spawn'))
+                    else:
+                        self._executor = thread_pool_class()(max_workers=self.workers)
+                    self._pid = os.getpid()
+        return self._executor
+
+    def run(self, fn, *args):
+        if self.kind == 'inline':
+            return fn(*args)
+        if not self._slots.acquire(blocking=False):
+            raise PasswordPoolBusy()
+        try:
+            future = self._get_executor().submit(fn, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        # A hash that timed out keeps its worker busy, so its slot is only freed once it actually finishes
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(self.timeout)
+        except TimeoutError:
+            raise PasswordPoolUnavailable('Password hashing timed out')
+        except BrokenProcessPool:
+            with self._lock:
+                self._pid = None
+            raise PasswordPoolUnavailable('Password hashing pool stopped')
+
+
+def get_password_pool():
+    return current_app.extensions['password_pool']
+
+
+def hash_method():
+    return current_app.config.get('PASSWORD_HASH_METHOD', DEFAULT_HASH_METHOD)
+
+
+def hash_password(password):
+    """Hash a new password in the pool"""
+    return get_password_pool().run(_hash, password, hash_method())
+
+
+def verify_password(user, password):
+    """Check password against user in the pool
+
+    On success a hash made with an outdated method is replaced on the user
+    object; the caller's commit persists it.
+    """
+    valid, upgraded = get_password_pool().run(_verify, user.password_hash, password, hash_method())
+    if upgraded:
+        user.password_hash = upgraded
+    return valid
+
+
+def init_password_pool(app):
+    """Create the hashing pool and map saturation to 429 and failures to 503"""
+    pool = PasswordPool(workers=app.config.get('PASSWORD_HASH_WORKERS', DEFAULT_WORKERS),
+                        queue_depth=app.config.get('PASSWORD_HASH_QUEUE_DEPTH', DEFAULT_QUEUE_DEPTH),
+                        timeout=app.config.get('PASSWORD_HASH_TIMEOUT', DEFAULT_TIMEOUT),
+                        kind=app.config.get('PASSWORD_HASH_POOL', 'process'))
+    app.extensions['password_pool'] = pool
+
+    @app.errorhandler(PasswordPoolBusy)
+    def password_pool_busy(e):
+        return retry_later_response(429, 'Too many sign-in attempts right now, please retry in a moment.',
+                                    RETRY_AFTER_SECONDS)
+
+    @app.errorhandler(PasswordPoolUnavailable)
+    def password_pool_unavailable(e):
+        return retry_later_response(503, 'Sign-in is temporarily unavailable, please retry in a moment.',
+                                    RETRY_AFTER_SECONDS)
+
+    return pool
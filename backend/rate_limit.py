@@ -0,0 +1,138 @@
+import hashlib
+import math
+import mmap
+import os
+import struct
+import threading
+import time
+from flask import current_app, jsonify, request
+from content_version import file_lock
+
+# Buckets in the shared table; a full table recycles its least recently used buckets
+DEFAULT_SLOTS = 16384
+# Slots inspected for a key before the oldest one is taken over
+PROBE_LIMIT = 8
+# (requests, seconds) per bucket: a burst of `requests`, refilled evenly over `seconds`
+DEFAULT_LIMITS = {
+    'ip': (20, 60),
+    'username': (5, 60),
+}
+# POST endpoints guarded by the limiter
+DEFAULT_ENDPOINTS = ('login', 'admin_login', 'signup', 'admin.login')
+
+# Slot layout: key fingerprint (0 = empty), tokens left, time of the last update,
+# time the bucket is full again at its owner's own rate
+_SLOT = struct.Struct('<Qddd')
+
+
+def retry_later_response(status, message, retry_after):
+    """429/503 answer with Retry-After, as JSON for API and JSON clients and plain text otherwise"""
+    if request.path.startswith('/api/') or request.accept_mimetypes.best == 'application/json':
+        response = jsonify({'status': 'error', 'message': message})
+    else:
+        response = current_app.response_class(message, mimetype='text/plain')
+    response.status_code = status
+    response.headers['Retry-After'] = str(max(1, math.ceil(retry_after)))
+    return response
+
+
+class TokenBucketTable:
+    """Fixed-size table of token buckets in an mmap'd file shared by every worker
+
+    Keys are hashed into a slot with a short linear probe, so a check touches
+    at most PROBE_LIMIT slots under a single file lock, whatever the number
+    of clients. A key without a bucket in its probe range takes the first
+    empty slot, then the first whose bucket has refilled, then the oldest.
+    """
+
+    def __init__(self, path, slots=DEFAULT_SLOTS):
+        self.path = path
+        self.slots = slots
+        size = slots * _SLOT.size
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        self._lock = threading.Lock()
+        with file_lock(self._fd):
+            if os.fstat(self._fd).st_size != size:
+                # New file or a different table size: start empty
+                os.ftruncate(self._fd, 0)
+                os.ftruncate(self._fd, size)
+            self._map = mmap.mmap(self._fd, size)
+
+    @staticmethod
+    def fingerprint(key):
+        value = int.from_bytes(hashlib.blake2b(key.encode('utf-8'), digest_size=8).digest(), 'little')
+        return value or 1
+
+    def take(self, key, capacity, per_seconds, now=None):
+        """Take one token from key's bucket; returns (allowed, seconds until a token is available)"""
+        now = now or time.time()
+        rate = capacity / per_seconds
+        fingerprint = self.fingerprint(key)
+        start = fingerprint % self.slots
+        with self._lock, file_lock(self._fd):
+            target, free, oldest = None, None, None
+            for probe in range(PROBE_LIMIT):
+                offset = ((start + probe) % self.slots) * _SLOT.size
+                slot_key, tokens, updated, full_at = _SLOT.unpack_from(self._map, offset)
+                if slot_key == fingerprint:
+                    target = (offset, min(capacity, tokens + (now - updated) * rate))
+                    break
+                if slot_key == 0:
+                    # Slots are never emptied, so the key cannot sit past an empty one
+                    if free is None:
+                        free = offset
+                    break
+                if free is None and full_at <= now:
+                    # Idle long enough that its owner's bucket would be full again
+                    free = offset
+                if oldest is None or updated < oldest[1]:
+                    oldest = (offset, updated)
+            if target is None:
+                target = (free if free is not None else oldest[0], float(capacity))
+            offset, tokens = target
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            _SLOT.pack_into(self._map, offset, fingerprint, tokens, now, now + (capacity - tokens) / rate)
+        return allowed, 0.0 if allowed else (1 - tokens) / rate
+
+
+def get_rate_limiter():
+    return current_app.extensions['rate_limiter']
+
+
+def client_ip():
+    if current_app.config.get('RATE_LIMIT_TRUST_PROXY', False) and request.access_route:
+        return request.access_route[0]
+    return request.remote_addr or ''
+
+
+def check_rate_limits():
+    """before_request hook: throttle POSTs to the auth endpoints before any ORM or hashing work"""
+    if request.method != 'POST' or request.endpoint not in current_app.config.get(
+            'RATE_LIMIT_ENDPOINTS', DEFAULT_ENDPOINTS):
+        return None
+    if not current_app.config.get('RATE_LIMIT_ENABLED', True):
+        return None
+    limits = current_app.config.get('RATE_LIMITS', DEFAULT_LIMITS)
+    table = get_rate_limiter()
+    keys = [('ip', f'ip:{client_ip()}')]
+    username = (request.form.get('username') or '').strip().lower()
+    if username:
+        keys.append(('username', f'user:{username}'))
+    for kind, key in keys:
+        capacity, per_seconds = limits[kind]
+        allowed, retry_after = table.take(key, capacity, per_seconds)
+        if not allowed:
+            return retry_later_response(429, 'Too many attempts, please wait before trying again.', retry_after)
+    return None
+
+
+def init_rate_limiter(app):
+    """Create the shared bucket table and guard the auth endpoints"""
+    path = app.config.get('RATE_LIMIT_FILE') or os.path.join(app.instance_path, 'rate_limit.bin')
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    table = TokenBucketTable(path, slots=app.config.get('RATE_LIMIT_SLOTS', DEFAULT_SLOTS))
+    app.extensions['rate_limiter'] = table
+    app.before_request(check_rate_limits)
+    return table
@@ -0,0 +1,121 @@
+import html
+import math
+import re
+from urllib.parse import urlsplit
+import click
+import markdown
+from markdown.extensions import Extension
+from markdown.extensions.toc import TocExtension
+from markdown.treeprocessors import Treeprocessor
+from sqlalchemy.orm.attributes import flag_modified
+
+# Matches the estimate the post form shows while typing
+WORDS_PER_MINUTE = 200
+# Same length as the summary column
+EXCERPT_LENGTH = 300
+SAFE_SCHEMES = ('', 'http', 'https', 'mailto')
+
+_TAG = re.compile(r'<[^>]+>')
+_WORD = re.compile(r'\w+')
+_SPACE = re.compile(r'\s+')
+_FIRST_PARAGRAPH = re.compile(r'<p>(.*?)</p>', re.S)
+# Browsers ignore these inside a URL scheme, so "java\tscript:" must be checked as "javascript:"
+_URL_IGNORED = re.compile(r'[\x00-\x20\x7f]+')
+
+
+def _safe_url(url):
+    # Markdown keeps character references in attributes as typed, and the browser decodes them before
+    # it reads the scheme, so "&#106;avascript:" must be checked as "javascript:" too
+    try:
+        return urlsplit(_URL_IGNORED.sub('', html.unescape(url or ''))).scheme.lower() in SAFE_SCHEMES
+    except ValueError:
+        return False
+
+
+class _SafeLinks(Treeprocessor):
+    """Drop href and src values with a scheme other than http(s) or mailto"""
+
+    def run(self, root):
+        for element in root.iter():
+            for attribute in ('href', 'src'):
+                if attribute in element.attrib and not _safe_url(element.attrib[attribute]):
+                    del element.attrib[attribute]
+
+
+class SafeExtension(Extension):
+    """Treat raw HTML in posts as text and strip script links, so the output can be served as is"""
+
+    def extendMarkdown(self, md):
+        md.preprocessors.deregister('html_block')
+        md.inlinePatterns.deregister('html')
+        md.treeprocessors.register(_SafeLinks(md), 'safe_links', 0)
+
+
+def _markdown():
+    return markdown.Markdown(extensions=[
+        'fenced_code', 'tables', 'sane_lists',
+        TocExtension(toc_depth='2-4'),
+        SafeExtension(),
+    ])
+
+
+def _toc(tokens):
+    return [{'id': token['id'], 'title': html.unescape(token['name']), 'level': token['level'],
+             'children': _toc(token['children'])} for token in tokens]
+
+
+def plain_text(content_html):
+    return _SPACE.sub(' ', html.unescape(_TAG.sub(' ', content_html))).strip()
+
+
+def excerpt(content_html, length=EXCERPT_LENGTH):
+    """Text of the first paragraph, cut at a word boundary to fit length"""
+    match = _FIRST_PARAGRAPH.search(content_html)
+    # Listings insert summaries as markup, so tags typed as text in the post must not come back to life here
+    text = _SPACE.sub(' ', _TAG.sub('', plain_text(match.group(1)))).strip() if match else ''
+    if len(text) > length:
+        text = text[:length - 1].rsplit(' ', 1)[0] + '…'
+    return text or None
+
+
+def render_markdown(content):
+    """Sanitized HTML and derived fields for a post body
+
+    Returns a dict with content_html, toc (nested headings with their anchor
+    ids), word_count, read_time in minutes and an excerpt to stand in for a
+    missing summary.
+    """
+    md = _markdown()
+    content_html = md.convert(content or '')
+    word_count = len(_WORD.findall(plain_text(content_html)))
+    return {
+        'content_html': content_html,
+        'toc': _toc(md.toc_tokens),
+        'word_count': word_count,
+        'read_time': max(1, math.ceil(word_count / WORDS_PER_MINUTE)),
+        'excerpt': excerpt(content_html),
+    }
+
+
+def render_post(post):
+    """Fill post's persisted rendering from its markdown content"""
+    for field, value in render_markdown(post.content).items():
+        setattr(post, field, value)
+
+
+def init_rendering(app, db, model):
+    """Add `flask render-posts`, which renders every post that has no stored HTML yet (or all with --all)"""
+
+    @app.cli.command('render-posts')
+    @click.option('--all', 'everything', is_flag=True, help='Re-render posts that already have HTML')
+    def render_posts_command(everything):
+        """Render stored HTML, table of contents and read time for posts"""
+        query = model.query if everything else model.query.filter(model.content_html.is_(None))
+        count = 0
+        for post in query.yield_per(200):
+            render_post(post)
+            # A backfill is not an edit, so updated_at keeps its value instead of taking onupdate's
+            flag_modified(post, 'updated_at')
+            count += 1
+        db.session.commit()
+        print(f'Rendered {count} posts')
@@ -0,0 +1,244 @@
+import gzip
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+from functools import wraps
+from flask import current_app, make_response, request
+from content_version import current_version
+from http_cache import etag_prefix, payload_etag
+from singleflight import SingleFlight
+
+try:
+    import brotli
+except ImportError:  # Brotli is optional, gzip is always available
+    brotli = None
+
+DEFAULT_MAX_BYTES = 32 * 1024 * 1024
+# How long after a content change the previous payload may still be served while it is rebuilt
+DEFAULT_STALE_SECONDS = 30
+# Bodies smaller than this are not worth compressing
+COMPRESS_MIN_SIZE = 1024
+# Headers rebuilt for every response instead of being replayed from the cache
+_SKIP_HEADERS = {'content-length', 'content-type', 'content-encoding', 'etag', 'vary'}
+# Rough per-entry bookkeeping cost on top of the stored bytes
+_ENTRY_OVERHEAD = 512
+
+
+class CachedResponse:
+    """Encoded body of a 200 response plus its precompressed variants"""
+
+    __slots__ = ('bodies', 'mimetype', 'headers', 'etag', 'version', 'last_modified', 'size')
+
+    def __init__(self, body, mimetype, headers, etag, version, last_modified):
+        self.bodies = {'identity': body}
+        if len(body) >= COMPRESS_MIN_SIZE:
+            compressed = gzip.compress(body, compresslevel=6)
+            if len(compressed) < len(body):
+                self.bodies['gzip'] = compressed
+            if brotli is not None:
+                compressed = brotli.compress(body, quality=5)
+                if len(compressed) < len(body):
+                    self.bodies['br'] = compressed
+        self.mimetype = mimetype
+        self.headers = headers
+        self.etag = etag
+        self.version = version
+        self.last_modified = last_modified
+        self.size = (sum(len(b) for b in self.bodies.values())
+                     + sum(len(k) + len(v) for k, v in headers) + _ENTRY_OVERHEAD)
+
+
+class ResponseCache:
+    """Byte-bounded LRU of encoded API responses for one worker
+
+    Every entry records the content version it was built from. Only entries
+    of the current shared version count as hits, so an admin commit in any
+    worker invalidates every worker's cache without a query. Older entries
+    stay around, until replaced or evicted, so they can be served stale
+    while a single refresh rebuilds them.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.flights = SingleFlight()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.stale_hits = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+    def lookup(self, key, version):
+        """Return (fresh entry or None, entry of an older version or None)"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None, None
+            self._entries.move_to_end(key)
+            if entry.version == version:
+                self.hits += 1
+                return entry, None
+            self.misses += 1
+            return None, (entry if entry.version < version else None)
+
+    def put(self, key, entry):
+        # A single entry may not take over more than a quarter of the cache
+        if entry.size > self.max_bytes // 4:
+            return
+        with self._lock:
+            old = self._entries.get(key)
+            # Never replace a payload with one built from an older version
+            if old is not None:
+                if old.version > entry.version:
+                    return
+                del self._entries[key]
+                self.bytes -= old.size
+            self._entries[key] = entry
+            self.bytes += entry.size
+            while self.bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.bytes -= evicted.size
+                self.evictions += 1
+
+    def count(self, counter):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self.bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'stale_hits': self.stale_hits,
+                'coalesced': self.coalesced,
+                'evictions': self.evictions,
+                'hit_ratio': self.hits / lookups if lookups else 0.0
+            }
+
+
+def get_response_cache():
+    """The ResponseCache for the running app, created on first use"""
+    cache = current_app.extensions.get('response_cache')
+    if cache is None:
+        max_bytes = current_app.config.get('RESPONSE_CACHE_MAX_BYTES', DEFAULT_MAX_BYTES)
+        cache = current_app.extensions.setdefault('response_cache', ResponseCache(max_bytes))
+    return cache
+
+
+def request_cache_key():
+    """Route plus sorted query arguments, so ?a=1&b=2 and ?b=2&a=1 share an entry
+
+    ?v= only says which content version the client was told about and does not
+    change the payload, so it is left out of the key.
+    """
+    view_args = tuple(sorted((request.view_args or {}).items()))
+    query_args = tuple(sorted((k, v) for k, v in request.args.items(multi=True) if k != 'v'))
+    return request.endpoint, view_args, query_args
+
+
+def _knows_version(version):
+    """True if the client was already told about this content version (?v=)"""
+    announced = request.args.get('v', type=int)
+    return announced is not None and announced >= version
+
+
+def _pick_encoding(entry):
+    for encoding in ('br', 'gzip'):
+        if encoding in entry.bodies and request.accept_encodings[encoding]:
+            return encoding
+    return 'identity'
+
+
+def build_response(entry, cache_status):
+    """Turn a cache entry into a response in the best encoding the client accepts"""
+    encoding = _pick_encoding(entry)
+    response = current_app.response_class(entry.bodies[encoding], mimetype=entry.mimetype)
+    response.headers.extend(entry.headers)
+    if encoding != 'identity':
+        response.headers['Content-Encoding'] = encoding
+        # Each encoding is a different representation and needs its own strong ETag
+        response.set_etag(f'{entry.etag}-{encoding}')
+    else:
+        response.set_etag(entry.etag)
+    if len(entry.bodies) > 1:
+        response.vary.add('Accept-Encoding')
+    response.last_modified = entry.last_modified
+    response.headers['X-Cache'] = cache_status
+    return response
+
+
+def entry_from_response(response, version, last_modified):
+    body = response.get_data()
+    headers = [(k, v) for k, v in response.headers.items() if k.lower() not in _SKIP_HEADERS]
+    return CachedResponse(body, response.mimetype, headers,
+                          payload_etag(etag_prefix(version), body), version, last_modified)
+
+
+def cached_response(f):
+    """Cache the encoded 200 responses of a read-only view per route and query args
+
+    A hit is served straight from bytes without touching SQLAlchemy or jsonify.
+    Concurrent misses for the same key wait on a single computation, and for
+    RESPONSE_CACHE_STALE_SECONDS after a content change the previous payload
+    is served while one background refresh rebuilds it, unless the request
+    names the new version with ?v= because it is refreshing after an update
+    announcement. Place it below
+    @conditional() so 304s are still answered first.
+    """
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if not current_app.config.get('RESPONSE_CACHE_ENABLED', True):
+            return f(*args, **kwargs)
+        cache = get_response_cache()
+        version, updated_at = current_version()
+        key = request_cache_key()
+        entry, stale = cache.lookup(key, version)
+        if entry is not None:
+            return build_response(entry, 'HIT')
+
+        uncacheable = {}
+
+        def compute():
+            version, updated_at = current_version()
+            response = make_response(f(*args, **kwargs))
+            if response.status_code != 200 or response.is_streamed:
+                uncacheable['response'] = response
+                return None
+            entry = entry_from_response(response, version, updated_at)
+            cache.put(key, entry)
+            return entry
+
+        stale_seconds = current_app.config.get('RESPONSE_CACHE_STALE_SECONDS', DEFAULT_STALE_SECONDS)
+        age = datetime.now(timezone.utc) - updated_at
+        if stale is not None and age.total_seconds() <= stale_seconds and not _knows_version(version):
+            app = current_app._get_current_object()
+            environ = dict(request.environ)
+
+            def refresh():
+                with app.request_context(environ):
+                    return compute()
+
+            cache.flights.do_in_background((key, version), refresh)
+            cache.count('stale_hits')
+            return build_response(stale, 'STALE')
+
+        entry, leader = cache.flights.do((key, version), compute)
+        if entry is None:
+            # The leader's result was not cacheable (e.g. a 404); followers build their own
+            return uncacheable.get('response') or make_response(f(*args, **kwargs))
+        if not leader:
+            cache.count('coalesced')
+        return build_response(entry, 'MISS' if leader else 'COALESCED')
+    return decorated_function
@@ -0,0 +1,145 @@
+import difflib
+import hashlib
+import json
+import zlib
+from flask import current_app
+from sqlalchemy import func
+
+# Every this many revisions a post's full content is stored instead of a delta,
+# bounding how many deltas a reconstruction applies
+DEFAULT_KEYFRAME_INTERVAL = 20
+
+
+def _session():
+    return current_app.extensions['sqlalchemy'].session
+
+
+def _lines(text):
+    return (text or '').splitlines(keepends=True)
+
+
+def make_delta(base, text):
+    """Line delta turning base into text: [start, count] copies base lines, a string is inserted"""
+    base_lines, lines = _lines(base), _lines(text)
+    ops = []
+    for tag, i1, i2, j1, j2 in difflib.SequenceMatcher(None, base_lines, lines, autojunk=False).get_opcodes():
+        if tag == 'equal':
+            ops.append([i1, i2 - i1])
+        elif j2 > j1:
+            ops.append(''.join(lines[j1:j2]))
+    return ops
+
+
+def apply_delta(base, ops):
+    base_lines = _lines(base)
+    return ''.join(''.join(base_lines[op[0]:op[0] + op[1]]) if isinstance(op, list) else op for op in ops)
+
+
+def _pack(value):
+    return zlib.compress(json.dumps(value, separators=(',', ':')).encode('utf-8'), 9)
+
+
+def _unpack(data):
+    return json.loads(zlib.decompress(data).decode('utf-8'))
+
+
+def content_hash(text):
+    return hashlib.sha256((text or '').encode('utf-8')).hexdigest()
+
+
+def keyframe_interval():
+    return current_app.config.get('REVISION_KEYFRAME_INTERVAL', DEFAULT_KEYFRAME_INTERVAL)
+
+
+def _latest(model, post_id):
+    return _session().query(model).filter(model.post_id == post_id) \
+        .order_by(model.number.desc()).first()
+
+
+def _replay(model, post_id, first, last):
+    """Yield (revision, content) for first..last, starting from the keyframe at or before first"""
+    start = _session().query(func.max(model.number)).filter(
+        model.post_id == post_id, model.number <= first, model.is_keyframe.is_(True)).scalar_subquery()
+    rows = _session().query(model).filter(model.post_id == post_id, model.number >= start,
+                                          model.number <= last).order_by(model.number)
+    content = None
+    for revision in rows:
+        value = _unpack(revision.data)
+        content = value if revision.is_keyframe else apply_delta(content, value)
+        if revision.number >= first:
+            yield revision, content
+
+
+def revision_contents(model, post_id, numbers):
+    """Content of several revisions of a post, reconstructed in one pass: {number: content}"""
+    wanted = set(numbers)
+    if not wanted:
+        return {}
+    return {revision.number: content
+            for revision, content in _replay(model, post_id, min(wanted), max(wanted))
+            if revision.number in wanted}
+
+
+def revision_content(model, post_id, number):
+    return revision_contents(model, post_id, [number]).get(number)
+
+
+def record_revision(model, post, user_id):
+    """Add a revision for post's current content unless it matches the latest one
+
+    The caller's commit persists it. Content is stored as a compressed delta
+    against the previous revision, or in full every keyframe_interval()
+    revisions and whenever the delta would not be smaller.
+    """
+    digest = content_hash(post.content)
+    latest = _latest(model, post.id)
+    if latest is not None and latest.content_hash == digest and latest.title == post.title:
+        return None
+    number = latest.number + 1 if latest else 1
+    full = _pack(post.content or '')
+    data, is_keyframe = full, True
+    if latest is not None and (number - 1) % keyframe_interval():
+        previous = revision_content(model, post.id, latest.number)
+        delta = _pack(make_delta(previous, post.content))
+        if len(delta) < len(full):
+            data, is_keyframe = delta, False
+    revision = model(post_id=post.id, number=number, user_id=user_id, title=post.title,
+                     is_keyframe=is_keyframe, data=data, content_hash=digest,
+                     size=len((post.content or '').encode('utf-8')))
+    _session().add(revision)
+    return revision
+
+
+def revision_list(model, post_id):
+    """Summaries of a post's revisions, newest first, without touching their content"""
+    rows = _session().query(model.number, model.title, model.user_id, model.created_at, model.size,
+                            func.length(model.data), model.is_keyframe) \
+        .filter(model.post_id == post_id).order_by(model.number.desc())
+    return [{
+        'number': number,
+        'title': title,
+        'user_id': user_id,
+        'created_at': created_at.isoformat() if created_at else None,
+        'size': size,
+        'stored_bytes': stored,
+        'keyframe': bool(keyframe),
+    } for number, title, user_id, created_at, size, stored, keyframe in rows]
+
+
+def unified_diff(a, b, fromfile, tofile, context=3):
+    """Unified diff of two texts, marking a last line without a newline the way diff(1) does"""
+    parts = []
+    for line in difflib.unified_diff(_lines(a), _lines(b), fromfile=fromfile, tofile=tofile, n=context):
+        parts.append(line)
+        # _lines() splits on every line boundary str.splitlines() knows, not only \n
+        if line.splitlines() == [line]:
+            parts.append('\n\\ No newline at end of file\n')
+    return ''.join(parts)
+
+
+def revision_diff(model, post_id, old, new, context=3):
+    """Unified diff between two revisions of a post, or None if either does not exist"""
+    contents = revision_contents(model, post_id, [old, new])
+    if old not in contents or new not in contents:
+        return None
+    return unified_diff(contents[old], contents[new], f'revision {old}', f'revision {new}', context)
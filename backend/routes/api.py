@@ -1,93 +1,93 @@
-from flask import Blueprint, jsonify, request
-from app import db
-from models import BlogPost, Category
-from sqlalchemy import desc
+from flask import Blueprint, jsonify, request, abort, current_app
+from content_version import current_version
+from http_cache import conditional
+from response_cache import cached_response
+from search import search_response
+from suggest import suggest_response
+from serializers import category_list, post_detail, post_list_response
+from updates import MAX_LONG_POLL_SECONDS, get_notifier, update_stream
 
-api = Blueprint('api', __name__)
 
-@api.route('/posts', methods=['GET'])
-def get_posts():
-    """Get all published blog posts"""
-    posts = BlogPost.query.filter_by(published=True).order_by(desc(BlogPost.created_at)).all()
-    return jsonify([{
-        'id': post.id,
-        'title': post.title,
-        'slug': post.slug,
-        'summary': post.summary,
-        'content': post.content,
-        'featured_image': post.featured_image,
-        'category': {
-            'id': post.category.id,
-            'name': post.category.name,
-            'slug': post.category.slug
-        } if post.category else None,
-        'read_time': post.read_time,
-        'created_at': post.created_at.isoformat(),
-        'updated_at': post.updated_at.isoformat() if post.updated_at else None
-    } for post in posts])
+def create_api(post_model, category_model):
+    """Blueprint for the public JSON API over post_model and category_model
 
-@api.route('/posts/<slug>', methods=['GET'])
-def get_post(slug):
-    """Get a specific blog post by slug"""
-    post = BlogPost.query.filter_by(slug=slug, published=True).first_or_404()
-    return jsonify({
-        'id': post.id,
-        'title': post.title,
-        'slug': post.slug,
-        'summary': post.summary,
-        'content': post.content,
-        'featured_image': post.featured_image,
-        'category': {
-            'id': post.category.id,
-            'name': post.category.name,
-            'slug': post.category.slug
-        } if post.category else None,
-        'read_time': post.read_time,
-        'created_at': post.created_at.isoformat(),
-        'updated_at': post.updated_at.isoformat() if post.updated_at else None
-    })
+    The models are passed in rather than imported, so app.py can build the
+    blueprint after defining them without a circular import.
+    """
+    api = Blueprint('api', __name__)
 
-@api.route('/categories', methods=['GET'])
-def get_categories():
-    """Get all categories"""
-    categories = Category.query.all()
-    return jsonify([{
-        'id': category.id,
-        'name': category.name,
-        'slug': category.slug
-    } for category in categories])
+    @api.route('/posts', methods=['GET'])
+    @conditional()
+    @cached_response
+    def get_posts():
+        """Get a page of published blog posts"""
+        return post_list_response(post_model, post_model.published == True)
 
-@api.route('/categories/<slug>/posts', methods=['GET'])
-def get_posts_by_category(slug):
-    """Get all published posts in a specific category"""
-    category = Category.query.filter_by(slug=slug).first_or_404()
-    posts = BlogPost.query.filter_by(category_id=category.id, published=True).order_by(desc(BlogPost.created_at)).all()
-    return jsonify([{
-        'id': post.id,
-        'title': post.title,
-        'slug': post.slug,
-        'summary': post.summary,
-        'content': post.content,
-        'featured_image': post.featured_image,
-        'category': {
-            'id': category.id,
-            'name': category.name,
-            'slug': category.slug
-        },
-        'read_time': post.read_time,
-        'created_at': post.created_at.isoformat(),
-        'updated_at': post.updated_at.isoformat() if post.updated_at else None
-    } for post in posts])
+    @api.route('/posts/<slug>', methods=['GET'])
+    @conditional()
+    @cached_response
+    def get_post(slug):
+        """Get a specific blog post by slug"""
+        post = post_detail(post_model, post_model.slug == slug, post_model.published == True)
+        if post is None:
+            abort(404)
+        return jsonify(post)
 
-@api.route('/check-updates', methods=['GET'])
-def check_updates():
-    """Check for any blog updates"""
-    latest_post = BlogPost.query.filter_by(published=True).order_by(desc(BlogPost.updated_at)).first()
-    if latest_post:
+    @api.route('/categories', methods=['GET'])
+    @conditional()
+    @cached_response
+    def get_categories():
+        """Get all categories"""
+        return jsonify(category_list(category_model))
+
+    @api.route('/categories/<slug>/posts', methods=['GET'])
+    @conditional()
+    @cached_response
+    def get_posts_by_category(slug):
+        """Get a page of published posts in a specific category"""
+        category = category_model.query.filter_by(slug=slug).first_or_404()
+        return post_list_response(post_model, post_model.category_id == category.id,
+                                  post_model.published == True)
+
+    @api.route('/search', methods=['GET'])
+    @conditional()
+    def search_posts():
+        """Get a page of published posts matching ?q=, best match first"""
+        return search_response(post_model)
+
+    @api.route('/suggest', methods=['GET'])
+    def suggest():
+        """Get posts and categories whose title, name or slug has a word starting with ?q="""
+        return suggest_response(post_model, category_model)
+
+    @api.route('/check-updates', methods=['GET'])
+    def check_updates():
+        """Check for any blog updates
+
+        With ?since=<version>&wait=<seconds> this long-polls until the content
+        version moves past since, as a fallback for clients without EventSource.
+        """
+        since = request.args.get('since', -1, type=int)
+        wait = min(request.args.get('wait', 0, type=float), MAX_LONG_POLL_SECONDS)
+        if since >= 0 and wait > 0:
+            get_notifier().wait(since, wait)
+        version, updated_at = current_version()
         return jsonify({
-            'last_update': latest_post.updated_at.isoformat(),
-            'has_updates': True
+            'version': version,
+            'last_update': updated_at.isoformat(),
+            'has_updates': version > since
         })
-    return jsonify({
-        'has_updates': False
-    }) 
\ No newline at end of file
+
+    @api.route('/updates/stream', methods=['GET'])
+    def update_events():
+        """Server-sent events stream with one 'update' event per content change"""
+        notifier = get_notifier()
+        since = request.headers.get('Last-Event-ID', type=int)
+        if since is None:
+            since = request.args.get('since', notifier.tracker.version, type=int)
+        response = current_app.response_class(update_stream(notifier, since), mimetype='text/event-stream')
+        response.headers['Cache-Control'] = 'no-cache'
+        response.headers['X-Accel-Buffering'] = 'no'  # Stop nginx from buffering the stream
+        return response
+
+    return api
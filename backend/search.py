@@ -0,0 +1,266 @@
+import html
+import re
+import threading
+from collections import OrderedDict
+from flask import current_app, jsonify, request
+from sqlalchemy import bindparam, event, text
+from sqlalchemy.exc import OperationalError
+from content_version import current_version
+from pagination import parse_limit, set_pagination_headers
+from serializers import SUMMARY_FIELDS, post_query, serialize_post_row
+
+# bm25 weights for title, summary and content: a title match counts most
+RANK_WEIGHTS = (10.0, 5.0, 1.0)
+SNIPPET_TOKENS = 24
+# Terms past this many are ignored, and results past MAX_OFFSET are not paged to
+MAX_QUERY_TERMS = 8
+MAX_OFFSET = 200
+# Broad queries are ranked among their newest matches plus the newest older posts matching in the title
+DEFAULT_RANK_WINDOW = 1000
+DEFAULT_TITLE_WINDOW = 200
+# Newest posts a term's share of the index is estimated from, and terms remembered per worker
+COMMON_TERM_SAMPLE = 2000
+DEFAULT_COMMON_TERMS_ENTRIES = 4096
+
+_TERM = re.compile(r'\w+')
+# Control characters cannot come from a form field, so they safely mark matches until the snippet is escaped
+_MARK_OPEN, _MARK_CLOSE = '\x02', '\x03'
+
+
+def _session():
+    return current_app.extensions['sqlalchemy'].session
+
+
+def fts_table(model):
+    return f'{model.__tablename__}_fts'
+
+
+def search_index_ddl(model):
+    """Statements creating model's FTS5 index of published posts and the triggers keeping it in sync"""
+    table, fts = model.__tablename__, fts_table(model)
+    weights = ', '.join(str(w) for w in RANK_WEIGHTS)
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5("
+        f"title, summary, content, tokenize = 'porter unicode61 remove_diacritics 2')",
+        f"INSERT INTO {fts}({fts}, rank) VALUES ('rank', 'bm25({weights})')",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_insert AFTER INSERT ON {table} WHEN new.published BEGIN "
+        f"INSERT INTO {fts}(rowid, title, summary, content) VALUES (new.id, new.title, new.summary, new.content); "
+        f"END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_delete AFTER DELETE ON {table} BEGIN "
+        f"DELETE FROM {fts} WHERE rowid = old.id; "
+        f"END",
+        # Only edits to indexed text or to published touch the index, not image or timestamp updates
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_update AFTER UPDATE OF title, summary, content, published "
+        f"ON {table} BEGIN "
+        f"DELETE FROM {fts} WHERE rowid = old.id; "
+        f"INSERT INTO {fts}(rowid, title, summary, content) "
+        f"SELECT new.id, new.title, new.summary, new.content WHERE new.published; "
+        f"END",
+    ]
+
+
+def rebuild_search_index(connection, model):
+    """Create the index if needed and refill it from the published posts"""
+    for statement in search_index_ddl(model):
+        connection.execute(text(statement))
+    fts = fts_table(model)
+    connection.execute(text(f'DELETE FROM {fts}'))
+    connection.execute(text(f'INSERT INTO {fts}(rowid, title, summary, content) '
+                            f'SELECT id, title, summary, content FROM {model.__tablename__} WHERE published'))
+
+
+def match_expression(query):
+    """FTS5 MATCH expression for free text: every term must match"""
+    terms = _TERM.findall(query.lower())[:MAX_QUERY_TERMS]
+    if not terms:
+        return None
+    # Quoting keeps FTS5 operators and column filters typed by users from being interpreted
+    return ' '.join(f'"{term}"' for term in terms)
+
+
+def parse_offset(cursor):
+    if not cursor:
+        return 0
+    try:
+        offset = int(cursor)
+    except ValueError:
+        raise ValueError('Invalid cursor')
+    if not 0 <= offset <= MAX_OFFSET:
+        raise ValueError('Invalid cursor')
+    return offset
+
+
+def snippet_html(raw):
+    return html.escape(raw or '').replace(_MARK_OPEN, '<mark>').replace(_MARK_CLOSE, '</mark>')
+
+
+class CommonTerms:
+    """Remembers which terms occur in more than half of the indexed posts
+
+    bm25 gives such a term an IDF of almost zero, so it does not change the
+    order, yet FTS5 reads the term's whole match list on every query to find
+    that out. The share is estimated from the newest posts and kept per
+    worker without invalidation: it moves slowly, and near one half the
+    term's weight is close to zero either way.
+    """
+
+    def __init__(self, max_terms=DEFAULT_COMMON_TERMS_ENTRIES):
+        self.max_terms = max_terms
+        self._terms = OrderedDict()
+        self._lock = threading.Lock()
+        # (content version, lowest rowid in the sample, posts in the sample)
+        self._sample = (None, 0, 0)
+
+    def _sample_bounds(self, session, fts):
+        version, _ = current_version()
+        sample_version, start, rows = self._sample
+        if sample_version != version:
+            start, rows = session.execute(text(
+                f"SELECT coalesce(min(rowid), 0), count(*) FROM ("
+                f"SELECT rowid FROM {fts} ORDER BY rowid DESC LIMIT :sample)"
+            ), {'sample': COMMON_TERM_SAMPLE}).one()
+            self._sample = (version, start, rows)
+        return start, rows
+
+    def common(self, session, fts, phrase):
+        with self._lock:
+            common = self._terms.get(phrase)
+            if common is not None:
+                self._terms.move_to_end(phrase)
+                return common
+        start, rows = self._sample_bounds(session, fts)
+        hits = session.execute(text(
+            f"SELECT count(*) FROM {fts} WHERE {fts} MATCH :phrase AND rowid >= :start"
+        ), {'phrase': phrase, 'start': start}).scalar()
+        common = hits * 2 > rows
+        with self._lock:
+            self._terms[phrase] = common
+            if len(self._terms) > self.max_terms:
+                self._terms.popitem(last=False)
+        return common
+
+
+def get_common_terms():
+    terms = current_app.extensions.get('search_common_terms')
+    if terms is None:
+        max_terms = current_app.config.get('SEARCH_COMMON_TERMS_ENTRIES', DEFAULT_COMMON_TERMS_ENTRIES)
+        terms = current_app.extensions.setdefault('search_common_terms', CommonTerms(max_terms))
+    return terms
+
+
+def _ranked_matches(model, expression, limit, offset):
+    """[(post id, snippet)] for one page, best match first"""
+    fts = fts_table(model)
+    session = _session()
+    common_terms = get_common_terms()
+    # match_expression() joins one quoted phrase per term with spaces
+    weighed = [phrase for phrase in expression.split(' ') if not common_terms.common(session, fts, phrase)]
+    if not weighed:
+        # Every term is in most posts and bm25 would score them all alike, so show the newest
+        page = session.execute(text(
+            f"SELECT rowid FROM {fts} WHERE {fts} MATCH :match ORDER BY rowid DESC LIMIT :limit OFFSET :offset"
+        ), {'match': expression, 'limit': limit, 'offset': offset}).scalars().all()
+    else:
+        window = max(current_app.config.get('SEARCH_RANK_WINDOW', DEFAULT_RANK_WINDOW), MAX_OFFSET + limit)
+        # Walking the match list by rowid is cheap, so find where the newest `window` matches start
+        cutoff = session.execute(text(
+            f"SELECT rowid FROM {fts} WHERE {fts} MATCH :match ORDER BY rowid DESC LIMIT 1 OFFSET :window"
+        ), {'match': expression, 'window': window}).scalar()
+        # Older posts still compete when the query matches their title, so a strong title match is
+        # not cut from a broad query. Ranking by the weighed terms alone gives the same order without
+        # reading the common terms' match lists. The unary + keeps SQLite from turning IN into a
+        # lookup per id, each of which would recompute bm25's statistics. Ties go to the newer post,
+        # so pages do not overlap.
+        page = session.execute(text(
+            f"SELECT rowid FROM {fts} WHERE {fts} MATCH :weighed AND +rowid IN ("
+            f"SELECT rowid FROM {fts} WHERE {fts} MATCH :match AND rowid > :cutoff "
+            f"UNION ALL SELECT * FROM ("
+            f"SELECT rowid FROM {fts} WHERE {fts} MATCH :title AND rowid <= :cutoff "
+            f"ORDER BY rowid DESC LIMIT :title_window)) "
+            f"ORDER BY rank, rowid DESC LIMIT :limit OFFSET :offset"
+        ), {'weighed': ' '.join(weighed), 'match': expression, 'title': f'title : ({expression})',
+            'cutoff': cutoff or 0, 'limit': limit, 'offset': offset,
+            'title_window': current_app.config.get('SEARCH_TITLE_WINDOW', DEFAULT_TITLE_WINDOW)}
+        ).scalars().all()
+    if not page:
+        return []
+    # snippet() only runs for the rows on the page
+    snippets = dict(session.execute(text(
+        f"SELECT rowid, snippet({fts}, -1, :open, :close, '…', :tokens) FROM {fts} "
+        f"WHERE {fts} MATCH :match AND rowid IN :ids"
+    ).bindparams(bindparam('ids', expanding=True)),
+        {'open': _MARK_OPEN, 'close': _MARK_CLOSE, 'tokens': SNIPPET_TOKENS, 'match': expression,
+         'ids': page}).all())
+    return [(post_id, snippet_html(snippets.get(post_id))) for post_id in page]
+
+
+def _like_matches(model, query, limit, offset):
+    # Databases without FTS5 get unranked substring matches, newest first
+    pattern = '%' + query.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+    rows = _session().query(model.id, model.summary).filter(
+        model.published == True,
+        model.title.ilike(pattern, escape='\\') | model.summary.ilike(pattern, escape='\\') |
+        model.content.ilike(pattern, escape='\\')
+    ).order_by(model.created_at.desc(), model.id.desc()).limit(limit).offset(offset)
+    return [(post_id, html.escape(summary or '')) for post_id, summary in rows]
+
+
+def search_response(model):
+    """Paginated JSON search results for ?q=, with a highlighted snippet per post
+
+    Honors ?cursor= and ?limit= like the other listings.
+    """
+    query = request.args.get('q', '').strip()
+    expression = match_expression(query)
+    try:
+        if expression is None:
+            raise ValueError('q must contain at least one word')
+        limit = parse_limit(request.args.get('limit'))
+        offset = parse_offset(request.args.get('cursor'))
+    except ValueError as e:
+        response = jsonify({'status': 'error', 'message': str(e)})
+        response.status_code = 400
+        return response
+    try:
+        if _session().get_bind().dialect.name == 'sqlite':
+            matches = _ranked_matches(model, expression, limit + 1, offset)
+        else:
+            matches = _like_matches(model, query, limit + 1, offset)
+    except OperationalError:
+        _session().rollback()
+        current_app.logger.exception('Search failed')
+        response = jsonify({'status': 'error', 'message': 'Search is not available'})
+        response.status_code = 503
+        return response
+
+    next_cursor = None
+    if len(matches) > limit:
+        matches = matches[:limit]
+        if offset + limit <= MAX_OFFSET:
+            next_cursor = str(offset + limit)
+    rows = post_query(model, SUMMARY_FIELDS).filter(model.id.in_([post_id for post_id, _ in matches])).all()
+    by_id = {row.id: row for row in rows}
+    results = []
+    for post_id, snippet in matches:
+        row = by_id.get(post_id)
+        if row is not None:
+            data = serialize_post_row(row, SUMMARY_FIELDS)
+            data['snippet'] = snippet
+            results.append(data)
+    return set_pagination_headers(jsonify(results), next_cursor)
+
+
+def init_search(app, db, model):
+    """Build model's search index whenever its table is created, and add `flask rebuild-search`"""
+
+    @event.listens_for(model.__table__, 'after_create')
+    def create_search_index(target, connection, **kw):
+        if connection.dialect.name == 'sqlite':
+            rebuild_search_index(connection, model)
+
+    @app.cli.command('rebuild-search')
+    def rebuild_search_command():
+        """Refill the full-text search index from the published posts"""
+        with db.engine.begin() as connection:
+            rebuild_search_index(connection, model)
+        print(f'Rebuilt {fts_table(model)}')
@@ -0,0 +1,157 @@
+from flask import current_app, g, has_request_context, jsonify, request
+from sqlalchemy import event, func, inspect
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import joinedload
+from images import image_data
+from pagination import paginate, parse_limit, set_pagination_headers
+
+# Every field a post can be serialized with
+POST_FIELDS = ('id', 'title', 'slug', 'summary', 'content', 'content_html', 'toc', 'word_count',
+               'featured_image', 'image', 'category', 'author', 'read_time', 'created_at', 'updated_at')
+
+# Listings default to everything except the body, its table of contents and the author
+SUMMARY_FIELDS = ('id', 'title', 'slug', 'summary', 'featured_image', 'image', 'category',
+                  'read_time', 'created_at', 'updated_at')
+
+# Per-endpoint query totals for this worker: endpoint -> {'requests', 'queries', 'max'}
+query_stats = {}
+
+
+def _session():
+    return current_app.extensions['sqlalchemy'].session
+
+
+def _related(model, name):
+    """Model class on the other side of a relationship, e.g. Category for 'category'"""
+    return inspect(model).relationships[name].mapper.class_
+
+
+def parse_fields(raw, default=SUMMARY_FIELDS):
+    """Parse a comma separated ?fields= value, raising ValueError on unknown names"""
+    if not raw:
+        return default
+    fields = tuple(dict.fromkeys(f.strip() for f in raw.split(',') if f.strip()))
+    unknown = [f for f in fields if f not in POST_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown field(s): {', '.join(unknown)}")
+    return fields or default
+
+
+def post_query(model, fields):
+    """Build a query selecting only the columns needed for fields
+
+    Category and author columns come from joins in the same statement, so each
+    result row already holds everything needed to serialize the post.
+    """
+    category_model = _related(model, 'category')
+    author_model = _related(model, 'author')
+    # id and created_at are always selected for the pagination cursor
+    columns = [model.id, model.created_at]
+    for field in fields:
+        if field == 'category':
+            columns += [
+                category_model.id.label('category_id'),
+                category_model.name.label('category_name'),
+                category_model.slug.label('category_slug'),
+                category_model.icon.label('category_icon')
+            ]
+        elif field == 'author':
+            columns.append(author_model.username.label('author'))
+        elif field == 'image':
+            columns += [
+                model.featured_image.label('image_file'),
+                model.image_width,
+                model.image_height,
+                model.image_variants
+            ]
+        elif field == 'summary':
+            # Posts saved without a summary fall back to their first paragraph
+            columns.append(func.coalesce(func.nullif(model.summary, ''), model.excerpt).label('summary'))
+        elif field not in ('id', 'created_at'):
+            columns.append(getattr(model, field))
+    query = _session().query(*columns).select_from(model)
+    if 'category' in fields:
+        query = query.outerjoin(category_model, model.category_id == category_model.id)
+    if 'author' in fields:
+        query = query.outerjoin(author_model, model.user_id == author_model.id)
+    return query
+
+
+def serialize_post_row(row, fields):
+    """Serialize a row from post_query without touching the ORM"""
+    data = {}
+    for field in fields:
+        if field == 'category':
+            data['category'] = {
+                'id': row.category_id,
+                'name': row.category_name,
+                'slug': row.category_slug,
+                'icon': row.category_icon
+            } if row.category_id is not None else None
+        elif field == 'image':
+            data['image'] = image_data(row.image_file, row.image_width, row.image_height, row.image_variants)
+        elif field in ('created_at', 'updated_at'):
+            value = getattr(row, field)
+            data[field] = value.isoformat() if value else None
+        else:
+            data[field] = getattr(row, field)
+    return data
+
+
+def post_list_response(model, *criteria):
+    """Paginated JSON listing of posts matching criteria
+
+    Honors ?cursor=, ?limit= and ?fields= from the current request.
+    """
+    try:
+        fields = parse_fields(request.args.get('fields'))
+        limit = parse_limit(request.args.get('limit'))
+        rows, next_cursor = paginate(post_query(model, fields).filter(*criteria), model,
+                                     cursor=request.args.get('cursor'), limit=limit)
+    except ValueError as e:
+        response = jsonify({'status': 'error', 'message': str(e)})
+        response.status_code = 400
+        return response
+    response = jsonify([serialize_post_row(row, fields) for row in rows])
+    return set_pagination_headers(response, next_cursor)
+
+
+def post_detail(model, *criteria):
+    """Serialize the single post matching criteria with every field, or None"""
+    row = post_query(model, POST_FIELDS).filter(*criteria).first()
+    return serialize_post_row(row, POST_FIELDS) if row else None
+
+
+def category_list(model):
+    """Serialize all categories from plain row tuples"""
+    rows = _session().query(model.id, model.name, model.slug, model.icon).order_by(model.id).all()
+    return [{'id': row.id, 'name': row.name, 'slug': row.slug, 'icon': row.icon} for row in rows]
+
+
+def with_relations(query, model):
+    """Eager load category and author for views that need full ORM objects"""
+    return query.options(joinedload(model.category), joinedload(model.author))
+
+
+def _count_query(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context():
+        g.query_count = g.get('query_count', 0) + 1
+
+
+def _report_query_count(response):
+    count = g.get('query_count', 0)
+    endpoint = request.endpoint or request.path
+    stats = query_stats.setdefault(endpoint, {'requests': 0, 'queries': 0, 'max': 0})
+    stats['requests'] += 1
+    stats['queries'] += count
+    stats['max'] = max(stats['max'], count)
+    response.headers['X-Query-Count'] = str(count)
+    if count > current_app.config.get('QUERY_COUNT_WARNING', 10):
+        current_app.logger.warning('%s issued %d queries (possible N+1)', endpoint, count)
+    return response
+
+
+def init_query_counter(app):
+    """Count SQL statements per request and report them in X-Query-Count"""
+    event.listen(Engine, 'before_cursor_execute', _count_query)
+    app.after_request(_report_query_count)
@@ -0,0 +1,74 @@
+import logging
+from flask import g, request
+from flask.sessions import SessionInterface
+
+logger = logging.getLogger(__name__)
+
+# Requests under these prefixes never read or write the session store
+DEFAULT_BYPASS_PREFIXES = ('/api/', '/static/', '/dist/', '/assets/', '/scripts/', '/backend/static/')
+# Nor do requests for files with these extensions, e.g. /styles.css served by serve_static
+DEFAULT_BYPASS_EXTENSIONS = ('.css', '.js', '.map', '.png', '.jpg', '.jpeg', '.gif', '.webp', '.avif',
+                             '.svg', '.ico', '.woff', '.woff2', '.ttf')
+
+# Worker totals: store reads/writes and requests answered without touching the store
+session_stats = {'reads': 0, 'writes': 0, 'bypassed': 0, 'skipped_new': 0}
+
+
+def _count_io(kind):
+    session_stats[kind] += 1
+    g.session_io = g.get('session_io', 0) + 1
+
+
+class SessionBypassInterface(SessionInterface):
+    """Wraps the Flask-Session interface so requests that need no session skip its store
+
+    Allowlisted paths get an empty session without the cookie being looked
+    up. Requests without a session cookie get an empty session that is only
+    persisted if the view actually writes to it (e.g. a login). Each
+    response carries X-Session-IO with the number of store operations.
+    """
+
+    def __init__(self, inner, prefixes=DEFAULT_BYPASS_PREFIXES, extensions=DEFAULT_BYPASS_EXTENSIONS):
+        self.inner = inner
+        self.prefixes = tuple(prefixes)
+        self.extensions = tuple(extensions)
+
+    def is_bypassed(self, request):
+        path = request.path
+        return path.startswith(self.prefixes) or path.lower().endswith(self.extensions)
+
+    def open_session(self, app, request):
+        if self.is_bypassed(request):
+            session = self.inner.session_class(sid=None)
+            session.bypassed = True
+            return session
+        if not request.cookies.get(app.config['SESSION_COOKIE_NAME']):
+            # A fresh session; permanent is applied on save so it starts out empty and unmodified
+            session = self.inner.session_class(sid=self.inner._generate_sid())
+            session.new = True
+            return session
+        _count_io('reads')
+        return self.inner.open_session(app, request)
+
+    def save_session(self, app, session, response):
+        if getattr(session, 'bypassed', False):
+            session_stats['bypassed'] += 1
+            if session.modified:
+                logger.warning('Session written on bypassed path %s; not saved', request.path)
+        elif getattr(session, 'new', False) and not session.modified:
+            session_stats['skipped_new'] += 1
+        else:
+            if getattr(session, 'new', False) and self.inner.permanent:
+                session.permanent = True
+            _count_io('writes')
+            self.inner.save_session(app, session, response)
+        response.headers['X-Session-IO'] = str(g.get('session_io', 0))
+
+
+def init_session_bypass(app):
+    """Wrap the session interface installed by Session(app)"""
+    app.session_interface = SessionBypassInterface(
+        app.session_interface,
+        prefixes=app.config.get('SESSION_BYPASS_PREFIXES', DEFAULT_BYPASS_PREFIXES),
+        extensions=app.config.get('SESSION_BYPASS_EXTENSIONS', DEFAULT_BYPASS_EXTENSIONS))
+    return app.session_interface
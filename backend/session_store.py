@@ -0,0 +1,186 @@
+import logging
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from flask_session.sessions import ServerSideSession, SessionInterface
+from itsdangerous import BadSignature, want_bytes
+
+logger = logging.getLogger(__name__)
+
+# Seconds between expiry sweeps in each worker
+SWEEP_INTERVAL = 60
+# Expired rows deleted per statement, so a sweep never holds the write lock for long
+SWEEP_BATCH = 1000
+# Unmodified sessions are re-saved only once less than this fraction of their lifetime is left
+REFRESH_FRACTION = 0.5
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS sessions (
+    id TEXT PRIMARY KEY,
+    data BLOB NOT NULL,
+    expires REAL NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS ix_sessions_expires ON sessions (expires);
+'''
+
+
+class SQLiteSession(ServerSideSession):
+    def __init__(self, initial=None, sid=None, permanent=None, expires=None):
+        super().__init__(initial, sid, permanent)
+        # Expiry time stored with the row, None for a session not yet saved
+        self.expires = expires
+
+
+class SessionDatabase:
+    """Sessions in one SQLite table in WAL mode, keyed by session id
+
+    Loads and saves are single primary-key statements, readers never block
+    the writer, and expired rows are removed in batches by sweep().
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        conn = self._connect()
+        conn.executescript(_SCHEMA)
+        conn.close()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        return conn
+
+    @property
+    def conn(self):
+        # One connection per thread (and per process, as connections must not cross a fork)
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = self._local.conn = self._connect()
+            self._local.pid = os.getpid()
+        return conn
+
+    def load(self, sid, now=None):
+        """Return (data, expires) for a live session, or (None, None)"""
+        row = self.conn.execute('SELECT data, expires FROM sessions WHERE id = ?', (sid,)).fetchone()
+        if row is None or row[1] <= (now or time.time()):
+            return None, None
+        return pickle.loads(row[0]), row[1]
+
+    def save(self, sid, data, expires):
+        self.conn.execute('INSERT OR REPLACE INTO sessions (id, data, expires) VALUES (?, ?, ?)',
+                          (sid, pickle.dumps(data, pickle.HIGHEST_PROTOCOL), expires))
+
+    def delete(self, sid):
+        self.conn.execute('DELETE FROM sessions WHERE id = ?', (sid,))
+
+    def sweep(self, now=None, batch=SWEEP_BATCH):
+        """Delete expired sessions in batches; returns the number removed"""
+        now = now or time.time()
+        removed = 0
+        while True:
+            cursor = self.conn.execute(
+                'DELETE FROM sessions WHERE id IN (SELECT id FROM sessions WHERE expires <= ? LIMIT ?)',
+                (now, batch))
+            removed += cursor.rowcount
+            if cursor.rowcount < batch:
+                return removed
+
+    def count(self):
+        return self.conn.execute('SELECT COUNT(*) FROM sessions').fetchone()[0]
+
+
+class SQLiteSessionInterface(SessionInterface):
+    """Flask-Session compatible interface backed by SessionDatabase"""
+
+    session_class = SQLiteSession
+
+    def __init__(self, path, key_prefix='session:', use_signer=False, permanent=True,
+                 sweep_interval=SWEEP_INTERVAL):
+        self.db = SessionDatabase(path)
+        self.key_prefix = key_prefix
+        self.use_signer = use_signer
+        self.permanent = permanent
+        self.sweep_interval = sweep_interval
+        self._sweeper_pid = None
+        self._sweeper_lock = threading.Lock()
+
+    def _ensure_sweeper(self):
+        # Threads do not survive a fork, so start the sweeper in each worker process
+        if self._sweeper_pid == os.getpid() or not self.sweep_interval:
+            return
+        with self._sweeper_lock:
+            if self._sweeper_pid != os.getpid():
+                self._sweeper_pid = os.getpid()
+                threading.Thread(target=self._sweep_forever, name='session-sweeper', daemon=True).start()
+
+    def _sweep_forever(self):
+        while True:
+            time.sleep(self.sweep_interval)
+            try:
+                removed = self.db.sweep()
+                if removed:
+                    logger.info('Removed %d expired sessions', removed)
+            except sqlite3.Error:
+                logger.exception('Session sweep failed')
+
+    def open_session(self, app, request):
+        self._ensure_sweeper()
+        sid = request.cookies.get(app.config['SESSION_COOKIE_NAME'])
+        if not sid:
+            return self.session_class(sid=self._generate_sid(), permanent=self.permanent)
+        if self.use_signer:
+            signer = self._get_signer(app)
+            if signer is None:
+                return None
+            try:
+                sid = signer.unsign(sid).decode()
+            except BadSignature:
+                return self.session_class(sid=self._generate_sid(), permanent=self.permanent)
+        data, expires = self.db.load(self.key_prefix + sid)
+        if data is not None:
+            return self.session_class(data, sid=sid, expires=expires)
+        return self.session_class(sid=sid, permanent=self.permanent)
+
+    def save_session(self, app, session, response):
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        if not session:
+            if session.modified:
+                self.db.delete(self.key_prefix + session.sid)
+                response.delete_cookie(app.config['SESSION_COOKIE_NAME'], domain=domain, path=path)
+            return
+
+        lifetime = app.permanent_session_lifetime.total_seconds()
+        now = time.time()
+        # An unchanged session is only re-saved to push its expiry out
+        if not session.modified and session.expires is not None \
+                and session.expires - now > lifetime * REFRESH_FRACTION:
+            return
+
+        session.expires = now + lifetime
+        self.db.save(self.key_prefix + session.sid, dict(session), session.expires)
+        session_id = session.sid
+        if self.use_signer:
+            session_id = self._get_signer(app).sign(want_bytes(session.sid)).decode()
+        response.set_cookie(app.config['SESSION_COOKIE_NAME'], session_id,
+                            expires=self.get_expiration_time(app, session),
+                            httponly=self.get_cookie_httponly(app), domain=domain, path=path,
+                            secure=self.get_cookie_secure(app), samesite=self.get_cookie_samesite(app))
+
+
+def init_session_store(app):
+    """Replace the Flask-Session interface with the SQLite store when SESSION_BACKEND is 'sqlite'"""
+    if app.config.get('SESSION_BACKEND') != 'sqlite':
+        return app.session_interface
+    path = app.config.get('SESSION_SQLITE_PATH') or os.path.join(app.instance_path, 'sessions.db')
+    app.session_interface = SQLiteSessionInterface(
+        path,
+        key_prefix=app.config.get('SESSION_KEY_PREFIX', 'session:'),
+        use_signer=app.config.get('SESSION_USE_SIGNER', False),
+        permanent=app.config.get('SESSION_PERMANENT', True),
+        sweep_interval=app.config.get('SESSION_SWEEP_INTERVAL', SWEEP_INTERVAL))
+    return app.session_interface
@@ -0,0 +1,74 @@
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Followers give up waiting on a leader after this long and compute for themselves
+DEFAULT_WAIT_SECONDS = 10
+
+
+class _Call:
+    __slots__ = ('event', 'result', 'error')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Collapse concurrent calls for the same key into a single computation
+
+    The first caller for a key (the leader) runs the function; callers that
+    arrive while it is running wait for and share its result.
+    """
+
+    def __init__(self, wait_seconds=DEFAULT_WAIT_SECONDS):
+        self.wait_seconds = wait_seconds
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn):
+        """Run fn once for all concurrent callers of key; returns (result, was_leader)"""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            if not call.event.wait(self.wait_seconds):
+                return fn(), True
+            if call.error is not None:
+                raise call.error
+            return call.result, False
+
+        try:
+            call.result = fn()
+            return call.result, True
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+
+    def in_flight(self, key):
+        with self._lock:
+            return key in self._calls
+
+    def do_in_background(self, key, fn):
+        """Start fn in a thread unless a computation for key is already running"""
+        if self.in_flight(key):
+            return False
+
+        def run():
+            try:
+                self.do(key, fn)
+            except Exception:
+                # The next foreground request recomputes and surfaces the error
+                logger.exception('Background computation for %r failed', key)
+
+        threading.Thread(target=run, name=f'singleflight-{key!r:.40}', daemon=True).start()
+        return True
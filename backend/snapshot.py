@@ -0,0 +1,298 @@
+import contextlib
+import hashlib
+import json
+import os
+import re
+import threading
+from flask import current_app, render_template, request, send_file
+from markupsafe import escape
+from content_version import file_lock
+from http_cache import cache_control_for
+from serializers import category_list, post_detail, post_list_response
+from static_assets import compressed_variants, write_atomic
+
+SNAPSHOT_DIR = 'snapshot'
+MANIFEST_NAME = 'manifest.json'
+LOCK_NAME = '.lock'
+# Response headers kept alongside a snapshot file, e.g. the next page of a listing
+KEPT_HEADERS = ('Link', 'X-Next-Cursor')
+POST_PAGE_SHELL = 'blog-post.html'
+# Quality 11 is several times slower for a few percent on pages this size, and saves rewrite the snapshot often
+DEFAULT_BROTLI_QUALITY = 9
+# Only URL paths under these prefixes are looked up in the snapshot
+SERVED_PREFIXES = ('/api/', '/blog/')
+
+# Slugs that are safe as a single file name; posts with other slugs stay dynamic
+_SAFE_SLUG = re.compile(r'[\w-][\w.-]*')
+_CONTENT_PLACEHOLDER = re.compile(rb'(<div class="blog-post-content")>.*?</div>', re.S)
+_TITLE = re.compile(rb'<title>.*?</title>', re.S)
+
+
+def _file_name(url_path):
+    """/api/posts -> api/posts.json, /blog/<slug> -> blog/<slug>.html, /feed.xml -> feed.xml"""
+    if not url_path.startswith(SERVED_PREFIXES):
+        return url_path.lstrip('/')
+    extension = '.html' if url_path.startswith('/blog/') else '.json'
+    return url_path.lstrip('/') + extension
+
+
+class Snapshot:
+    """Pre-rendered responses on disk, keyed by URL path through a manifest
+
+    Every file has .gz and .br siblings when they are smaller. Any worker may
+    rewrite part of the tree; the others notice through the manifest's mtime.
+    """
+
+    def __init__(self, directory, site_root, brotli_quality=DEFAULT_BROTLI_QUALITY):
+        self.directory = directory
+        self.brotli_quality = brotli_quality
+        # Where blog-post.html, the shell of the pre-rendered post pages, lives
+        self.site_root = site_root
+        self.entries = {}
+        self._mtime = None
+        self._lock = threading.Lock()
+
+    @property
+    def manifest_path(self):
+        return os.path.join(self.directory, MANIFEST_NAME)
+
+    def exists(self):
+        return os.path.exists(self.manifest_path)
+
+    def refresh(self):
+        """Re-read the manifest if another worker (or `flask export-static`) replaced it"""
+        try:
+            mtime = os.stat(self.manifest_path).st_mtime_ns
+        except OSError:
+            mtime = None
+        if mtime == self._mtime:
+            return
+        with self._lock:
+            try:
+                with open(self.manifest_path, encoding='utf-8') as file:
+                    self.entries = json.load(file)
+            except (OSError, ValueError):
+                self.entries = {}
+            self._mtime = mtime
+
+    @contextlib.contextmanager
+    def update(self):
+        """Hold the snapshot's file lock while changing files, then publish the manifest"""
+        os.makedirs(self.directory, exist_ok=True)
+        fd = os.open(os.path.join(self.directory, LOCK_NAME), os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            with file_lock(fd):
+                self._mtime = None
+                self.refresh()
+                yield self
+                write_atomic(self.manifest_path, json.dumps(self.entries, indent=2, sort_keys=True).encode('utf-8'))
+        finally:
+            # Entries changed in memory must not outlive a failed update; the next refresh re-reads the manifest
+            self._mtime = None
+            os.close(fd)
+
+    def write(self, url_path, body, mimetype, cache_control, headers=None):
+        """Store body for url_path; unchanged bodies are not rewritten or recompressed"""
+        etag = hashlib.sha256(body).hexdigest()[:24]
+        entry = self.entries.get(url_path)
+        if entry is not None and entry['etag'] == etag:
+            return False
+        path = os.path.join(self.directory, _file_name(url_path))
+        write_atomic(path, body)
+        encodings = []
+        for encoding, (suffix, compressed) in compressed_variants(body, self.brotli_quality).items():
+            write_atomic(path + suffix, compressed)
+            encodings.append(encoding)
+        for suffix in {'.gz', '.br'} - {'.gz' if e == 'gzip' else '.br' for e in encodings}:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(path + suffix)
+        self.entries[url_path] = {'etag': etag, 'mimetype': mimetype, 'cache_control': cache_control,
+                                  'encodings': sorted(encodings), 'headers': headers or {}}
+        return True
+
+    def remove(self, url_path):
+        if self.entries.pop(url_path, None) is None:
+            return False
+        path = os.path.join(self.directory, _file_name(url_path))
+        for suffix in ('', '.gz', '.br'):
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(path + suffix)
+        return True
+
+    def send(self, url_path):
+        """Response for url_path in the best stored encoding the client accepts, or None"""
+        entry = self.entries.get(url_path)
+        if entry is None:
+            return None
+        path = os.path.join(self.directory, _file_name(url_path))
+        encodings = entry['encodings']
+        encoding = next((e for e in ('br', 'gzip') if e in encodings and request.accept_encodings[e]), None)
+        suffix = {'br': '.br', 'gzip': '.gz'}.get(encoding, '')
+        try:
+            # Honors USE_X_SENDFILE, so a front server can stream the file instead of the worker
+            response = send_file(path + suffix, mimetype=entry['mimetype'], conditional=True,
+                                 etag=f'{entry["etag"]}{suffix}')
+        except FileNotFoundError:
+            # Removed by a concurrent update; the dynamic view answers instead
+            return None
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+        if encodings:
+            response.vary.add('Accept-Encoding')
+        response.headers['Cache-Control'] = entry['cache_control']
+        response.headers['X-Cache'] = 'SNAPSHOT'
+        response.headers.update(entry['headers'])
+        return response
+
+
+def get_snapshot():
+    return current_app.extensions['snapshot']
+
+
+def _session():
+    return current_app.extensions['sqlalchemy'].session
+
+
+def _write_response(snapshot, url_path, endpoint, response):
+    headers = {name: response.headers[name] for name in KEPT_HEADERS if name in response.headers}
+    return snapshot.write(url_path, response.get_data(), response.mimetype, cache_control_for(endpoint), headers)
+
+
+def _post_page(shell, post):
+    """blog-post.html with the article already in place"""
+    article = render_template('snapshot/post.html', post=post).encode('utf-8')
+    page = _CONTENT_PLACEHOLDER.sub(lambda m: m.group(1) + b' data-prerendered="true">' + article + b'</div>',
+                                    shell, count=1)
+    page = _TITLE.sub(b'<title>' + str(escape(post['title'])).encode('utf-8') + b' - Dipayan Dutta Blog</title>',
+                      page, count=1)
+    # Relative links in the shell are written for the site root, not /blog/
+    page = page.replace(b'<head>', b'<head>\n    <base href="/">', 1)
+    assets = current_app.extensions.get('static_assets')
+    return assets.rewrite_html(page) if assets is not None else page
+
+
+def _read_shell(snapshot):
+    with open(os.path.join(snapshot.site_root, POST_PAGE_SHELL), 'rb') as file:
+        return file.read()
+
+
+def _write_post(snapshot, shell, post_model, slug):
+    """Write /api/posts/<slug> and /blog/<slug>, or drop them if the post is gone or unpublished"""
+    api_path, page_path = f'/api/posts/{slug}', f'/blog/{slug}'
+    if not _SAFE_SLUG.fullmatch(slug or ''):
+        return 0
+    with current_app.test_request_context(api_path):
+        post = post_detail(post_model, post_model.slug == slug, post_model.published == True)
+        if post is None:
+            return int(snapshot.remove(api_path)) + int(snapshot.remove(page_path))
+        written = _write_response(snapshot, api_path, 'api.get_post', current_app.json.response(post))
+    with current_app.test_request_context(page_path):
+        written += snapshot.write(page_path, _post_page(shell, post), 'text/html', 'no-cache')
+    return written
+
+
+def _write_category(snapshot, post_model, category_model, slug):
+    url_path = f'/api/categories/{slug}/posts'
+    if not _SAFE_SLUG.fullmatch(slug or ''):
+        return 0
+    category = _session().query(category_model.id).filter_by(slug=slug).first()
+    if category is None:
+        return int(snapshot.remove(url_path))
+    with current_app.test_request_context(url_path):
+        response = post_list_response(post_model, post_model.category_id == category.id,
+                                      post_model.published == True)
+        return int(_write_response(snapshot, url_path, 'api.get_posts_by_category', response))
+
+
+def _write_listings(snapshot, post_model, category_model):
+    with current_app.test_request_context('/api/posts'):
+        response = post_list_response(post_model, post_model.published == True)
+        written = _write_response(snapshot, '/api/posts', 'api.get_posts', response)
+    with current_app.test_request_context('/api/categories'):
+        written += _write_response(snapshot, '/api/categories', 'api.get_categories',
+                                   current_app.json.response(category_list(category_model)))
+    return written
+
+
+def export_snapshot(post_model, category_model):
+    """Write the whole snapshot and drop files for posts and categories that no longer exist
+
+    Returns (files written, files removed). Files whose content did not change are kept as they are.
+    """
+    snapshot = get_snapshot()
+    shell = _read_shell(snapshot)
+    with snapshot.update():
+        stale = set(snapshot.entries)
+        written = _write_listings(snapshot, post_model, category_model)
+        stale -= {'/api/posts', '/api/categories'}
+        slugs = [row.slug for row in _session().query(category_model.slug)]
+        for slug in slugs:
+            written += _write_category(snapshot, post_model, category_model, slug)
+            stale.discard(f'/api/categories/{slug}/posts')
+        query = _session().query(post_model.slug).filter(post_model.published == True).yield_per(500)
+        for slug in [row.slug for row in query]:
+            written += _write_post(snapshot, shell, post_model, slug)
+            stale -= {f'/api/posts/{slug}', f'/blog/{slug}'}
+        removed = sum(snapshot.remove(url_path) for url_path in stale)
+    return written, removed
+
+
+def _touched_paths(post_slugs, category_slugs):
+    paths = ['/api/posts', '/api/categories']
+    paths += [f'/api/categories/{slug}/posts' for slug in category_slugs]
+    for slug in post_slugs:
+        paths += [f'/api/posts/{slug}', f'/blog/{slug}']
+    return paths
+
+
+def update_snapshot(post_model, category_model, post_slugs=(), category_slugs=()):
+    """Regenerate only the files a save touched, if a snapshot has been exported
+
+    post_slugs and category_slugs should hold both the old and the new slug of
+    anything renamed, so the old files are removed. The first pages of
+    /api/posts and /api/categories are always rewritten. If that fails, the
+    touched URLs are dropped from the snapshot and the dynamic views answer
+    for them until the next export.
+    """
+    snapshot = get_snapshot()
+    if not snapshot.exists():
+        return
+    post_slugs, category_slugs = set(post_slugs) - {None}, set(category_slugs) - {None}
+    try:
+        shell = _read_shell(snapshot)
+        with snapshot.update():
+            _write_listings(snapshot, post_model, category_model)
+            for slug in category_slugs:
+                _write_category(snapshot, post_model, category_model, slug)
+            for slug in post_slugs:
+                _write_post(snapshot, shell, post_model, slug)
+    except Exception:
+        current_app.logger.exception('Snapshot update failed')
+        with snapshot.update():
+            for url_path in _touched_paths(post_slugs, category_slugs):
+                snapshot.remove(url_path)
+
+
+def _serve_snapshot():
+    if request.method not in ('GET', 'HEAD') or request.query_string or not request.path.startswith(SERVED_PREFIXES):
+        return None
+    snapshot = get_snapshot()
+    snapshot.refresh()
+    return snapshot.send(request.path)
+
+
+def init_snapshot(app, site_root, post_model, category_model):
+    """Serve the exported snapshot ahead of the views and add `flask export-static`"""
+    directory = app.config.get('SNAPSHOT_DIR') or os.path.join(site_root, SNAPSHOT_DIR)
+    snapshot = Snapshot(directory, site_root, app.config.get('SNAPSHOT_BROTLI_QUALITY', DEFAULT_BROTLI_QUALITY))
+    app.extensions['snapshot'] = snapshot
+    if app.config.get('SNAPSHOT_ENABLED', True):
+        app.before_request(_serve_snapshot)
+
+    @app.cli.command('export-static')
+    def export_static_command():
+        """Pre-render every public API response and post page into the snapshot directory"""
+        written, removed = export_snapshot(post_model, category_model)
+        print(f'Snapshot in {directory}: {written} files written, {removed} removed')
+
+    return snapshot
@@ -0,0 +1,187 @@
+import glob
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import re
+from flask import current_app, request, send_file, url_for
+
+try:
+    import brotli
+except ImportError:  # Brotli is optional, gzip is always available
+    brotli = None
+
+# Fingerprinted files never change, so browsers and proxies may keep them for a year
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+OUTPUT_DIR = 'dist'
+MANIFEST_NAME = 'manifest.json'
+# Site files served by serve_static, relative to the repo root
+SITE_PATTERNS = ('*.css', '*.js', 'scripts/*.js', 'assets/*')
+# Flask static files used by the Jinja templates, published under static/
+STATIC_PATTERNS = ('css/*.css', 'js/*.js', '*.css')
+COMPRESSIBLE_EXTENSIONS = {'.css', '.js', '.svg', '.json', '.txt', '.html', '.map'}
+# Skip a compressed sibling unless it saves at least this fraction of the file
+MIN_SAVING = 0.05
+FINGERPRINT_LENGTH = 12
+_SUFFIXES = {'gzip': '.gz', 'br': '.br'}
+
+# src="..." and href="..." attributes in index.html
+_ASSET_ATTRIBUTE = re.compile(rb'''((?:src|href)=)(["'])([^"'#?]+)\2''')
+
+
+def fingerprinted_name(name, digest):
+    """styles.css -> styles.<hash>.css"""
+    base, ext = os.path.splitext(name)
+    return f'{base}.{digest[:FINGERPRINT_LENGTH]}{ext}'
+
+
+def write_atomic(path, data):
+    # Several workers may build at boot; readers never see a partial file
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f'{path}.{os.getpid()}.tmp'
+    with open(tmp, 'wb') as file:
+        file.write(data)
+    os.replace(tmp, path)
+
+
+def _write_once(path, data):
+    # Outputs are content-addressed, so an existing file is already correct
+    if not os.path.exists(path):
+        write_atomic(path, data)
+
+
+def compressed_variants(data, brotli_quality=11):
+    variants = {'gzip': ('.gz', gzip.compress(data, compresslevel=9, mtime=0))}
+    if brotli is not None:
+        variants['br'] = ('.br', brotli.compress(data, quality=brotli_quality))
+    return {encoding: (suffix, body) for encoding, (suffix, body) in variants.items()
+            if len(body) <= len(data) * (1 - MIN_SAVING)}
+
+
+def _read_manifest(output_dir):
+    try:
+        with open(os.path.join(output_dir, MANIFEST_NAME), encoding='utf-8') as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return {}
+
+
+def _sources(site_root, static_root):
+    for pattern in SITE_PATTERNS:
+        for path in sorted(glob.glob(os.path.join(site_root, pattern))):
+            yield os.path.relpath(path, site_root).replace(os.sep, '/'), path
+    for pattern in STATIC_PATTERNS:
+        for path in sorted(glob.glob(os.path.join(static_root, pattern))):
+            yield 'static/' + os.path.relpath(path, static_root).replace(os.sep, '/'), path
+
+
+def build_assets(site_root, static_root, output_dir):
+    """Write fingerprinted copies plus .gz/.br siblings and return the manifest
+
+    Runs incrementally: unchanged sources map to files that already exist, so
+    only new content is written and compressed. A file listed in the previous
+    manifest whose compressed siblings are all on disk is not compressed again.
+    """
+    previous = {entry['path']: entry['encodings'] for entry in _read_manifest(output_dir).values()}
+    manifest = {}
+    for name, path in _sources(site_root, static_root):
+        if not os.path.isfile(path):
+            continue
+        with open(path, 'rb') as file:
+            data = file.read()
+        target = fingerprinted_name(name, hashlib.sha256(data).hexdigest())
+        target_path = os.path.join(output_dir, target)
+        _write_once(target_path, data)
+        encodings = previous.get(target)
+        if encodings is not None and all(os.path.exists(target_path + _SUFFIXES[e]) for e in encodings):
+            manifest[name] = {'path': target, 'encodings': encodings}
+            continue
+        encodings = []
+        if os.path.splitext(name)[1].lower() in COMPRESSIBLE_EXTENSIONS:
+            for encoding, (suffix, body) in compressed_variants(data).items():
+                _write_once(target_path + suffix, body)
+                encodings.append(encoding)
+        manifest[name] = {'path': target, 'encodings': sorted(encodings)}
+
+    write_atomic(os.path.join(output_dir, MANIFEST_NAME),
+                  json.dumps(manifest, indent=2, sort_keys=True).encode('utf-8'))
+    return manifest
+
+
+class AssetManifest:
+    """Logical asset names mapped to fingerprinted, precompressed files"""
+
+    def __init__(self, output_dir, url_prefix):
+        self.output_dir = output_dir
+        self.url_prefix = url_prefix
+        self.entries = {}
+        self.encodings = {}
+
+    def load(self):
+        self.entries = _read_manifest(self.output_dir)
+        self.encodings = {entry['path']: entry['encodings'] for entry in self.entries.values()}
+        return self
+
+    def url(self, name):
+        """Public URL of a fingerprinted asset, or None if it is not in the manifest"""
+        entry = self.entries.get(name.replace('\\', '/').lstrip('/'))
+        if entry is None:
+            return None
+        return f'{self.url_prefix}/{entry["path"]}'
+
+    def rewrite_html(self, content):
+        """Point src/href attributes at their fingerprinted URLs"""
+        def replace(match):
+            url = self.url(match.group(3).decode('utf-8', 'replace'))
+            if url is None:
+                return match.group(0)
+            return match.group(1) + match.group(2) + url.encode('utf-8') + match.group(2)
+        return _ASSET_ATTRIBUTE.sub(replace, content)
+
+    def send(self, path):
+        """Response for a fingerprinted file in the best precompressed encoding the client accepts"""
+        encodings = self.encodings.get(path)
+        if encodings is None:
+            return None
+        full_path = os.path.join(self.output_dir, path)
+        mimetype = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        encoding = next((e for e in ('br', 'gzip') if e in encodings and request.accept_encodings[e]), None)
+        if encoding is None:
+            response = send_file(full_path, mimetype=mimetype, conditional=True)
+        else:
+            suffix = '.br' if encoding == 'br' else '.gz'
+            response = send_file(full_path + suffix, mimetype=mimetype, conditional=True)
+            response.headers['Content-Encoding'] = encoding
+        if encodings:
+            response.vary.add('Accept-Encoding')
+        response.headers['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+        return response
+
+
+def get_assets():
+    return current_app.extensions['static_assets']
+
+
+def asset_url(name):
+    """Template helper: fingerprinted URL for a Flask static file, url_for('static') as fallback"""
+    return get_assets().url('static/' + name) or url_for('static', filename=name)
+
+
+def init_static_assets(app, site_root):
+    """Build (when ASSETS_AUTO_BUILD, the default) and load the asset manifest"""
+    output_dir = app.config.get('ASSETS_OUTPUT_DIR') or os.path.join(site_root, OUTPUT_DIR)
+    if app.config.get('ASSETS_AUTO_BUILD', True):
+        build_assets(site_root, app.static_folder, output_dir)
+    assets = AssetManifest(output_dir, '/' + OUTPUT_DIR).load()
+    app.extensions['static_assets'] = assets
+    app.jinja_env.globals['asset_url'] = asset_url
+
+    @app.cli.command('build-assets')
+    def build_assets_command():
+        """Fingerprint and precompress static assets into the output directory"""
+        manifest = build_assets(site_root, app.static_folder, output_dir)
+        assets.load()
+        print(f'Built {len(manifest)} assets into {output_dir}')
+
+    return assets
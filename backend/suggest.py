@@ -0,0 +1,231 @@
+import re
+import threading
+import unicodedata
+from bisect import bisect_left, insort
+from flask import current_app, jsonify, request
+from sqlalchemy import func
+from content_version import current_version
+
+DEFAULT_LIMIT = 8
+MAX_LIMIT = 20
+# Newest published posts kept in the index; older ones are left to /api/search
+DEFAULT_MAX_POSTS = 20000
+# Keys start at each of a title's first words, so "flask" finds "Getting started with Flask"
+WORDS_PER_TITLE = 6
+KEY_LENGTH = 40
+# Matching keys looked at per lookup before the best `limit` are picked
+SCAN_LIMIT = 200
+
+_NON_WORD = re.compile(r'[\W_]+')
+_KINDS = ('category', 'post')
+
+
+def normalize(text):
+    """Lowercase, accent-free, single-spaced form that keys and queries are compared in"""
+    text = text or ''
+    if not text.isascii():
+        text = unicodedata.normalize('NFKD', text)
+        text = ''.join(c for c in text if not unicodedata.combining(c))
+    return _NON_WORD.sub(' ', text.lower()).strip()
+
+
+def _post_keys(text, slug, words=WORDS_PER_TITLE):
+    """Keys for a title or category name starting at each of its first words, plus one for the slug"""
+    parts = normalize(text).split(' ')
+    keys = [' '.join(parts[i:])[:KEY_LENGTH] for i in range(min(words, len(parts))) if parts[i]]
+    return keys + [normalize(slug)[:KEY_LENGTH]]
+
+
+class SuggestIndex:
+    """Sorted array of (key, kind, id, word position) searched with bisect
+
+    Each title contributes one key per leading word, each slug and category
+    name one more. A lookup is a binary search plus a short scan, so it does
+    not touch the database. Memory is bounded by max_posts.
+    """
+
+    def __init__(self, max_posts=DEFAULT_MAX_POSTS):
+        self.max_posts = max_posts
+        self.version = None
+        # Latest updated_at seen; None until the first full load
+        self.watermark = None
+        self._entries = []
+        self._items = {}
+        self._post_ids = set()
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def _entries_for(kind, item_id, keys):
+        return [(key, kind, item_id, position) for position, key in enumerate(keys)]
+
+    def _add(self, kind, item_id, keys, payload):
+        # Caller holds self._lock
+        self._remove(kind, item_id)
+        entries = self._entries_for(kind, item_id, keys)
+        for entry in entries:
+            insort(self._entries, entry)
+        self._items[(kind, item_id)] = (entries, payload)
+        if kind == 'post':
+            self._post_ids.add(item_id)
+
+    def _remove(self, kind, item_id):
+        old = self._items.pop((kind, item_id), None)
+        if old:
+            for entry in old[0]:
+                i = bisect_left(self._entries, entry)
+                if i < len(self._entries) and self._entries[i] == entry:
+                    del self._entries[i]
+            if kind == 'post':
+                self._post_ids.discard(item_id)
+
+    def set_post(self, post_id, title, slug, published):
+        with self._lock:
+            if not published:
+                self._remove('post', post_id)
+                return
+            self._add('post', post_id, _post_keys(title, slug), {'type': 'post', 'title': title, 'slug': slug})
+            if len(self._post_ids) > self.max_posts:
+                self._remove('post', min(self._post_ids))
+
+    def remove_post(self, post_id):
+        with self._lock:
+            self._remove('post', post_id)
+
+    def set_category(self, category_id, name, slug):
+        with self._lock:
+            self._add('category', category_id, _post_keys(name, slug),
+                      {'type': 'category', 'name': name, 'slug': slug})
+
+    def replace(self, posts, categories):
+        """Swap in a freshly built index: posts as (id, title, slug), categories as (id, name, slug)"""
+        entries, items = [], {}
+        for kind, rows, field in (('category', categories, 'name'), ('post', posts, 'title')):
+            for item_id, text, slug in rows:
+                own = self._entries_for(kind, item_id, _post_keys(text, slug))
+                entries += own
+                items[(kind, item_id)] = (own, {'type': kind, field: text, 'slug': slug})
+        # One sort instead of an insort per key
+        entries.sort()
+        with self._lock:
+            self._entries, self._items = entries, items
+            self._post_ids = {item_id for item_id, _, _ in posts}
+
+    def lookup(self, query, limit=DEFAULT_LIMIT):
+        prefix = normalize(query)[:KEY_LENGTH]
+        if not prefix:
+            return []
+        best = {}
+        with self._lock:
+            i = bisect_left(self._entries, (prefix,))
+            end = min(len(self._entries), i + SCAN_LIMIT)
+            while i < end and self._entries[i][0].startswith(prefix):
+                key, kind, item_id, position = self._entries[i]
+                # Categories first, then matches on a title's first word, then shorter and newer titles
+                rank = (_KINDS.index(kind), position, len(key), -item_id)
+                ref = (kind, item_id)
+                if ref not in best or rank < best[ref]:
+                    best[ref] = rank
+                i += 1
+            ranked = sorted(best.items(), key=lambda item: item[1])[:limit]
+            return [self._items[ref][1] for ref, _ in ranked]
+
+    def category_ids(self):
+        with self._lock:
+            return {item_id for kind, item_id in self._items if kind == 'category'}
+
+    def post_ids(self):
+        with self._lock:
+            return set(self._post_ids)
+
+
+def get_suggest_index():
+    return current_app.extensions['suggest']
+
+
+def _session():
+    return current_app.extensions['sqlalchemy'].session
+
+
+def _load(index, session, post_model, categories):
+    posts = session.query(post_model.id, post_model.title, post_model.slug) \
+        .filter(post_model.published == True) \
+        .order_by(post_model.id.desc()).limit(index.max_posts).all()
+    index.replace(posts, categories)
+    index.watermark = session.query(func.max(post_model.updated_at)).scalar()
+
+
+def _catch_up(index, session, post_model, categories):
+    """Apply changes since the watermark; False if posts were deleted and a full load is needed"""
+    for category_id in index.category_ids() - {row.id for row in categories}:
+        with index._lock:
+            index._remove('category', category_id)
+    for row in categories:
+        index.set_category(row.id, row.name, row.slug)
+    changed = session.query(post_model.id, post_model.title, post_model.slug, post_model.published,
+                            post_model.updated_at) \
+        .filter(post_model.published.in_([True, False]), post_model.updated_at >= index.watermark)
+    for row in changed:
+        index.set_post(row.id, row.title, row.slug, row.published)
+        index.watermark = max(index.watermark, row.updated_at)
+    indexed = index.post_ids()
+    if not indexed:
+        return True
+    # Deletions leave no updated_at behind; a count mismatch over the indexed id range reveals them
+    live = session.query(post_model.id).filter(post_model.published == True,
+                                               post_model.id >= min(indexed)).count()
+    return live == len(indexed)
+
+
+def refresh_index(index, post_model, category_model):
+    """Bring index up to the current content version
+
+    The first call loads the newest posts. Later calls only read posts
+    updated since the last one and the category table, and reload fully
+    when posts were deleted.
+    """
+    version = current_version()[0]
+    if version == index.version:
+        return
+    with index._refresh_lock:
+        if version == index.version:
+            return
+        session = _session()
+        categories = session.query(category_model.id, category_model.name, category_model.slug).all()
+        if index.watermark is None or not _catch_up(index, session, post_model, categories):
+            _load(index, session, post_model, categories)
+        index.version = version
+
+
+def update_suggest(post_model, category_model, deleted_post_ids=()):
+    """Apply a save to this worker's index right after the commit
+
+    Deleted posts are dropped by id, so a delete does not force a full reload.
+    Other workers catch up on their next lookup, when they see the new content
+    version. Failures are logged and the lookup path retries.
+    """
+    index = get_suggest_index()
+    try:
+        for post_id in deleted_post_ids:
+            index.remove_post(post_id)
+        refresh_index(index, post_model, category_model)
+    except Exception:
+        current_app.logger.exception('Suggest index update failed')
+
+
+def suggest_response(post_model, category_model):
+    """JSON list of posts and categories whose title, name or slug has a word starting with ?q="""
+    index = get_suggest_index()
+    refresh_index(index, post_model, category_model)
+    limit = min(max(request.args.get('limit', DEFAULT_LIMIT, type=int), 1), MAX_LIMIT)
+    return jsonify(index.lookup(request.args.get('q', ''), limit))
+
+
+def init_suggest(app):
+    """Create the worker's typeahead index; it fills itself on the first lookup"""
+    index = SuggestIndex(app.config.get('SUGGEST_MAX_POSTS', DEFAULT_MAX_POSTS))
+    app.extensions['suggest'] = index
+    return index
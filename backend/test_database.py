@@ -0,0 +1,69 @@
+"""Check the engine configuration against whatever DATABASE_URL points at
+
+Usage:
+    python test_database.py
+    DATABASE_URL=postgresql://localhost/spedorio_test python test_database.py
+
+Without DATABASE_URL it runs against a throwaway SQLite database. Creates
+the tables if needed, inserts posts inside a transaction that is rolled back
+and asserts that stream_query returns all of them in order. On Postgres it
+also checks that pooled connections survive their backend being terminated;
+elsewhere that test is skipped.
+"""
+import os
+import sys
+import tempfile
+import pytest
+
+if not os.environ.get('DATABASE_URL'):
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'test_database.db')}"
+
+from app import app, db, User, Category, Post  # noqa: E402
+from db_profile import stream_query  # noqa: E402
+
+ROWS = 2000
+
+
+def test_stream_query():
+    with app.app_context():
+        engine = db.engine
+        print(f"Database: {engine.url.render_as_string(hide_password=True)}")
+        print(f"Dialect: {engine.dialect.name}, server-side cursors: {engine.dialect.supports_server_side_cursors}")
+        print(f"Engine options: {app.config.get('SQLALCHEMY_ENGINE_OPTIONS')}")
+        db.create_all()
+
+        user = User(username='test_database_user', email='test_database@example.invalid', password_hash='x')
+        category = Category(name='Test database', slug='test-database', icon='fa-database')
+        db.session.add_all([user, category])
+        db.session.flush()
+        db.session.add_all([Post(title=f'Streamed {i}', slug=f'test-database-{i}', content='body',
+                                 category_id=category.id, user_id=user.id) for i in range(ROWS)])
+        db.session.flush()
+
+        try:
+            query = Post.query.filter(Post.category_id == category.id).order_by(Post.id)
+            streamed = [post.slug for post in stream_query(query, 250)]
+        finally:
+            db.session.rollback()
+        assert streamed == [f'test-database-{i}' for i in range(ROWS)], f'Streamed {len(streamed)} of {ROWS} posts'
+
+
+def test_reconnect_after_terminated_backend():
+    with app.app_context():
+        engine = db.engine
+        if engine.dialect.name != 'postgresql':
+            pytest.skip('Needs DATABASE_URL pointing at Postgres')
+        # A connection the server killed is replaced by pool_pre_ping instead of failing the next query
+        with engine.connect() as killer:
+            with engine.connect() as victim:
+                pid = victim.execute(db.text('SELECT pg_backend_pid()')).scalar()
+            # The victim is back in the pool when its backend goes away
+            killer.execute(db.text('SELECT pg_terminate_backend(:pid)'), {'pid': pid})
+        for _ in range(2):
+            with engine.connect() as conn:
+                assert conn.execute(db.text('SELECT 1')).scalar() == 1
+        print(f"Pool: {engine.pool.status()}")
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, '-v', '-s']))
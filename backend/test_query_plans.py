@@ -0,0 +1,140 @@
+"""Fail if a public endpoint reads posts with a full table scan or a sort
+
+Usage:
+    python test_query_plans.py
+    DATABASE_URL=postgresql://localhost/spedorio_test python test_query_plans.py
+
+Without DATABASE_URL it runs against a throwaway SQLite database. A few
+posts are added for the duration of the test when there are none, then
+removed. It calls every public post endpoint with the response cache off, records the
+SELECTs it sends to the post table and runs EXPLAIN on each. On SQLite a
+plain "SCAN post" or a temporary B-tree for ORDER BY is a failure; on
+Postgres sequential scans and sorts are disabled for the EXPLAIN so any
+"Seq Scan" or "Sort" node means no index fits the query.
+"""
+import os
+import re
+import sys
+import tempfile
+from sqlalchemy import event
+
+if not os.environ.get('DATABASE_URL'):
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'test_query_plans.db')}"
+
+from app import app, db, Category, Post, User  # noqa: E402
+
+SEED_PREFIX = 'test-query-plans'
+SEED_POSTS = 30
+
+POST_TABLE = re.compile(r'\b(?:FROM|JOIN)\s+"?(post|blog_post)"?(?:\s|$)', re.IGNORECASE)
+
+
+def seed_posts():
+    """Add posts when the database has none to query; returns whether it did"""
+    with app.app_context():
+        db.create_all()
+        if Post.query.filter_by(published=True).first() is not None:
+            return False
+        user = User(username=SEED_PREFIX, email=f'{SEED_PREFIX}@example.invalid', password_hash='x')
+        category = Category(name=SEED_PREFIX, slug=SEED_PREFIX, icon='fa-database')
+        db.session.add_all([user, category])
+        db.session.flush()
+        db.session.add_all([Post(title=f'Plan {i}', slug=f'{SEED_PREFIX}-{i}', content='body', published=i % 5 != 0,
+                                 category_id=category.id, user_id=user.id) for i in range(SEED_POSTS)])
+        db.session.commit()
+        return True
+
+
+def remove_seed():
+    with app.app_context():
+        Post.query.filter(Post.slug.like(f'{SEED_PREFIX}-%')).delete(synchronize_session=False)
+        Category.query.filter_by(slug=SEED_PREFIX).delete()
+        User.query.filter_by(username=SEED_PREFIX).delete()
+        db.session.commit()
+
+
+def public_urls():
+    with app.app_context():
+        post = Post.query.filter_by(published=True).order_by(Post.created_at.desc()).first()
+        category = Category.query.first()
+    urls = ['/api/posts', '/api/posts?limit=1', '/api/posts?fields=id,title,author']
+    if post is not None:
+        urls.append(f'/api/posts/{post.slug}')
+    if category is not None:
+        urls.append(f'/api/categories/{category.slug}/posts')
+    return urls
+
+
+def capture_statements(urls):
+    """(url, statement, parameters) for every post SELECT the urls issue, following one next page"""
+    statements = []
+    current = {}
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith('SELECT') and POST_TABLE.search(statement):
+            statements.append((current['url'], statement, parameters))
+
+    app.config['RESPONSE_CACHE_ENABLED'] = False
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', record)
+    try:
+        client = app.test_client()
+        for url in urls:
+            current['url'] = url
+            response = client.get(url)
+            next_cursor = response.headers.get('X-Next-Cursor')
+            if next_cursor:
+                current['url'] = f'{url} (next page)'
+                client.get(url + ('&' if '?' in url else '?') + f'cursor={next_cursor}')
+    finally:
+        event.remove(engine, 'before_cursor_execute', record)
+    return statements
+
+
+def plan_problems(conn, statement, parameters):
+    """Lines of the query plan that show a scan or a sort, with the whole plan for context"""
+    if conn.dialect.name == 'sqlite':
+        rows = conn.exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters).fetchall()
+        plan = [row[-1] for row in rows]
+        bad = [line for line in plan
+               if re.match(r'SCAN (post|blog_post)\b(?!.*USING)', line) or 'TEMP B-TREE' in line]
+    else:
+        conn.exec_driver_sql('SET enable_seqscan = off')
+        conn.exec_driver_sql('SET enable_sort = off')
+        plan = [row[0] for row in conn.exec_driver_sql('EXPLAIN ' + statement, parameters).fetchall()]
+        bad = [line for line in plan
+               if re.search(r'Seq Scan on (post|blog_post)\b', line) or re.search(r'->\s+Sort\b|^Sort\b', line)]
+    return bad, plan
+
+
+def test_query_plans():
+    seeded = seed_posts()
+    try:
+        statements = capture_statements(public_urls())
+    finally:
+        if seeded:
+            remove_seed()
+    assert statements, 'No post queries were captured'
+    failures = []
+    with app.app_context():
+        with db.engine.connect() as conn:
+            for url, statement, parameters in statements:
+                bad, plan = plan_problems(conn, statement, parameters)
+                status = 'FAIL' if bad else 'ok'
+                print(f"[{status}] {url}")
+                for line in plan:
+                    print(f"       {line}")
+                if bad:
+                    failures.append(url)
+            conn.rollback()
+    assert not failures, f"Full scan or sort in: {', '.join(failures)}"
+
+
+if __name__ == "__main__":
+    try:
+        test_query_plans()
+    except AssertionError as e:
+        print(e)
+        sys.exit(1)
+    print("All public post queries use an index")
@@ -0,0 +1,49 @@
+"""Check that rendered post HTML drops script links however the scheme is spelled
+
+Usage:
+    python -m pytest test_rendering.py
+"""
+import sys
+import pytest
+from rendering import render_markdown
+
+UNSAFE_LINKS = [
+    '[x](javascript:alert(1))',
+    '[x](JavaScript:alert(1))',
+    '[x](&#106;avascript:alert(1))',
+    '[x](&#x6A;ava&#115;cript:alert(1))',
+    '[x](java&#x09;script:alert(1))',
+    '[x](jav&Tab;ascript:alert(1))',
+    '[x](javascript&colon;alert(1))',
+    '[x](<java\tscript:alert(1)>)',
+    '[x](<\x01javascript:alert(1)>)',
+    '![x](&#x64;ata:text/html,x)',
+    '![x](vbscript:msgbox(1))',
+]
+
+SAFE_LINKS = [
+    ('[x](https://example.com/?a=1&amp;b=2)', 'href="https://example.com/?a=1&amp;b=2"'),
+    ('[x](mailto:me@example.com)', 'href="mailto:me@example.com"'),
+    ('[x](/blog/other-post)', 'href="/blog/other-post"'),
+    ('[x](#section)', 'href="#section"'),
+]
+
+
+@pytest.mark.parametrize('source', UNSAFE_LINKS)
+def test_unsafe_scheme_is_dropped(source):
+    content_html = render_markdown(source)['content_html']
+    assert 'href=' not in content_html and 'src=' not in content_html, content_html
+
+
+@pytest.mark.parametrize('source, expected', SAFE_LINKS)
+def test_safe_link_is_kept(source, expected):
+    assert expected in render_markdown(source)['content_html']
+
+
+def test_raw_html_is_escaped():
+    content_html = render_markdown('<script>alert(1)</script>\n\nHi <img src=x onerror=alert(1)>')['content_html']
+    assert '<script' not in content_html and '<img' not in content_html, content_html
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, '-v']))
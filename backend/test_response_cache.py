@@ -0,0 +1,69 @@
+"""Check that a refetch after an update announcement gets the new content
+
+Usage:
+    python -m pytest test_response_cache.py
+
+Without DATABASE_URL it runs against a throwaway SQLite database. A post is
+added for the duration of the test and removed afterwards.
+"""
+import os
+import sys
+import tempfile
+import pytest
+
+if not os.environ.get('DATABASE_URL'):
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'test_response_cache.db')}"
+
+from app import app, db, Category, Post, User  # noqa: E402
+from content_version import current_version  # noqa: E402
+from response_cache import get_response_cache  # noqa: E402
+
+SEED_PREFIX = 'test-response-cache'
+
+
+@pytest.fixture
+def post_slug(monkeypatch):
+    with app.app_context():
+        db.create_all()
+        user = User(username=SEED_PREFIX, email=f'{SEED_PREFIX}@example.invalid', password_hash='x')
+        category = Category(name=SEED_PREFIX, slug=SEED_PREFIX, icon='fa-database')
+        db.session.add_all([user, category])
+        db.session.flush()
+        db.session.add(Post(title='Before', slug=SEED_PREFIX, content='body', published=True,
+                            category_id=category.id, user_id=user.id))
+        db.session.commit()
+    monkeypatch.setitem(app.config, 'RESPONSE_CACHE_ENABLED', True)
+    yield SEED_PREFIX
+    with app.app_context():
+        get_response_cache().clear()
+        Post.query.filter_by(slug=SEED_PREFIX).delete()
+        Category.query.filter_by(slug=SEED_PREFIX).delete()
+        User.query.filter_by(username=SEED_PREFIX).delete()
+        db.session.commit()
+
+
+def test_announced_version_skips_stale_payload(post_slug):
+    client = app.test_client()
+    url = f'/api/posts/{post_slug}'
+    assert client.get(url).get_json()['title'] == 'Before'
+    assert client.get(url).headers['X-Cache'] == 'HIT'
+
+    with app.app_context():
+        Post.query.filter_by(slug=post_slug).one().title = 'After'
+        db.session.commit()
+        version, _ = current_version()
+
+    # A plain request inside the grace window may still get the previous payload
+    response = client.get(url)
+    assert response.headers['X-Cache'] == 'STALE'
+    assert response.get_json()['title'] == 'Before'
+
+    # The refetch triggered by the update announcement names the new version
+    response = client.get(f'{url}?v={version}')
+    assert response.headers['X-Cache'] != 'STALE'
+    assert response.get_json()['title'] == 'After'
+    assert response.get_etag()[0].startswith(f'{version}-')
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, '-v']))
@@ -0,0 +1,42 @@
+"""Check that revision diffs keep lines apart when the content has no trailing newline
+
+Usage:
+    python -m pytest test_revisions.py
+"""
+import sys
+import pytest
+from revisions import apply_delta, make_delta, unified_diff
+
+
+def test_last_line_without_newline_is_marked():
+    diff = unified_diff('Intro\nSome flask words here', 'Intro\nchanged text', 'revision 1', 'revision 2')
+    assert diff.splitlines() == [
+        '--- revision 1',
+        '+++ revision 2',
+        '@@ -1,2 +1,2 @@',
+        ' Intro',
+        '-Some flask words here',
+        '\\ No newline at end of file',
+        '+changed text',
+        '\\ No newline at end of file',
+    ]
+
+
+def test_adding_a_trailing_newline_shows_up():
+    diff = unified_diff('one\ntwo', 'one\ntwo\n', 'revision 1', 'revision 2')
+    assert '-two\n\\ No newline at end of file\n+two\n' in diff
+
+
+def test_lines_with_newlines_are_not_marked():
+    diff = unified_diff('a\nb\r\nc\n', 'a\nB\r\nc\n', 'revision 1', 'revision 2')
+    assert 'No newline' not in diff
+    assert '-b\r\n+B\r\n' in diff
+
+
+def test_delta_round_trip_without_trailing_newline():
+    base, text = 'Intro\nSome flask words here', 'Intro\nchanged text'
+    assert apply_delta(base, make_delta(base, text)) == text
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, '-v']))
@@ -0,0 +1,93 @@
+import json
+import os
+import threading
+import time
+from flask import current_app
+
+# How often each worker's watcher looks at the shared content version
+POLL_INTERVAL = 0.5
+# Comment lines keep idle streams alive through proxies and detect dead clients
+HEARTBEAT_INTERVAL = 15
+# Streams are closed after this long; EventSource reconnects with Last-Event-ID
+MAX_STREAM_SECONDS = 300
+# Upper bound for ?wait= on the long-poll fallback
+MAX_LONG_POLL_SECONDS = 30
+
+
+class UpdateNotifier:
+    """Wakes every waiting client in this worker when the content version changes
+
+    A single watcher thread per worker reads the shared version; clients only
+    block on a condition variable. Under the gevent worker both are greenlets,
+    so thousands of idle subscribers cost a few KB each and no database work.
+    """
+
+    def __init__(self, tracker, interval=POLL_INTERVAL):
+        self.tracker = tracker
+        self.interval = interval
+        self._cond = threading.Condition()
+        self._version = tracker.version
+        self._pid = None
+
+    def _ensure_watcher(self):
+        # Threads do not survive a fork, so start the watcher in each worker process
+        if self._pid == os.getpid():
+            return
+        with self._cond:
+            if self._pid != os.getpid():
+                self._pid = os.getpid()
+                threading.Thread(target=self._watch, name='content-version-watcher', daemon=True).start()
+
+    def _watch(self):
+        while True:
+            time.sleep(self.interval)
+            version = self.tracker.version
+            if version != self._version:
+                with self._cond:
+                    self._version = version
+                    self._cond.notify_all()
+
+    def wait(self, since, timeout):
+        """Block until the version is newer than since or timeout expires; returns the version"""
+        self._ensure_watcher()
+        with self._cond:
+            self._cond.wait_for(lambda: self._version > since, timeout)
+            return self._version
+
+
+def get_notifier():
+    """The UpdateNotifier for the running app, created on first use"""
+    notifier = current_app.extensions.get('update_notifier')
+    if notifier is None:
+        notifier = current_app.extensions.setdefault(
+            'update_notifier', UpdateNotifier(current_app.extensions['content_version']))
+    return notifier
+
+
+def sse_message(data, event=None, event_id=None):
+    """Format one server-sent event"""
+    lines = []
+    if event_id is not None:
+        lines.append(f'id: {event_id}')
+    if event:
+        lines.append(f'event: {event}')
+    lines.append(f'data: {json.dumps(data)}')
+    return '\n'.join(lines) + '\n\n'
+
+
+def update_stream(notifier, since, max_seconds=MAX_STREAM_SECONDS, heartbeat=HEARTBEAT_INTERVAL):
+    """Yield an 'update' event each time the content version moves past since"""
+    yield 'retry: 5000\n\n'
+    deadline = time.monotonic() + max_seconds
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return
+        version = notifier.wait(since, min(heartbeat, remaining))
+        if version > since:
+            since = version
+            _, updated_at = notifier.tracker.read()
+            yield sse_message({'version': version, 'last_update': updated_at.isoformat()},
+                              event='update', event_id=version)
+        else:
+            yield ': keepalive\n\n'
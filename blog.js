@@ -86,19 +86,12 @@ async function fetchBlogPosts() {
             return cachedPosts;
         }
         
-        // Add a cache busting parameter to prevent browser caching
-        const cacheBuster = `?_=${Date.now()}`;
         logDebug('Making network request for posts');
         
         // No cache or expired, make a new request
-        const response = await fetch(`${API_BASE_URL}/posts${cacheBuster}`, {
-            // Add cache busting query parameter
-            headers: {
-                'Cache-Control': 'no-cache, no-store, must-revalidate',
-                'Pragma': 'no-cache',
-                'Expires': '0'
-            },
-            cache: 'no-store'
+        const response = await fetch(apiUrl('/posts'), {
+            // Revalidate with the server's ETag instead of refetching the whole body
+            cache: 'no-cache'
         });
         
         logDebug('Response received:', response.status, response.statusText);
@@ -132,18 +125,12 @@ async function fetchBlogPost(slug) {
             return cachedPost;
         }
         
-        // Add a cache busting parameter to prevent browser caching
-        const cacheBuster = `?_=${Date.now()}`;
         logDebug('Making network request for post:', slug);
         
         // No cache or expired, make a new request
-        const response = await fetch(`${API_BASE_URL}/posts/${slug}${cacheBuster}`, {
-            headers: {
-                'Cache-Control': 'no-cache, no-store, must-revalidate',
-                'Pragma': 'no-cache',
-                'Expires': '0'
-            },
-            cache: 'no-store'
+        const response = await fetch(apiUrl(`/posts/${slug}`), {
+            // Revalidate with the server's ETag instead of refetching the whole body
+            cache: 'no-cache'
         });
         
         logDebug('Response received for post:', response.status, response.statusText);
@@ -168,7 +155,7 @@ async function fetchBlogPost(slug) {
 // Fetch all categories
 async function fetchCategories() {
     try {
-        const response = await fetch(`${API_BASE_URL}/categories`);
+        const response = await fetch(apiUrl('/categories'));
         if (!response.ok) {
             throw new Error('Failed to fetch categories');
         }
@@ -192,18 +179,12 @@ async function fetchPostsByCategory(categorySlug) {
             return cachedPosts;
         }
         
-        // Add a cache busting parameter to prevent browser caching
-        const cacheBuster = `?_=${Date.now()}`;
         logDebug('Making network request for category posts:', categorySlug);
         
         // No cache or expired, make a new request
-        const response = await fetch(`${API_BASE_URL}/categories/${categorySlug}/posts${cacheBuster}`, {
-            headers: {
-                'Cache-Control': 'no-cache, no-store, must-revalidate',
-                'Pragma': 'no-cache',
-                'Expires': '0'
-            },
-            cache: 'no-store'
+        const response = await fetch(apiUrl(`/categories/${categorySlug}/posts`), {
+            // Revalidate with the server's ETag instead of refetching the whole body
+            cache: 'no-cache'
         });
         
         logDebug('Response received for category posts:', response.status, response.statusText);
@@ -225,48 +206,199 @@ async function fetchPostsByCategory(categorySlug) {
     }
 }
 
-// Function to check for blog updates periodically
-async function checkForUpdates() {
+// Content version the current view was rendered from (null until the server tells us)
+let contentVersion = null;
+
+// Version announced by the last update; refetches name it so the server skips its stale copy
+let announcedVersion = null;
+
+// API URL, carrying ?v= once an update has been announced
+function apiUrl(path) {
+    if (announcedVersion === null) {
+        return `${API_BASE_URL}${path}`;
+    }
+    const separator = path.includes('?') ? '&' : '?';
+    return `${API_BASE_URL}${path}${separator}v=${announcedVersion}`;
+}
+
+// blog-post.html?slug=... renders in the browser; /blog/<slug> comes pre-rendered from the static snapshot
+function isPostPage() {
+    return window.location.pathname.includes('blog-post.html') || window.location.pathname.startsWith('/blog/');
+}
+
+function currentPostSlug() {
+    const slug = new URLSearchParams(window.location.search).get('slug');
+    if (slug) {
+        return slug;
+    }
+    const match = window.location.pathname.match(/^\/blog\/([^/]+)/);
+    return match ? decodeURIComponent(match[1]) : null;
+}
+
+// Invalidate the cache and re-render whichever view is showing
+function refreshCurrentView() {
+    postCache.invalidateAll();
+    if (isPostPage()) {
+        logDebug('Refreshing blog post');
+        renderBlogPost();
+    } else {
+        logDebug('Refreshing blog listing');
+        renderBlogPosts();
+    }
+}
+
+// Record a content version from the server, refreshing only if it moved
+function applyContentVersion(version) {
+    if (contentVersion !== null && version > contentVersion) {
+        logDebug('Content version changed:', contentVersion, '->', version);
+        contentVersion = version;
+        announcedVersion = version;
+        refreshCurrentView();
+        return true;
+    }
+    contentVersion = version;
+    return false;
+}
+
+// Check for blog updates once; with waitSeconds the server holds the request until something changes.
+// Resolves to true if the view was refreshed, false if not, and null if the check failed.
+async function checkForUpdates(waitSeconds = 0) {
     try {
         logDebug('Checking for blog updates...');
         
-        // Add cache buster to prevent browser caching
-        const cacheBuster = `?_=${Date.now()}`;
+        const params = new URLSearchParams();
+        if (contentVersion !== null) {
+            params.set('since', contentVersion);
+            if (waitSeconds > 0) {
+                params.set('wait', waitSeconds);
+            }
+        }
         
-        // Make a request to check for updates
-        const response = await fetch(`${API_BASE_URL}/check-updates${cacheBuster}`, {
+        const response = await fetch(`${API_BASE_URL}/check-updates?${params}`, {
             method: 'GET',
-            headers: {
-                'Cache-Control': 'no-cache, no-store, must-revalidate',
-                'Pragma': 'no-cache',
-                'Expires': '0'
-            },
             cache: 'no-store'
         });
         
         logDebug('Update check response:', response.status, response.statusText);
         
-        // Force refresh regardless of response
-        // This makes development easier by always refreshing content
-        postCache.invalidateAll();
-        
-        // Refresh the current view
-        if (window.location.pathname.includes('blog-post.html')) {
-            logDebug('Refreshing blog post');
-            renderBlogPost();
-        } else {
-            logDebug('Refreshing blog listing');
-            renderBlogPosts();
+        if (!response.ok) {
+            throw new Error(`Failed to check for updates: ${response.status}`);
         }
         
-        return true;
+        const result = await response.json();
+        return applyContentVersion(result.version);
     } catch (error) {
         console.error('Error checking for updates:', error);
-        return false;
+        return null;
+    }
+}
+
+// Featured image as a <picture> using the resized variants from the API when they exist
+function renderFeaturedImage(post, sizes, extraAttributes = '') {
+    const image = post.image;
+    if (!image) {
+        return `<img src="${post.featured_image ? `/backend/static/uploads/${post.featured_image}` : 'assets/blog-placeholder.jpg'}" 
+                     alt="${post.title}" loading="lazy" ${extraAttributes}>`;
+    }
+    const sources = image.sources
+        .map(source => `<source type="${source.type}" srcset="${source.srcset}" sizes="${sizes}">`)
+        .join('');
+    return `<picture>${sources}<img src="${image.src}" width="${image.width}" height="${image.height}" 
+                     alt="${post.title}" loading="lazy" decoding="async" ${extraAttributes}></picture>`;
+}
+
+// Cursor for the next page of /api/posts, or null once the last page is shown
+let nextPostsCursor = null;
+
+// Fetch one page of published posts; resolves to { posts, nextCursor }
+async function fetchPostsPage(cursor = null) {
+    const url = apiUrl(cursor ? `/posts?cursor=${encodeURIComponent(cursor)}` : '/posts');
+    const response = await fetch(url);
+    console.log('API Response:', response.status, response.statusText);
+    
+    if (!response.ok) {
+        throw new Error(`Failed to fetch posts: ${response.status} ${response.statusText}`);
+    }
+    
+    const posts = await response.json();
+    return { posts, nextCursor: response.headers.get('X-Next-Cursor') };
+}
+
+// Card for one post in the blog grid
+function renderBlogCard(post) {
+    const article = document.createElement('article');
+    article.className = 'blog-card';
+    article.setAttribute('data-post-id', post.id);
+    
+    const categoryIcon = post.category ? post.category.icon || 'fa-folder' : 'fa-folder';
+    const categoryName = post.category ? post.category.name : 'Uncategorized';
+    const categorySlug = post.category ? post.category.slug : '';
+    
+    article.innerHTML = `
+        <div class="blog-card-inner">
+            <div class="blog-image">
+                <div class="blog-category">
+                    <i class="fas ${categoryIcon}"></i>
+                    <span>${categoryName}</span>
+                </div>
+                ${renderFeaturedImage(post, '(max-width: 768px) 100vw, 400px', `onerror="this.src='assets/blog-placeholder.jpg'"`)}
+                <div class="blog-overlay">
+                    <div class="blog-meta">
+                        <span><i class="far fa-calendar"></i> ${post.created_at}</span>
+                        <span><i class="far fa-clock"></i> ${post.read_time} min read</span>
+                    </div>
+                </div>
+            </div>
+            <div class="blog-content">
+                <h3>${post.title}</h3>
+                <p>${post.summary || 'No summary available.'}</p>
+                <div class="blog-footer">
+                    <a href="/blog/${post.slug}" class="read-more">
+                        Read Article
+                        <i class="fas fa-arrow-right"></i>
+                    </a>
+                    <div class="blog-tags">
+                        <span>#${categorySlug}</span>
+                    </div>
+                </div>
+            </div>
+        </div>
+    `;
+    
+    return article;
+}
+
+// Show the "Load more" button below the grid while the API reports another page
+function updateLoadMoreButton(blogGrid) {
+    let button = document.querySelector('.blog-load-more');
+    if (!button) {
+        button = document.createElement('button');
+        button.type = 'button';
+        button.className = 'see-all blog-load-more';
+        button.innerHTML = 'Load more posts <i class="fas fa-arrow-down"></i>';
+        button.addEventListener('click', () => loadMorePosts(blogGrid));
+        blogGrid.after(button);
+    }
+    button.hidden = !nextPostsCursor;
+}
+
+// Append the next page of posts to the grid
+async function loadMorePosts(blogGrid) {
+    const button = document.querySelector('.blog-load-more');
+    button.disabled = true;
+    try {
+        const { posts, nextCursor } = await fetchPostsPage(nextPostsCursor);
+        posts.forEach(post => blogGrid.appendChild(renderBlogCard(post)));
+        nextPostsCursor = nextCursor;
+    } catch (error) {
+        console.error('Error loading more posts:', error);
+    } finally {
+        button.disabled = false;
+        updateLoadMoreButton(blogGrid);
     }
 }
 
-// Render blog posts in the blog section
+// Render the first page of blog posts in the blog section
 async function renderBlogPosts() {
     console.log('Rendering blog posts...');
     
@@ -281,16 +413,11 @@ async function renderBlogPosts() {
     try {
         // Show loading state
         blogGrid.innerHTML = '<div class="loading-spinner"><i class="fas fa-spinner fa-spin"></i> Loading blog posts...</div>';
+        nextPostsCursor = null;
+        updateLoadMoreButton(blogGrid);
         
-        // Fetch posts from API
-        const response = await fetch(`${API_BASE_URL}/posts`);
-        console.log('API Response:', response.status, response.statusText);
-        
-        if (!response.ok) {
-            throw new Error(`Failed to fetch posts: ${response.status} ${response.statusText}`);
-        }
-        
-        const posts = await response.json();
+        // Fetch the first page from the API; later pages are appended by "Load more"
+        const { posts, nextCursor } = await fetchPostsPage();
         console.log('Fetched posts:', posts);
         
         // Clear existing content
@@ -308,51 +435,9 @@ async function renderBlogPosts() {
         }
         
         // Render each post
-        posts.forEach(post => {
-            const article = document.createElement('article');
-            article.className = 'blog-card';
-            article.setAttribute('data-post-id', post.id);
-            
-            const categoryIcon = post.category ? post.category.icon || 'fa-folder' : 'fa-folder';
-            const categoryName = post.category ? post.category.name : 'Uncategorized';
-            const categorySlug = post.category ? post.category.slug : '';
-            
-            article.innerHTML = `
-                <div class="blog-card-inner">
-                    <div class="blog-image">
-                        <div class="blog-category">
-                            <i class="fas ${categoryIcon}"></i>
-                            <span>${categoryName}</span>
-                        </div>
-                        <img src="${post.featured_image ? `/backend/static/uploads/${post.featured_image}` : 'assets/blog-placeholder.jpg'}" 
-                             alt="${post.title}" 
-                             loading="lazy"
-                             onerror="this.src='assets/blog-placeholder.jpg'">
-                        <div class="blog-overlay">
-                            <div class="blog-meta">
-                                <span><i class="far fa-calendar"></i> ${post.created_at}</span>
-                                <span><i class="far fa-clock"></i> ${post.read_time} min read</span>
-                            </div>
-                        </div>
-                    </div>
-                    <div class="blog-content">
-                        <h3>${post.title}</h3>
-                        <p>${post.summary || 'No summary available.'}</p>
-                        <div class="blog-footer">
-                            <a href="/blog/${post.slug}" class="read-more">
-                                Read Article
-                                <i class="fas fa-arrow-right"></i>
-                            </a>
-                            <div class="blog-tags">
-                                <span>#${categorySlug}</span>
-                            </div>
-                        </div>
-                    </div>
-                </div>
-            `;
-            
-            blogGrid.appendChild(article);
-        });
+        posts.forEach(post => blogGrid.appendChild(renderBlogCard(post)));
+        nextPostsCursor = nextCursor;
+        updateLoadMoreButton(blogGrid);
         
         console.log('Blog posts rendered successfully');
         
@@ -368,6 +453,22 @@ async function renderBlogPosts() {
     }
 }
 
+function escapeHtml(text) {
+    const div = document.createElement('div');
+    div.textContent = text || '';
+    return div.innerHTML;
+}
+
+// Nested list of links to the post's headings; toc entries are {id, title, level, children}
+function renderToc(toc) {
+    if (!toc || !toc.length) {
+        return '';
+    }
+    const list = entries => `<ul>${entries.map(entry => `
+        <li><a href="#${encodeURIComponent(entry.id)}">${escapeHtml(entry.title)}</a>${entry.children.length ? list(entry.children) : ''}</li>`).join('')}</ul>`;
+    return `<nav class="blog-post-toc" aria-label="Contents">${list(toc)}</nav>`;
+}
+
 // Render a single blog post
 async function renderBlogPost() {
     console.log('Rendering single blog post...');
@@ -382,8 +483,7 @@ async function renderBlogPost() {
     blogContent.innerHTML = '<p class="text-center"><i class="fas fa-spinner fa-spin"></i> Loading blog post...</p>';
     
     // Get slug from URL
-    const urlParams = new URLSearchParams(window.location.search);
-    const slug = urlParams.get('slug');
+    const slug = currentPostSlug();
     
     if (!slug) {
         blogContent.innerHTML = '<p class="text-center">Blog post not found. No slug parameter in URL.</p>';
@@ -394,17 +494,11 @@ async function renderBlogPost() {
         // Force clear any cached data
         postCache.invalidateAll();
         
-        // Get completely fresh post with timestamp to avoid any caching
-        const cacheBuster = Date.now();
-        logDebug(`Fetching fresh post with slug ${slug} and cache buster: ${cacheBuster}`);
+        logDebug(`Fetching post with slug ${slug}`);
         
-        const response = await fetch(`${API_BASE_URL}/posts/${slug}?_=${cacheBuster}`, {
-            headers: {
-                'Cache-Control': 'no-cache, no-store, must-revalidate',
-                'Pragma': 'no-cache',
-                'Expires': '0'
-            },
-            cache: 'no-store'
+        const response = await fetch(apiUrl(`/posts/${slug}`), {
+            // Revalidate with the server's ETag instead of refetching the whole body
+            cache: 'no-cache'
         });
         
         if (!response.ok) {
@@ -422,8 +516,9 @@ async function renderBlogPost() {
         // Update page title
         document.title = `${post.title} - Dipayan Dutta Blog`;
         
-        // Convert Markdown content to HTML (requires marked.js)
-        const contentHtml = typeof marked !== 'undefined' ? marked.parse(post.content) : post.content;
+        // content_html is rendered and sanitized by the server when the post is saved;
+        // posts saved before that show their markdown as plain text until re-rendered
+        const contentHtml = post.content_html || `<pre class="blog-post-source">${escapeHtml(post.content)}</pre>`;
         
         const postHtml = `
             <div class="blog-post-header">
@@ -431,14 +526,16 @@ async function renderBlogPost() {
                 <div class="blog-post-meta">
                     <span><i class="far fa-calendar"></i> ${post.created_at}</span>
                     <span><i class="far fa-clock"></i> ${post.read_time} min read</span>
-                    <span><i class="far fa-folder"></i> ${post.category}</span>
+                    <span><i class="far fa-folder"></i> ${post.category ? post.category.name : 'Uncategorized'}</span>
                 </div>
             </div>
             
             <div class="blog-post-featured-image">
-                <img src="${post.featured_image ? `/backend/static/uploads/${post.featured_image}` : 'assets/blog-placeholder.jpg'}" alt="${post.title}" loading="lazy">
+                ${renderFeaturedImage(post, '(max-width: 900px) 100vw, 900px')}
             </div>
             
+            ${renderToc(post.toc)}
+            
             <div class="blog-post-body">
                 ${contentHtml}
             </div>
@@ -462,17 +559,11 @@ async function updateSidebarCategories() {
     if (!categoriesList) return;
     
     try {
-        // Add cache buster for fresh content
-        const cacheBuster = `?_=${Date.now()}`;
         logDebug('Fetching categories');
         
-        const response = await fetch(`${API_BASE_URL}/categories${cacheBuster}`, {
-            headers: {
-                'Cache-Control': 'no-cache, no-store, must-revalidate',
-                'Pragma': 'no-cache',
-                'Expires': '0'
-            },
-            cache: 'no-store'
+        const response = await fetch(apiUrl('/categories'), {
+            // Revalidate with the server's ETag instead of refetching the whole body
+            cache: 'no-cache'
         });
         
         if (!response.ok) {
@@ -524,21 +615,44 @@ function forceHardRefresh() {
     window.location.reload(true);
 }
 
-// Add this function to force clear all caches on a regular basis
-function setupRegularCacheInvalidation() {
-    // Check for updates every 5 seconds during development
-    setInterval(() => {
-        logDebug('Regular cache invalidation check');
-        postCache.invalidateAll();
-        
-        // If we're on the blog page, refresh the content
-        if (window.location.pathname.includes('blog') || 
-            document.querySelector('.blog-grid') || 
-            document.querySelector('#blog')) {
-            logDebug('Refreshing blog content automatically');
-            renderBlogPosts();
+// Fallback for browsers without EventSource: keep one long-poll request open at a time
+async function longPollForUpdates() {
+    while (true) {
+        const result = await checkForUpdates(contentVersion === null ? 0 : 25);
+        if (result === null) {
+            // Server unreachable, back off before trying again
+            await new Promise(resolve => setTimeout(resolve, 30000));
         }
-    }, 5000);
+    }
+}
+
+// Subscribe to server-sent update events instead of polling
+function subscribeToUpdates() {
+    if (typeof EventSource === 'undefined') {
+        logDebug('EventSource not supported, falling back to long polling');
+        longPollForUpdates();
+        return;
+    }
+    
+    // Learn the current version first so the first event can be compared against it
+    checkForUpdates().then(() => {
+        const source = new EventSource(`${API_BASE_URL}/updates/stream` +
+            (contentVersion !== null ? `?since=${contentVersion}` : ''));
+        
+        source.addEventListener('update', function(event) {
+            const update = JSON.parse(event.data);
+            logDebug('Received update event:', update);
+            applyContentVersion(update.version);
+        });
+        
+        source.onerror = function() {
+            // EventSource reconnects by itself; only fall back if it gave up for good
+            if (source.readyState === EventSource.CLOSED) {
+                logDebug('Update stream closed, falling back to long polling');
+                longPollForUpdates();
+            }
+        };
+    });
 }
 
 // Try to load blog posts immediately when the script is loaded
@@ -562,11 +676,12 @@ document.addEventListener('DOMContentLoaded', function() {
         renderBlogPosts();
     }, 100);
     
-    // Setup regular cache invalidation
-    setupRegularCacheInvalidation();
+    // Refresh only when the server announces a content change
+    subscribeToUpdates();
     
-    // Render single blog post on the blog post page
-    if (window.location.pathname.includes('blog-post.html')) {
+    // Render single blog post on the blog post page, unless the server already did
+    const postContent = document.querySelector('.blog-post-content');
+    if (isPostPage() && !(postContent && postContent.dataset.prerendered)) {
         renderBlogPost();
     }
     
@@ -576,9 +691,9 @@ document.addEventListener('DOMContentLoaded', function() {
     // Listen for visibility change to refresh content when user returns to the tab
     document.addEventListener('visibilitychange', function() {
         if (document.visibilityState === 'visible') {
-            logDebug('Tab became visible, refreshing content');
-            // User has returned to the tab, invalidate cache and refresh
-            forceRefreshBlog();
+            logDebug('Tab became visible, checking for updates');
+            // User has returned to the tab, refresh only if content changed meanwhile
+            checkForUpdates();
         }
     });
     
@@ -605,8 +720,8 @@ document.addEventListener('DOMContentLoaded', function() {
 });
 
 // Add styles for loading and error states
-const style = document.createElement('style');
-style.textContent = `
+const statusStyle = document.createElement('style');
+statusStyle.textContent = `
     .loading-spinner {
         text-align: center;
         padding: 40px;
@@ -642,4 +757,4 @@ style.textContent = `
         color: #666;
     }
 `;
-document.head.appendChild(style);
\ No newline at end of file
+document.head.appendChild(statusStyle);
\ No newline at end of file
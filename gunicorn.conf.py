@@ -0,0 +1,46 @@
+import multiprocessing
+import os
+
+# Picked up automatically by `gunicorn backend.app:app` from the repository root.
+# The gevent worker lets each process hold thousands of idle /api/updates/stream
+# and long-poll connections instead of one sync worker per client.
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+
+
+def _green_database():
+    """True unless the database driver would block the gevent hub on every query
+
+    psycopg2 waits on the socket in C, so under gevent it needs psycogreen's
+    wait callback. SQLite is a local file and is used as is.
+    """
+    if not os.environ.get('DATABASE_URL', '').startswith('postgres'):
+        return True
+    try:
+        import psycogreen.gevent  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+try:
+    import gevent  # noqa: F401
+    if not _green_database():
+        raise ImportError('psycogreen is needed to run psycopg2 under gevent')
+    worker_class = 'gevent'
+    worker_connections = int(os.environ.get('WORKER_CONNECTIONS', 2000))
+except ImportError:
+    # Without gevent, or with a driver it cannot make cooperative, fall back to threads;
+    # each open stream then holds one thread
+    worker_class = 'gthread'
+    threads = int(os.environ.get('GUNICORN_THREADS', 8))
+
+
+def post_fork(server, worker):
+    # Before the app is loaded, so every Postgres connection the worker opens yields to other greenlets
+    if worker_class == 'gevent' and os.environ.get('DATABASE_URL', '').startswith('postgres'):
+        from psycogreen.gevent import patch_psycopg
+        patch_psycopg()
+
+
+# Streams send a heartbeat every 15 seconds, keep-alive covers proxies in between
+keepalive = 75